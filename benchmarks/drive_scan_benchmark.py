@@ -0,0 +1,113 @@
+"""
+Benchmark of the scanning of the drive: the former serial rglob/glob scan against the single-pass DriveIndex, serial
+and with a pool of threads, on a synthetic deep directory tree resembling the DCL storage (Line/Line_MouseID/
+date_paradigm/...). The round-trip latency of network mounts can be emulated with --latency (in ms per directory
+listing/stat), which is where the concurrent walk pays off.
+
+usage:
+    python benchmarks/drive_scan_benchmark.py --lines 5 --mice 40 --sessions 6 --latency 2 --workers 1 8 32
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.utilBase.drive_index import DriveIndex  # noqa: E402
+
+
+def make_tree(base, n_lines, n_mice, n_sessions, n_extra):
+    """
+    builds the synthetic experiment tree and returns the list of sessions as (root, date, paradigm) tuples.
+    """
+    sessions = []
+    for line_ in range(n_lines):
+        for mouse_ in range(n_mice):
+            root_ = f'{100 + line_}_F{mouse_}-{line_}'
+            for session_ in range(n_sessions):
+                date_, paradigm_ = f'2{line_}{mouse_:02d}{session_:02d}', f'CD{session_}'
+                session_dir = base / f'Line{100 + line_}' / 'Animals' / root_ / f'{date_}_{paradigm_}'
+                for extra_ in range(n_extra):  # deeper, irrelevant folders (exports, videos, ...)
+                    (session_dir / f'exports_{extra_}' / 'raw').mkdir(parents=True)
+                session_dir.mkdir(parents=True, exist_ok=True)
+                sessions.append((root_, date_, paradigm_))
+    return sessions
+
+
+def legacy_scan(in_dir, sessions):
+    # the former drive_scan: one rglob per (adjacent) root and one glob per session
+    found, last_root, rglob_list = 0, None, []
+    for root_, date_, paradigm_ in sessions:
+        if root_ != last_root:
+            rglob_list = list(in_dir.rglob(root_))
+            last_root = root_
+        if len(rglob_list) == 1 and len(list(rglob_list[0].glob(f'*{date_}_{paradigm_}'))) == 1:
+            found += 1
+    return found
+
+
+def index_scan(in_dir, sessions, workers):
+    drive_index = DriveIndex(in_dir, workers=workers)
+    found = 0
+    for root_, date_, paradigm_ in sessions:
+        rglob_list = drive_index.find(root_)
+        if len(rglob_list) == 1 and len(drive_index.find_children(rglob_list[0], f'*{date_}_{paradigm_}')) == 1:
+            found += 1
+    return found
+
+
+def emulate_latency(latency_s):
+    # every listing/stat of a directory pays one round-trip, as on a network mount
+    scandir_, stat_ = os.scandir, os.stat
+
+    def slow_scandir(*args, **kwargs):
+        time.sleep(latency_s)
+        return scandir_(*args, **kwargs)
+
+    def slow_stat(*args, **kwargs):
+        time.sleep(latency_s)
+        return stat_(*args, **kwargs)
+
+    os.scandir, os.stat = slow_scandir, slow_stat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=4)
+    parser.add_argument('--mice', type=int, default=25)
+    parser.add_argument('--sessions', type=int, default=5)
+    parser.add_argument('--extra', type=int, default=2, help='irrelevant sub-folders per session')
+    parser.add_argument('--latency', type=float, default=0.0, help='emulated latency per listing/stat (ms)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--skip-legacy', action='store_true', help='skip the (slow) former rglob scan')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_:
+        in_dir = pathlib.Path(tmp_)
+        sessions = make_tree(in_dir, args.lines, args.mice, args.sessions, args.extra)
+        n_dirs = sum(len(dirs_) for _, dirs_, _ in os.walk(in_dir))
+        print(f'synthetic tree: {n_dirs} directories, {len(sessions)} sessions, '
+              f'emulated latency: {args.latency} ms')
+        if args.latency > 0:
+            emulate_latency(args.latency / 1000)
+
+        results = []
+        if not args.skip_legacy:
+            start_ = time.perf_counter()
+            found = legacy_scan(in_dir, sessions)
+            results.append(('serial rglob/glob (former)', time.perf_counter() - start_, found))
+        for workers_ in args.workers:
+            start_ = time.perf_counter()
+            found = index_scan(in_dir, sessions, workers_)
+            results.append((f'DriveIndex, workers={workers_}', time.perf_counter() - start_, found))
+
+        reference_ = results[0][1]
+        print(f'{"scan":<30}{"time (s)":>12}{"speedup":>10}{"found":>8}')
+        for name_, time_, found_ in results:
+            print(f'{name_:<30}{time_:>12.3f}{reference_ / time_:>9.1f}x{found_:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the intermediate formats of the session tables on a synthetic multi-hour ECG recording: the cardiac table
+is built as session2tables builds it (raw ECG along with the much shorter heart-rate series), then written and read
+back through write_tables/read_main for every format (the in-memory hand-off costs none of these).
+
+usage:
+    python benchmarks/intermediate_benchmark.py --hours 3 --rate 1000 --formats csv parquet feather npz
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.utilBase.session_tables import write_tables, read_main  # noqa: E402
+
+
+def cardiac_tables(hours, rate):
+    """
+    the tables of a synthetic session with a raw ECG of the given length and sampling rate (Hz) and a ~30 Hz heart rate.
+    """
+    n_ecg = int(hours * 3600 * rate)
+    n_hr = int(hours * 3600 * 30)
+    rng_ = np.random.default_rng(0)
+    dict_cardiac = {
+        'ecg_time': np.arange(n_ecg) / rate,
+        'ecg_data': rng_.standard_normal(n_ecg).astype(np.float64),
+        'heartRate_time': np.arange(n_hr) / 30,
+        'heartRate_data': 600 + 50 * rng_.standard_normal(n_hr),
+    }
+    info_ = pd.DataFrame({'data/meta': ['mainData', 'metaData'],
+                          'cardiac_data': ['cardiacData.csv', 'cardiacData-meta.csv']}).set_index('data/meta')
+    meta_ = pd.DataFrame({'data_index': ['ecg', 'heartRate'], 'name': ['ECG', 'Heart Rate']}).set_index('data_index')
+    return {'cardiacData.csv': dict_cardiac, 'cardiacData-meta.csv': meta_, 'main-info-sheet.csv': info_}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=2.0)
+    parser.add_argument('--rate', type=float, default=1000.0, help='sampling rate of the raw ECG (Hz)')
+    parser.add_argument('--formats', nargs='+', default=['csv', 'parquet', 'feather', 'npz'])
+    args = parser.parse_args()
+
+    tables = cardiac_tables(args.hours, args.rate)
+    print(f'synthetic session: {args.hours} h of raw ECG at {args.rate} Hz '
+          f'({len(tables["cardiacData.csv"]["ecg_time"])} samples)')
+    print(f'{"format":<10}{"write (s)":>12}{"read (s)":>12}{"size (MB)":>12}')
+
+    for format_ in args.formats:
+        with tempfile.TemporaryDirectory() as tmp_:
+            out_dir = pathlib.Path(tmp_)
+            start_ = time.perf_counter()
+            write_tables(tables, out_dir, intermediate_format=format_)
+            write_time = time.perf_counter() - start_
+            info_ = pd.read_csv(out_dir / 'main-info-sheet.csv', index_col='data/meta')
+            main_path = out_dir / info_.at['mainData', 'cardiac_data']
+            start_ = time.perf_counter()
+            df_ = read_main(main_path)
+            np.asarray(df_['ecg_data']).sum()  # make sure the data are actually there (e.g., memory-mapped)
+            read_time = time.perf_counter() - start_
+            size_ = sum(path_.stat().st_size for path_ in [main_path, *main_path.rglob('*')]
+                        if path_.is_file()) / 2 ** 20  # a file (csv, npz) or a folder of files (parquet, feather)
+            print(f'{format_:<10}{write_time:>12.2f}{read_time:>12.2f}{size_:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
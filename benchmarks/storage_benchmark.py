@@ -0,0 +1,101 @@
+"""
+Benchmark of the storage policies (chunking/compression codecs) of the NWB datasets on a synthetic session shaped like
+a typical one: hours of raw ECG (cardiac_data) along with a ~30 Hz heart rate and a frame-locked position and speed
+(behavioral_data). The session is written through NWBHDF5IO with every codec and read back completely; the file size
+and the write/read throughput (in MB/s of the raw arrays) are reported.
+
+usage:
+    python benchmarks/storage_benchmark.py --hours 1 --rate 1000 --codecs none gzip:1 gzip:4 lzf zstd blosc
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from dateutil import tz
+from pynwb import NWBFile, NWBHDF5IO, TimeSeries
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.utilBase.storage_policy import parse_storage, use_policy, h5_dataset  # noqa: E402
+
+
+def session_series(hours, rate):
+    """
+    :return: a list of (modality, name, timestamps, data) of a synthetic session of the given length; the raw ECG is
+             a noisy periodic signal (the compression ratios of white noise would be meaningless)
+    """
+
+    rng_ = np.random.default_rng(0)
+    n_ecg = int(hours * 3600 * rate)
+    ecg_time = np.arange(n_ecg) / rate
+    ecg_data = (np.sin(2 * np.pi * 10 * ecg_time) ** 15 + 0.05 * rng_.standard_normal(n_ecg)).astype(np.float64)
+    n_hr = int(hours * 3600 * 30)
+    frame_time = np.arange(n_hr) / 30 + 1e-4 * rng_.standard_normal(n_hr)  # frame-locked, with a jitter
+    return [
+        ('cardiac_data', 'ecg', ecg_time, ecg_data),
+        ('cardiac_data', 'heartRate', frame_time, 600 + np.cumsum(rng_.standard_normal(n_hr))),
+        ('behavioral_data', 'x_coordinates', frame_time, np.cumsum(rng_.standard_normal(n_hr))),
+        ('behavioral_data', 'speed', frame_time, np.abs(rng_.standard_normal(n_hr))),
+    ]
+
+
+def write_session(path_, series, policy):
+    nwb_file = NWBFile(session_description='storage benchmark', identifier='storage-benchmark',
+                       session_start_time=datetime(2022, 1, 1, tzinfo=tz.gettz('Europe/Berlin')))
+    with use_policy(policy):
+        for modality_, name_, time_, data_ in series:
+            nwb_file.add_acquisition(TimeSeries(name=name_, unit='na', timestamps=h5_dataset(time_, modality_),
+                                                data=h5_dataset(data_, modality_)))
+    with NWBHDF5IO(str(path_), 'w') as io:
+        io.write(nwb_file)
+
+
+def read_session(path_, series):
+    with NWBHDF5IO(str(path_), 'r') as io:
+        nwb_file = io.read()
+        for _, name_, _, _ in series:
+            nwb_file.acquisition[name_].timestamps[:].sum()
+            nwb_file.acquisition[name_].data[:].sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--rate', type=float, default=1000.0, help='sampling rate of the raw ECG (Hz)')
+    parser.add_argument('--codecs', nargs='+', default=['none', 'gzip:1', 'gzip:4', 'lzf', 'zstd', 'blosc'],
+                        help='codec[:level] per run, applied to all the modalities')
+    args = parser.parse_args()
+
+    series = session_series(args.hours, args.rate)
+    raw_mb = sum(time_.nbytes + data_.nbytes for _, _, time_, data_ in series) / 2 ** 20
+    print(f'synthetic session: {args.hours} h of raw ECG at {args.rate} Hz ({raw_mb:.1f} MB of raw arrays)')
+    print(f'{"codec":<10}{"size (MB)":>12}{"ratio":>8}{"write (MB/s)":>14}{"read (MB/s)":>14}')
+
+    for codec_ in args.codecs:
+        try:
+            policy = parse_storage([codec_])
+        except ValueError as error:
+            print(f'{codec_:<10}skipped: {error}')
+            continue
+        with tempfile.TemporaryDirectory() as tmp_:
+            path_ = pathlib.Path(tmp_) / 'session.nwb'
+            try:
+                start_ = time.perf_counter()
+                write_session(path_, series, policy)
+                write_time = time.perf_counter() - start_
+            except ImportError as error:  # e.g., no hdf5plugin for blosc/zstd
+                print(f'{codec_:<10}skipped: {error}')
+                continue
+            start_ = time.perf_counter()
+            read_session(path_, series)
+            read_time = time.perf_counter() - start_
+            size_ = path_.stat().st_size / 2 ** 20
+            print(f'{codec_:<10}{size_:>12.1f}{raw_mb / size_:>8.2f}{raw_mb / write_time:>14.1f}'
+                  f'{raw_mb / read_time:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of the peak memory of the NWB write of a long raw ECG: the series is written once through the NPZ hand-off
+(read lazily, streamed buffer by buffer through SeriesChunkIterator) and once fully loaded into memory, each in a
+fresh process so that the peak resident set sizes (RSS) are comparable; the baseline is the peak RSS of such a process
+after its imports only.
+
+usage:
+    python benchmarks/streaming_benchmark.py --hours 4 --rate 1000 --codec gzip --buffer-mb 16
+"""
+import argparse
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from dateutil import tz
+from pynwb import NWBFile, NWBHDF5IO, TimeSeries
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.utilBase.session_tables import write_main, read_main  # noqa: E402
+from dcl2nwb.utilBase.storage_policy import storage_policy, use_policy, h5_dataset  # noqa: E402
+
+
+def write_nwb(npz_path, nwb_path, codec, buffer_mb, stream):
+    """
+    writes the ECG of the NPZ file into an NWB file; run in a fresh process by main.
+    :return: the peak RSS of the process (MiB) and the duration of the write (s)
+    """
+
+    start_ = time.perf_counter()
+    columns = read_main(npz_path)  # FileSeries, read lazily
+    if not stream:
+        columns = {key_: np.array(array_) for key_, array_ in columns.items()}  # fully loaded, as before
+    policy = storage_policy({'codec': codec, 'stream_mb': 0 if stream else None, 'buffer_mb': buffer_mb})
+    nwb_file = NWBFile(session_description='streaming benchmark', identifier='streaming-benchmark',
+                       session_start_time=datetime(2022, 1, 1, tzinfo=tz.gettz('Europe/Berlin')))
+    with use_policy(policy):
+        nwb_file.add_acquisition(TimeSeries(name='ecg', unit='mV',
+                                            timestamps=h5_dataset(columns['ecg_time'], 'cardiac_data'),
+                                            data=h5_dataset(columns['ecg_data'], 'cardiac_data')))
+    with NWBHDF5IO(str(nwb_path), 'w') as io:
+        io.write(nwb_file)
+    return peak_rss(), time.perf_counter() - start_
+
+
+def peak_rss():
+    """
+    :return: the peak RSS of this process (MiB); VmHWM of linux, which unlike ru_maxrss is not inherited from the
+             parent process across exec
+    """
+
+    try:
+        with open('/proc/self/status') as file_:
+            return next(int(line_.split()[1]) for line_ in file_ if line_.startswith('VmHWM')) / 2 ** 10
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10  # KiB on linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=2.0)
+    parser.add_argument('--rate', type=float, default=1000.0, help='sampling rate of the raw ECG (Hz)')
+    parser.add_argument('--codec', default='gzip')
+    parser.add_argument('--buffer-mb', type=int, default=16)
+    parser.add_argument('--worker', nargs=2, default=None, help=argparse.SUPPRESS)  # internal: npz_path mode
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        npz_path, mode_ = args.worker
+        if mode_ == 'baseline':
+            print(f'{peak_rss():.1f} 0.00')
+            return
+        peak_, duration_ = write_nwb(pathlib.Path(npz_path), pathlib.Path(npz_path).with_suffix(f'.{mode_}.nwb'),
+                                     args.codec, args.buffer_mb, mode_ == 'streamed')
+        print(f'{peak_:.1f} {duration_:.2f}')
+        return
+
+    n_ecg = int(args.hours * 3600 * args.rate)
+    with tempfile.TemporaryDirectory() as tmp_:
+        npz_path = pathlib.Path(tmp_) / 'cardiacData.npz'
+        write_main({'ecg_time': np.arange(n_ecg) / args.rate,
+                    'ecg_data': np.random.default_rng(0).standard_normal(n_ecg)}, npz_path, 'npz')
+        print(f'synthetic ECG: {args.hours} h at {args.rate} Hz ({2 * n_ecg * 8 / 2 ** 20:.1f} MB of raw arrays), '
+              f'codec: {args.codec}, buffers: {args.buffer_mb} MB')
+        print(f'{"mode":<10}{"peak RSS (MB)":>16}{"write (s)":>12}')
+        for mode_ in ['baseline', 'streamed', 'loaded']:
+            output_ = subprocess.run([sys.executable, __file__, '--codec', args.codec,
+                                      '--buffer-mb', str(args.buffer_mb), '--worker', str(npz_path), mode_],
+                                     capture_output=True, text=True, check=True).stdout.split()
+            print(f'{mode_:<10}{float(output_[-2]):>16.1f}{float(output_[-1]):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Check of the hand-off of the session tables under the string dtype of pandas (the default dtype of text since pandas
+3.0; switched on here for pandas 2.x through future.infer_string): synthetic behavioral and acquisition tables, built
+as session2tables builds them (text cells of 'nan' or nan, every kind of epochs), are converted by the base_func_sheet
+once from memory and once through their CSV files (write_tables), with the behavioral table both ragged and padded to
+a data frame (the former wide tables, with the '[start, stop]' strings of the epochs). The series of both NWB files
+must be identical, without any of the nan cells passed on as text; so must the rows of a devices table fed with their
+nan cells (feed_dict with drop_nan=False).
+
+usage:
+    python benchmarks/string_dtype_check.py --frames 1000
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil import tz
+from pynwb import NWBFile
+
+if pd.__version__.startswith('2.'):
+    pd.set_option('future.infer_string', True)
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.mainBase import base_func_sheet  # noqa: E402
+from dcl2nwb.utilBase.session_tables import write_tables, main_info, padded_table, interval_series, read_meta, \
+    meta_rows, feed_dict  # noqa: E402
+
+
+def session_tables(n_frames, padded):
+    """
+    the tables of a synthetic session: a behavioral table (position, time series and the 0/1 per frame, start/stop
+    labelled and '[start, stop]' epochs, with the 'nan' unit and nan reference frame of session2tables), ragged or
+    padded, and an acquisition table padded to a data frame, holding a series shorter than the others.
+    """
+    rng_ = np.random.default_rng(0)
+    frame_times = np.arange(n_frames) / 30
+    freezing_ = (np.arange(n_frames) // 50 % 2).astype(np.float64)
+    rearing_time, rearing_data = interval_series([[1.0, 2.0], [5.0, 7.5]])
+    dict_behavior = {'x_coordinates_time': frame_times, 'x_coordinates_data': rng_.uniform(0, 640, n_frames),
+                     'speed_time': frame_times, 'speed_data': rng_.uniform(0, 0.2, n_frames),
+                     'freezing_time': frame_times, 'freezing_data': freezing_,
+                     'rearing_time': rearing_time, 'rearing_data': rearing_data}
+    if padded:
+        dict_behavior.update({'grooming_time': np.array(['[1.0, 2.0]', '[4.0, 6.5]'], dtype=object),
+                              'grooming_data': np.ones(2)})
+    epochs_ = [name_[:-len('_time')] for name_ in dict_behavior if name_.endswith('_time')][2:]
+    behavior_meta = pd.DataFrame({
+        'data_index': ['x_coordinates', 'speed'] + epochs_,
+        'name': ['x_coordinates', 'speed'] + epochs_,
+        'description': ['mouse x position', 'step speed of the mouse'] +
+                       [f'epoch range for the behavior {name_}' for name_ in epochs_],
+        'reference_frame': ['na'] + [np.nan] * (1 + len(epochs_)),
+        'unit': ['px', 'm.s-1'] + ['nan'] * len(epochs_),
+        'comments': ['none'] * (2 + len(epochs_)),
+        'interface_subtype': ['position', 'time_series'] + ['epochs'] * len(epochs_),
+    }).set_index('data_index')
+    acquisition_main = padded_table({'temperature_time': frame_times,
+                                     'temperature_data': rng_.normal(36, 0.5, n_frames),
+                                     'trigger_time': frame_times[:n_frames // 2],
+                                     'trigger_data': np.ones(n_frames // 2)})
+    acquisition_meta = pd.DataFrame({'data_index': ['temperature', 'trigger'], 'name': ['temperature', 'trigger'],
+                                     'unit': ['degC', 'V'], 'comments': ['none', 'none'],
+                                     'description': ['body temperature', 'trigger']}).set_index('data_index')
+    info_ = pd.DataFrame({'data/meta': ['mainData', 'metaData'],
+                          'behavioral_data': ['behavioralData.csv', 'behavioralData-meta.csv'],
+                          'acquisition': ['acquisitionData.csv', 'acquisitionData-meta.csv']}).set_index('data/meta')
+    return {'behavioralData.csv': padded_table(dict_behavior) if padded else dict_behavior,
+            'behavioralData-meta.csv': behavior_meta,
+            'acquisitionData.csv': acquisition_main, 'acquisitionData-meta.csv': acquisition_meta,
+            'main-info-sheet.csv': info_}
+
+
+def nwb_series(main_info_dict):
+    """
+    :return: the fields of every series built by the base_func_sheet from the pointers, by name
+    """
+    nwb_file = NWBFile(session_description='check', identifier='check',
+                       session_start_time=datetime(2024, 1, 1, tzinfo=tz.tzlocal()))
+    for key_, pointer_ in main_info_dict.items():
+        nwb_file = getattr(base_func_sheet, key_)(nwb_file, pointer_)
+    series_ = list(nwb_file.acquisition.values())
+    for interface_ in nwb_file.processing['behavior'].data_interfaces.values():
+        series_ += list(getattr(interface_, interface_.__clsconf__['attr']).values())
+    return {series_obj.name: {field_: series_obj.fields.get(field_) for field_ in
+                              ['unit', 'comments', 'reference_frame', 'data', 'timestamps', 'rate']}
+            for series_obj in series_}
+
+
+def through_csv(tables, out_dir):
+    """
+    :return: the pointers of the base_func_sheet to the CSV files of the tables, written into out_dir
+    """
+    write_tables(tables, out_dir)
+    main_info_dict = pd.read_csv(out_dir / 'main-info-sheet.csv', index_col='data/meta').to_dict()
+    for pointer_ in main_info_dict.values():
+        for dum_ in pointer_.keys():
+            pointer_[dum_] = out_dir / pointer_[dum_]
+    return main_info_dict
+
+
+def assert_same(in_memory, from_csv, name_):
+    """
+    asserts that a value built from memory is the one built from CSV, and that it is no nan passed on as text.
+    """
+    assert not (isinstance(in_memory, str) and in_memory.lower() in ['nan', '']), f'{name_} is {in_memory!r}'
+    if in_memory is None or isinstance(in_memory, (str, float, int)):
+        assert in_memory == from_csv or (pd.isnull(in_memory) and pd.isnull(from_csv)), \
+            f'{name_}: {in_memory!r} (in memory) vs. {from_csv!r} (CSV)'
+    else:
+        assert np.array_equal(np.asarray(in_memory), np.asarray(from_csv)), f'{name_} differ'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=1000)
+    args = parser.parse_args()
+
+    devices_meta = pd.DataFrame({'data_index': ['camera', 'amplifier'], 'name': ['camera', 'amplifier'],
+                                 'description': ['top view camera', 'nan'],
+                                 'manufacturer': [np.nan, 'NA']}).set_index('data_index')
+    print(f'pandas {pd.__version__}, dtype of the text columns: {devices_meta["description"].dtype}')
+    with tempfile.TemporaryDirectory() as tmp_:
+        out_dir = pathlib.Path(tmp_)
+        devices_meta.to_csv(out_dir / 'devices.csv')
+        rows_ = {path_: [feed_dict(row_, drop_nan=False)
+                         for row_ in meta_rows(read_meta(pointer_, index_col=0)).values()]
+                 for path_, pointer_ in [('memory', devices_meta), ('csv', out_dir / 'devices.csv')]}
+    for index_, row_ in enumerate(rows_['memory']):
+        assert row_.keys() == rows_['csv'][index_].keys(), 'the devices rows differ'
+        for key_, value_ in row_.items():
+            assert_same(value_, rows_['csv'][index_][key_], f'devices {index_}: {key_}')
+    print(f'devices fed with nan: {rows_["memory"]}')
+
+    for padded_ in [False, True]:
+        tables = session_tables(args.frames, padded_)
+        in_memory = nwb_series(main_info(tables))
+        with tempfile.TemporaryDirectory() as tmp_:
+            from_csv = nwb_series(through_csv(tables, pathlib.Path(tmp_)))
+        assert in_memory.keys() == from_csv.keys(), f'series differ: {in_memory.keys()} vs. {from_csv.keys()}'
+        for name_, fields_ in in_memory.items():
+            for field_, value_ in fields_.items():
+                assert_same(value_, from_csv[name_][field_], f'{name_}.{field_}')
+            print(f'{"padded" if padded_ else "ragged":<8}{name_:<16}unit: {fields_["unit"]!r:<10}'
+                  f'samples: {len(fields_["data"])}')
+    print('OK: the series and the devices rows are identical in memory and through CSV')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of the transfer of a recording (video) of a session: a synthetic recording is transferred by every method of
+video_transfer.transfer_video into a folder of the same filesystem (or of --target-dir, e.g., another drive or a
+network mount), and the checksums of the standard library are timed on it as well (CRC-32 of the streamed copy
+against blake2b). Note that the page cache of the system holds the source after its first read; drop it (or use a
+recording larger than the memory) for the cold numbers.
+
+usage:
+    python benchmarks/transfer_benchmark.py --size-mb 1024 --methods auto hardlink stream copy
+"""
+import argparse
+import hashlib
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.utilBase.video_transfer import transfer_video, transfer_methods, buffer_mb  # noqa: E402
+
+
+def checksum_s(path_, update):
+    """
+    :return: the time of reading the file through one buffer of buffer_mb and feeding it to update (s)
+    """
+
+    buffer_ = bytearray(buffer_mb * 2**20)
+    view_ = memoryview(buffer_)
+    start_ = time.perf_counter()
+    with open(path_, 'rb', buffering=0) as file_:
+        while True:
+            n_ = file_.readinto(buffer_)
+            if not n_:
+                break
+            update(view_[:n_])
+    return time.perf_counter() - start_
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=1024, help='size of the synthetic recording (MB)')
+    parser.add_argument('--methods', nargs='+', default=transfer_methods, choices=transfer_methods)
+    parser.add_argument('--target-dir', default=None, help='folder to transfer into (default: next to the source)')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_, tempfile.TemporaryDirectory(dir=args.target_dir) as target_dir:
+        source = pathlib.Path(tmp_) / 'recording.AVI'
+        with open(source, 'wb') as file_:
+            for _ in range(args.size_mb):
+                file_.write(os.urandom(2**20))
+        print(f'synthetic recording: {args.size_mb} MB, buffers: {buffer_mb} MB, best of {args.repeats}')
+        print(f'{"method":<10}{"used":<10}{"time (s)":>10}{"MB/s":>10}')
+        for method_ in args.methods:
+            times_ = []
+            for repeat_ in range(args.repeats):
+                target = pathlib.Path(target_dir) / f'{method_}_{repeat_}.AVI'
+                start_ = time.perf_counter()
+                used_ = transfer_video(source, target, method=method_)
+                times_.append(time.perf_counter() - start_)
+                os.remove(target)
+            print(f'{method_:<10}{used_:<10}{min(times_):>10.3f}{args.size_mb / min(times_):>10.0f}')
+
+        print(f'{"checksum":<20}{"time (s)":>10}{"MB/s":>10}')
+        crc_ = [0]
+
+        def crc_update(view_):
+            crc_[0] = zlib.crc32(view_, crc_[0])
+
+        for name_, update_ in [('crc32', crc_update), ('blake2b', hashlib.blake2b().update)]:
+            time_ = min(checksum_s(source, update_) for _ in range(args.repeats))
+            print(f'{name_:<20}{time_:>10.3f}{args.size_mb / time_:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
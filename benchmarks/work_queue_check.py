@@ -0,0 +1,114 @@
+"""
+Check of the work queue of a distributed batch (see dcl2nwb.mainBase.work_queue) on this machine: synthetic sessions
+are queued into a temporary folder and converted by several worker processes sharing it, with the conversion of each
+session stubbed (a small placeholder file instead of the NWB file). One worker dies while converting a session (its
+lease expires and the session is requeued by another worker), and the claim of a worker that crashed before is left
+truncated (recovered from the tasks of the batch). The results are merged and every session must be converted once.
+
+usage:
+    python benchmarks/work_queue_check.py --sessions 12 --workers 3 --lease 2
+"""
+import argparse
+import multiprocessing
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+from dcl2nwb.mainBase import work_queue  # noqa: E402
+from dcl2nwb.utilBase.manifest import source_fingerprint  # noqa: E402
+from dcl2nwb.utilBase.video_transfer import part_name  # noqa: E402
+
+crash_session = 2  # the session (cntr) whose first conversion kills its worker
+
+
+def stub_session(task, out_dir_path, **session_options):
+    """
+    stands in for batch_conversion.convert_session: writes a placeholder NWB file of the session; the first worker
+    converting crash_session dies on it (os._exit, as if killed), leaving its claim behind.
+    """
+
+    started_ = time.perf_counter()
+    time.sleep(0.2)
+    marker_ = out_dir_path / f'crashed_{task["cntr"]}'
+    if task['cntr'] == crash_session and not marker_.exists():
+        marker_.touch()
+        os._exit(1)
+    nwb_session_path = out_dir_path / f'{task["session_name"]}_NWB'
+    nwb_session_path.mkdir(exist_ok=True)
+    nwb_file_path = nwb_session_path / f'{task["session_name"]}_NWB-session.nwb'
+    tmp_file_path = nwb_session_path / part_name(nwb_file_path.name)
+    tmp_file_path.write_bytes(b'placeholder')
+    os.replace(tmp_file_path, nwb_file_path)
+    return {'cntr': task['cntr'], 'session': task['session_name'], 'session2csv': 'conversionSuccessful',
+            'csv2nwb': 'successful', 'session_path': task['session_path'], 'nwb_file': nwb_file_path,
+            'started': '', 'duration_s': round(time.perf_counter() - started_, 3),
+            'sources': source_fingerprint(task['session_path'])}
+
+
+def worker(out_dir_path, worker_id, lease_s):
+    """
+    a worker process: run_worker with the stubbed conversion.
+    """
+
+    work_queue.convert_session = stub_session
+    work_queue.run_worker(out_dir_path, worker_id=worker_id, lease_s=lease_s, heartbeat_s=lease_s / 4,
+                          poll_s=lease_s / 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--lease', type=float, default=2.0, help='lease of the workers (s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_:
+        root_ = pathlib.Path(tmp_)
+        rows_ = []
+        for cntr_ in range(args.sessions):
+            session_path = root_ / 'drive' / f'Line_M{cntr_}' / '20240101_Retrieval'
+            (session_path / 'complementary_exports').mkdir(parents=True)
+            (session_path / 'complementary_exports' / f'M{cntr_}_Events.mat').write_bytes(b'\0' * 1024 * cntr_)
+            rows_.append({'parUnique': [session_path], 'root': f'Line_M{cntr_}', 'Date': '20240101',
+                          'Paradigm': 'Retrieval', 'Experimenter': 'check', 'Behaviour': 0, 'HeartRate': 0,
+                          'Thermal': 0})
+        out_dir_path = root_ / 'NWBConversions-check'
+        out_dir_path.mkdir()
+        work_queue.queue_sessions(pd.DataFrame(rows_), out_dir_path, 'check', schedule='listed')
+
+        # the claim of a worker that crashed a lease ago, truncated
+        queue_dir = out_dir_path / work_queue.queue_name
+        truncated_path = queue_dir / 'claimed' / '000000@crashed.json'
+        os.rename(queue_dir / 'tasks' / '000000.json', truncated_path)
+        truncated_path.write_text('{"task": {"cntr": 0, "sess')
+        os.utime(truncated_path, (time.time() - 2 * args.lease,) * 2)
+
+        start_ = time.perf_counter()
+        processes_ = [multiprocessing.Process(target=worker, args=(out_dir_path, f'worker{index_}', args.lease))
+                      for index_ in range(args.workers)]
+        for process_ in processes_:
+            process_.start()
+        for process_ in processes_:
+            process_.join(timeout=60 + 10 * args.lease)
+        print(f'workers done in {time.perf_counter() - start_:.1f} s, exit codes: '
+              f'{[process_.exitcode for process_ in processes_]}')
+
+        conversion_report, results = work_queue.merge_queue(out_dir_path)
+        print(conversion_report[['session', 'session2csv', 'csv2nwb']].to_string())
+        left_ = (os.listdir(queue_dir / 'tasks') + os.listdir(queue_dir / 'claimed') +
+                 [name_ for name_ in os.listdir(queue_dir) if name_.endswith('.expired')])
+        assert sum(process_.exitcode == 1 for process_ in processes_) == 1, 'one worker should have died'
+        assert not left_, f'sessions left in the queue: {left_}'
+        assert sorted(result_['cntr'] for result_ in results) == list(range(args.sessions)), 'sessions lost'
+        assert all(result_['csv2nwb'] == 'successful' for result_ in results), 'sessions failed'
+        assert (out_dir_path / f'crashed_{crash_session}').exists(), 'the crash did not happen'
+        print(f'OK: {len(results)} sessions converted once by {args.workers} workers, one of which died')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,34 @@
 import runpy as rp
+import argparse
 from pathlib import Path
 from . import path_id  # to get the initialization of the directory
+from .mainBase.batch_conversion import convert_batch  # headless (non-interactive) batch conversion
+from .mainBase.work_queue import queue_batch, run_worker, merge_queue  # distributed batch conversion
+from .utilBase.storage_policy import parse_storage, storage_codecs, storage_modalities
+from .utilBase.video_transfer import transfer_methods
+from .utilBase.session_cost import schedule_orders
 
 
-def start_conversion():
+def start_conversion(scan_workers=1, workers=1, resume=None, **session_options):
+    """
+    :param scan_workers: number of threads listing the directories of the drive concurrently; values above 1 speed
+                         up the scan on network (SMB/NFS) mounts (default: 1, serial)
+    :param workers: number of sessions converted in parallel by a pool of processes (default: 1, serial)
+    :param resume: (optional) path of an existing NWBConversions-<now> folder to resume instead of creating a new one;
+                   the sessions already converted and unchanged since are skipped
+    :param session_options: keyword arguments passed on to the conversion of each session, e.g., intermediate='csv'
+                            to hand the tables over through CSV files, storage='gzip' to compress the datasets of
+                            the NWB files or transfer='hardlink' to link the recordings instead of copying them (see
+                            batch_conversion.convert_session), as well as transfer_workers, the number of threads
+                            transferring the recordings in the background, or prefetch, the number of sessions
+                            whose source files are read ahead, schedule, the order of the sessions, or
+                            memory_budget_mb, the cap of the summed estimated peak memory of the sessions
+                            converted at the same time (see batch_conversion.run_batch)
+    """
     global curr_
     path_ = curr_ / Path('mainBase/nwb_conversion_main.py')
-    rp.run_path(path_)
+    rp.run_path(path_, init_globals={'scan_workers': scan_workers, 'workers': workers, 'resume': resume,
+                                     'session_options': session_options})
 
 
 def generate_templates():
@@ -15,5 +37,143 @@ def generate_templates():
     rp.run_path(path_)
 
 
+def cli(argv=None):
+    """
+    console-script entry point (dcl2nwb-convert) of the headless batch conversion; see convert_batch.
+    :return: exit status; 0 if all the sessions with unique existence were successfully converted, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(prog='dcl2nwb-convert',
+                                     description='non-interactive batch conversion of DCL sessions into NWB')
+    parser.add_argument('input_root', help='root directory of the experiment containing all the sessions')
+    parser.add_argument('sessions_list', help='CSV table of all the sessions (sessionsList.csv)')
+    parser.add_argument('output_dir', help='folder in which the NWBConversions-<now> folder is created')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of sessions converted in parallel by a pool of processes (default: 1)')
+    parser.add_argument('--scan-workers', type=int, default=1,
+                        help='number of threads listing the directories of the drive (default: 1)')
+    parser.add_argument('--index-cache', default=None,
+                        help='SQLite file of the persistent index of the drive (default: no cache)')
+    parser.add_argument('--resume', default=None,
+                        help='existing NWBConversions-<now> folder to resume; only the sessions that failed, are '
+                             'missing or whose sources changed are (re-)converted')
+    parser.add_argument('--intermediate', choices=['memory', 'csv', 'parquet', 'feather', 'npz'], default='memory',
+                        help='hand-off of the session tables: in memory (default) or through files of the given '
+                             'format (debug/export)')
+    parser.add_argument('--storage', action='append', default=None, metavar='[MODALITY=]CODEC[:LEVEL]',
+                        help=f'chunking/compression of the NWB datasets; codecs: {", ".join(storage_codecs)}; '
+                             f'modalities: {", ".join(storage_modalities)}; repeatable, e.g., '
+                             f'--storage lzf --storage cardiac_data=gzip:6 (default: none, i.e., uncompressed)')
+    parser.add_argument('--rate-tolerance', type=lambda x: None if x == 'off' else float(x), default=1e-3,
+                        help='jitter (fraction of the sampling interval) up to which the timestamps of a series are '
+                             'stored as starting_time and rate instead; "off" to always store the timestamps '
+                             '(default: 1e-3)')
+    parser.add_argument('--transfer', choices=transfer_methods, default='auto',
+                        help='transfer of the recordings next to the NWB files: auto (clone where the filesystem '
+                             'supports it, otherwise copy), hardlink (link on the same filesystem, otherwise auto), '
+                             'stream (copy verified by checksum) or copy (default: auto)')
+    parser.add_argument('--transfer-workers', type=int, default=1,
+                        help='number of threads transferring the recordings in the background while the next '
+                             'sessions are converted; 0 to transfer them within each session (default: 1)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='number of upcoming sessions whose source files are read ahead into memory while the '
+                             'former ones are converted (default: 0, no read ahead)')
+    parser.add_argument('--prefetch-mb', type=int, default=2048,
+                        help='memory cap of the source files read ahead in MB (default: 2048)')
+    parser.add_argument('--scratch', default=None,
+                        help='local (e.g., SSD) folder to stage the source files of each session on for its '
+                             'conversion, along with its temporaries, instead of working on the drive (default: none)')
+    parser.add_argument('--schedule', choices=schedule_orders, default=None,
+                        help='order of the conversions: largest (longest estimated time first, from the sizes of the '
+                             'source files) or listed (order of the sessions list) (default: largest with --workers '
+                             'above 1 or --queue, otherwise listed)')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                        help='cap of the summed estimated peak memory of the sessions converted at the same time by '
+                             'the workers in MB (default: none, only capped by --workers)')
+    parser.add_argument('--queue', action='store_true',
+                        help='only scan the drive and queue the sessions for the workers of a distributed batch (see '
+                             'dcl2nwb-worker and dcl2nwb-merge); prints the NWBConversions-<now> folder to give them. '
+                             'Not combined with --workers, --transfer-workers, --prefetch, --prefetch-mb and '
+                             '--memory-budget-mb')
+    args = parser.parse_args(argv)
+
+    if args.queue:
+        # the options of a batch run by this process, which the workers of a distributed batch do not take
+        unused_ = [f'--{name_.replace("_", "-")}'
+                   for name_ in ['workers', 'transfer_workers', 'prefetch', 'prefetch_mb', 'memory_budget_mb']
+                   if getattr(args, name_) != parser.get_default(name_)]
+        if unused_:
+            parser.error(f'{", ".join(unused_)} cannot be combined with --queue (each worker of a distributed batch '
+                         f'converts one session after the other)')
+        out_dir_path = queue_batch(args.input_root, args.sessions_list, args.output_dir,
+                                   scan_workers=args.scan_workers, index_cache=args.index_cache, resume=args.resume,
+                                   schedule=args.schedule or 'largest',
+                                   intermediate=args.intermediate, transfer=args.transfer, scratch=args.scratch,
+                                   storage=parse_storage(args.storage, rate_tolerance=args.rate_tolerance))
+        if out_dir_path is None:
+            return 1
+        print(out_dir_path)
+        return 0
+
+    results = convert_batch(args.input_root, args.sessions_list, args.output_dir,
+                            workers=args.workers, scan_workers=args.scan_workers, index_cache=args.index_cache,
+                            resume=args.resume, transfer_workers=args.transfer_workers,
+                            prefetch=args.prefetch, prefetch_mb=args.prefetch_mb, schedule=args.schedule,
+                            memory_budget_mb=args.memory_budget_mb,
+                            intermediate=args.intermediate, transfer=args.transfer, scratch=args.scratch,
+                            storage=parse_storage(args.storage, rate_tolerance=args.rate_tolerance))
+    for result_ in results:
+        print(f"{result_['session']}: session2csv={result_['session2csv']}, csv2nwb={result_['csv2nwb']}, "
+              f"duration={result_['duration_s']}s")
+    return 0 if results and all(result_['csv2nwb'] == 'successful' for result_ in results) else 1
+
+
+def worker_cli(argv=None):
+    """
+    console-script entry point (dcl2nwb-worker) of a worker of a distributed batch; see work_queue.run_worker.
+    :return: exit status; 0 once no session is left to convert
+    """
+    parser = argparse.ArgumentParser(prog='dcl2nwb-worker',
+                                     description='worker of a distributed batch conversion of DCL sessions into NWB')
+    parser.add_argument('conversion_dir', help='NWBConversions-<now> folder of the batch, as queued by '
+                                               'dcl2nwb-convert --queue (on a drive shared by the nodes)')
+    parser.add_argument('--worker-id', default=None, help='name of the worker, unique over the nodes '
+                                                          '(default: <hostname>-<pid>)')
+    parser.add_argument('--lease', type=float, default=600,
+                        help='seconds without a heartbeat after which the session of a worker is requeued '
+                             '(default: 600)')
+    parser.add_argument('--heartbeat', type=float, default=30,
+                        help='seconds between two heartbeats of the worker (default: 30)')
+    parser.add_argument('--poll', type=float, default=10,
+                        help='seconds between two looks into the queue while the sessions left are converted by '
+                             'other workers (default: 10)')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help='number of expired leases after which a session is given up (default: 3)')
+    parser.add_argument('--scratch', default=None,
+                        help='local folder of this node to stage the source files of each session on (default: the '
+                             'one of the batch, if any)')
+    args = parser.parse_args(argv)
+
+    node_options = {'scratch': args.scratch} if args.scratch is not None else {}
+    run_worker(args.conversion_dir, worker_id=args.worker_id, lease_s=args.lease, heartbeat_s=args.heartbeat,
+               poll_s=args.poll, max_attempts=args.max_attempts, **node_options)
+    return 0
+
+
+def merge_cli(argv=None):
+    """
+    console-script entry point (dcl2nwb-merge) merging the results of a distributed batch; see work_queue.merge_queue.
+    :return: exit status; 0 if all the sessions were successfully converted, 1 otherwise (also while some are left)
+    """
+    parser = argparse.ArgumentParser(prog='dcl2nwb-merge',
+                                     description='merge of the results of a distributed batch conversion into one '
+                                                 'conversion report')
+    parser.add_argument('conversion_dir', help='NWBConversions-<now> folder of the batch')
+    args = parser.parse_args(argv)
+
+    conversion_report, results = merge_queue(args.conversion_dir)
+    finished_ = len(results) == len(conversion_report)
+    return 0 if finished_ and all(result_['csv2nwb'] == 'successful' for result_ in results) else 1
+
+
 curr_ = Path(path_id.__file__).parent  # dynamic path of the main.py container folder
 
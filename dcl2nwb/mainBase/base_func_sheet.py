@@ -13,6 +13,7 @@ from pynwb.file import Subject
 from pynwb.misc import IntervalSeries
 from pynwb.ogen import OptogeneticSeries
 from pynwb.image import ImageSeries
+from hdmf.common import VectorData
 from datetime import datetime
 from dateutil import tz
 import pandas as pd
@@ -29,6 +30,27 @@ from ndx_ecg import (
     ECGChannels
 )
 from pathlib import WindowsPath
+from dcl2nwb.utilBase.session_tables import read_meta, read_main, series_pair, interval_series, \
+    range_intervals, meta_rows, feed_dict, main_columns  # in-memory tables or their files
+from dcl2nwb.utilBase.storage_policy import h5_dataset, time_base, share_timestamps  # storage per modality
+
+
+def table_columns(table_type, df_):
+    """
+    A function to build the columns of a DynamicTable of ndx_ecg (ECGElectrodes, ECGChannels) at once from its meta
+    table, instead of adding its rows one by one.
+    :param table_type: the DynamicTable class
+    :param df_: the data frame of the meta table, with a column per column of the table (see table_type.__columns__);
+                the columns of the spec that the meta table does not have are skipped
+    :return: the keyword arguments id and columns of the table
+    """
+
+    return {
+        'id': list(range(len(df_))),
+        'columns': [VectorData(name=column_['name'], description=column_['description'],
+                               data=df_[column_['name']].tolist())
+                    for column_ in table_type.__columns__ if column_['name'] in df_.columns],
+    }
 
 
 # create the nwb_file
@@ -37,18 +59,15 @@ def session_information(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    dict_ = pd.read_csv(file_to_read).to_dict()
-    yr, mo, day = dict_['start_date'][0].split(', ')  # index 0 is for pandas convention
-    hr, mnt, sec = dict_['start_time'][0].split(', ')
+    row_ = next(iter(meta_rows(read_meta(file_to_read, index_col=0)).values()))  # the only row
+    yr, mo, day = row_['start_date'].split(', ')
+    hr, mnt, sec = row_['start_time'].split(', ')
     start_time = datetime(int(yr), int(mo), int(day),
                           int(hr), int(mnt), int(sec),
-                          tzinfo=tz.gettz(dict_['location'][0]))  # to be changed
+                          tzinfo=tz.gettz(row_['location']))  # to be changed
 
-    del dict_['start_date'], dict_['start_time'], dict_['location']  # not recognized by NWBFile
-    # build a new dict to feed NWBFile
-    dict_to_feed = {}
-    # since no index is set to DataFrame read onto the system, exclude the 0th element from keys()
-    [dict_to_feed.update({key_: dict_[key_][0]}) for key_ in list(dict_.keys())[1:]]
+    # build a new dict to feed NWBFile; start_date, start_time and location are not recognized by NWBFile
+    dict_to_feed = feed_dict(row_, exclude=['start_date', 'start_time', 'location'], drop_nan=False)
     dict_to_feed.update({'session_start_time': start_time})
     dict_to_feed.update({'keywords': dict_to_feed['keywords'].split(', ')})  # needs a list not a str type
     nwb_file = NWBFile(
@@ -63,11 +82,9 @@ def subject_information(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    dict_ = pd.read_csv(file_to_read).to_dict()
+    row_ = next(iter(meta_rows(read_meta(file_to_read, index_col=0)).values()))  # the only row
     # build a new dict to feed
-    dict_to_feed = {}
-    # since no index is set to DataFrame read onto the system, exclude the 0th element from keys()
-    [dict_to_feed.update({key_: dict_[key_][0]}) for key_ in list(dict_.keys())[1:]]
+    dict_to_feed = feed_dict(row_, drop_nan=False)
 
     # defining the subject
     nwb_file.subject = Subject(
@@ -82,13 +99,11 @@ def devices_information(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    df_ = pd.read_csv(file_to_read)
+    rows_ = meta_rows(read_meta(file_to_read, index_col=0))
 
-    for dum_ in list(df_.index.values):
+    for row_ in rows_.values():
         # build a new dict to feed
-        dict_to_feed = {}
-        # since no index is set to DataFrame read onto the system, exclude the 0th element from keys()
-        [dict_to_feed.update({key_: df_.loc[dum_][key_]}) for key_ in list(df_.keys()[1:])]
+        dict_to_feed = feed_dict(row_, drop_nan=False)
         device_obj = device.Device(
             **dict_to_feed
         )
@@ -102,13 +117,11 @@ def images_information(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    df_ = pd.read_csv(file_to_read)
+    rows_ = meta_rows(read_meta(file_to_read, index_col=0))
 
-    for dum_ in list(df_.index.values):
+    for row_ in rows_.values():
         # build a new dict to feed
-        dict_to_feed = {}
-        # since no index is set to DataFrame read onto the system, exclude the 0th element from keys()
-        [dict_to_feed.update({key_: df_.loc[dum_][key_]}) for key_ in list(df_.keys()[1:])]
+        dict_to_feed = feed_dict(row_, drop_nan=False)
         dict_to_feed.update({'format': 'external'})  # external format setting
         dict_to_feed.update({'external_file': [dict_to_feed['external_file']]})  # external format setting
         dict_to_feed.update({'device': nwb_file.get_device(dict_to_feed['device'])})  # external format setting
@@ -125,14 +138,12 @@ def ecg_device(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    df_ = pd.read_csv(file_to_read)
+    rows_ = meta_rows(read_meta(file_to_read, index_col=0))
 
-    for dum_ in list(df_.index.values):
-        dum_dev_pointer = nwb_file.get_device(df_.loc[dum_]['endpoint_recording_device'])  # get the main device
+    for row_ in rows_.values():
+        dum_dev_pointer = nwb_file.get_device(row_['endpoint_recording_device'])  # get the main device
         # build a new dict to feed
-        dict_to_feed = {}
-        # since no index is set to DataFrame read onto the system, exclude the 0th element from keys()
-        [dict_to_feed.update({key_: df_.loc[dum_][key_]}) for key_ in list(df_.keys()[1:])]
+        dict_to_feed = feed_dict(row_, drop_nan=False)
         # extra update
         dict_to_feed.update({'name': 'recording_device'})  # default name for future reference
         dict_to_feed.update({'endpoint_recording_device': dum_dev_pointer})
@@ -150,26 +161,23 @@ def acquisition(nwb_file, file_pointer):
     file_to_read_meta = file_pointer['metaData']  # name of file to read
     # if not file_to_read_meta.split('.')[-1] == 'csv':
     #     file_to_read_meta += '.csv'
-    df_meta = pd.read_csv(file_to_read_meta, index_col=0)  # set data_name as index
-    content_name_list = list(df_meta.index)  # listing the names of data content
+    rows_ = meta_rows(read_meta(file_to_read_meta, index_col=0))  # set data_name as index
 
     file_to_read_main = file_pointer['mainData']  # name of file to read
     # if not file_to_read_main.split('.')[-1] == 'csv':
     #     file_to_read_main += '.csv'
-    df_main = pd.read_csv(file_to_read_main)
+    df_main = read_main(file_to_read_main, columns=main_columns(rows_))  # only the used columns
 
-    for dum_ in content_name_list:
+    for dum_, row_ in rows_.items():
         # build a new dict to feed
-        dict_to_feed = {}
-        [dict_to_feed.update({key_: df_meta.loc[dum_][key_]}) for key_ in list(df_meta.keys())]
-        time_array = df_main[f'{dum_}_time'].to_numpy()
-        data_array = df_main[f'{dum_}_data'].to_numpy()
-        # logical exclusion of nan for array size difference
-        dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                             'data': data_array[~np.isnan(data_array)]})
+        dict_to_feed = feed_dict(row_, drop_nan=False)
+        time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+        dict_to_feed.update({'data': h5_dataset(data_array, 'acquisition')})
+        dict_to_feed.update(time_base(time_array, 'acquisition', dum_))  # starting_time/rate if uniform
         acquisition_obj = TimeSeries(
             **dict_to_feed
         )
+        share_timestamps(acquisition_obj, time_array)  # to be linked to by identical timestamps
         nwb_file.add_acquisition(acquisition_obj)
 
     return nwb_file
@@ -180,17 +188,16 @@ def processed_data(nwb_file, file_pointer):
     file_to_read_meta = file_pointer['metaData']  # name of file to read
     # if not file_to_read_meta.split('.')[-1] == 'csv':
     #     file_to_read_meta += '.csv'
-    df_meta = pd.read_csv(file_to_read_meta, index_col=0)  # set data_name as index
-    content_name_list = list(df_meta.index)  # listing the names of data content
+    df_meta = read_meta(file_to_read_meta, index_col=0)  # set data_name as index
+    rows_ = meta_rows(df_meta)
 
     file_to_read_main = file_pointer['mainData']  # name of file to read
     # if not file_to_read_main.split('.')[-1] == 'csv':
     #     file_to_read_main += '.csv'
-    df_main = pd.read_csv(file_to_read_main)
+    df_main = read_main(file_to_read_main, columns=main_columns(rows_))  # only the used columns
 
     # create modules
-    data_module_dict = {}
-    [data_module_dict.update({ind_: df_meta.loc[ind_]['module_name']}) for ind_ in content_name_list]
+    data_module_dict = {ind_: row_['module_name'] for ind_, row_ in rows_.items()}
     modules_nam = list(set(list(df_meta.module_name)))  # list of modules names in the processed data
     modules_des = list(set(list(df_meta.module_description)))  # list of modules descriptions in the processed data
     for dum_ in range(len(modules_nam)):
@@ -201,22 +208,16 @@ def processed_data(nwb_file, file_pointer):
             f')'
         )
 
-    for dum_ in content_name_list:
+    for dum_, row_ in rows_.items():
         # exclude ['module_name', 'module_description'] from metadata feed to TimeSeries
-        keys_to_exclude = ['module_name', 'module_description']
-        # print(keys_to_exclude)
-        # build a new dict to feed
-        dict_to_feed = {}
-        [dict_to_feed.update({key_: df_meta.loc[dum_][key_]}) for key_ in list(df_meta.keys())
-         if key_ not in keys_to_exclude]
-        time_array = df_main[f'{dum_}_time'].to_numpy()
-        data_array = df_main[f'{dum_}_data'].to_numpy()
-        # logical exclusion of nan for array size difference
-        dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                             'data': data_array[~np.isnan(data_array)]})
+        dict_to_feed = feed_dict(row_, exclude=['module_name', 'module_description'], drop_nan=False)
+        time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+        dict_to_feed.update({'data': h5_dataset(data_array, 'processed_data')})
+        dict_to_feed.update(time_base(time_array, 'processed_data', dum_))  # starting_time/rate if uniform
         processed_data_obj = TimeSeries(
             **dict_to_feed
         )
+        share_timestamps(processed_data_obj, time_array)  # to be linked to by identical timestamps
         eval(f'{data_module_dict[dum_]}_module').add(processed_data_obj)  # add processed data to it's module
 
     return nwb_file
@@ -227,13 +228,12 @@ def behavioral_data(nwb_file, file_pointer):
     file_to_read_meta = file_pointer['metaData']  # name of file to read
     # if not file_to_read_meta.split('.')[-1] == 'csv':
     #     file_to_read_meta += '.csv'
-    df_meta = pd.read_csv(file_to_read_meta, index_col=0)  # set data_name as index
-    content_name_list = list(df_meta.index)  # listing the names of data content
+    rows_ = meta_rows(read_meta(file_to_read_meta, index_col=0))  # set data_name as index
 
     file_to_read_main = file_pointer['mainData']  # name of file to read
     # if not file_to_read_main.split('.')[-1] == 'csv':
     #     file_to_read_main += '.csv'
-    df_main = pd.read_csv(file_to_read_main)
+    df_main = read_main(file_to_read_main, columns=main_columns(rows_))  # only the used columns
 
     # create module/object to start integration
     behavior_module = nwb_file.create_processing_module(
@@ -250,62 +250,55 @@ def behavioral_data(nwb_file, file_pointer):
         name='BehavioralEpochs'
     )
 
-    for dum_ in content_name_list:
-        # exclude nans from metadata
-        keys_to_exclude = ['interface_subtype']
-        [keys_to_exclude.append(key_) for key_ in list(df_meta.keys()) if pd.isnull(df_meta.loc[dum_][key_])]
-        # print(keys_to_exclude)
-        # build a new dict to feed
-        dict_to_feed = {}
-        [dict_to_feed.update({key_: df_meta.loc[dum_][key_]}) for key_ in list(df_meta.keys())
-         if key_ not in keys_to_exclude]
+    for dum_, row_ in rows_.items():
+        # build a new dict to feed (without the nans of the metadata)
+        dict_to_feed = feed_dict(row_, exclude=['interface_subtype'])
 
-        if df_meta.loc[dum_]['interface_subtype'] == 'position':
+        if row_['interface_subtype'] == 'position':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'data': h5_dataset(data_array, 'behavioral_data')})
+            dict_to_feed.update(time_base(time_array, 'behavioral_data', dum_))  # starting_time/rate if uniform
             spatial_series_obj = SpatialSeries(
                 **dict_to_feed
             )
+            share_timestamps(spatial_series_obj, time_array)  # to be linked to by identical timestamps
             position_obj.add_spatial_series(spatial_series_obj)
 
-        elif df_meta.loc[dum_]['interface_subtype'] == 'time_series':
+        elif row_['interface_subtype'] == 'time_series':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'data': h5_dataset(data_array, 'behavioral_data')})
+            dict_to_feed.update(time_base(time_array, 'behavioral_data', dum_))  # starting_time/rate if uniform
             time_series_obj = TimeSeries(
                 **dict_to_feed
             )
+            share_timestamps(time_series_obj, time_array)  # to be linked to by identical timestamps
             behavioral_time_series_obj.add_timeseries(time_series_obj)
 
-        elif df_meta.loc[dum_]['interface_subtype'] == 'epochs':
+        elif row_['interface_subtype'] == 'epochs':
 
-            time_array = df_main[f'{dum_}_time']
+            time_array = np.asarray(df_main[f'{dum_}_time'])
+            # the start(1)/stop(-1) stamps of intervals (see session_tables.interval_series) or a 0/1 value per frame
+            is_labelled = time_array.dtype.kind not in 'OSU' and np.any(np.asarray(df_main[f'{dum_}_data']) < 0)
 
-            if not isinstance(time_array[0], str):
-                time_array = time_array.to_numpy()
-                data_array = df_main[f'{dum_}_data'].to_numpy()
-                time_stamps = time_array[~np.isnan(data_array)]
-                data_ = data_array[~np.isnan(data_array)]
+            if time_array.dtype.kind not in 'OSU' and not is_labelled:
+                time_stamps, data_ = series_pair(df_main, dum_)  # without the padding of wide tables, if any
                 # preconditioning data
                 indexing_ = np.diff(data_)  # epoch starting and ending points with 1 and -1 respectively
                 transition_points = np.where(np.abs(indexing_) == 1)[0]  # [0] to avoid tuples
                 # the line below would return int dtype to get rid of a nwb warning
                 transition_labeling = indexing_[transition_points].astype('int')  # start(1) or end(-1) | qualitatively
                 """note:
-                assumption: if a behavior is observed at each frame then: '1', else: '0', so frame specific identification  
+                assumption: if a behavior is observed at each frame then: '1', else: '0', so frame specific
+                identification
                 the start time is exactly the first frame with 1;
                 the end time stamp of an epoch is the first 0 frame after the last 1,
                 this is the reason we move the arguments of the next line 1 step forward
                 the above line is qualitative so the indexing would make no problem in general
                 """
-                transition_time_stamps = time_stamps[transition_points + 1]  # start(1) or end(-1) time stamps of an epoch
+                # start(1) or end(-1) time stamps of an epoch
+                transition_time_stamps = time_stamps[transition_points + 1]
                 # check whether the session already started with an epoch
                 if np.any(transition_points) and indexing_[transition_points[0]] == -1:
                     transition_labeling = \
@@ -313,19 +306,22 @@ def behavioral_data(nwb_file, file_pointer):
                     transition_time_stamps =\
                         np.append(time_stamps[0], transition_time_stamps)
                 #
-                dict_to_feed.update({'timestamps': transition_time_stamps,
-                                     'data': transition_labeling})
-
-            elif isinstance(eval(time_array[0]), list):
-                transition_time_stamps = []
-                [transition_time_stamps.extend([float(eval(stamp_)[0]), float(eval(stamp_)[1])])
-                 for stamp_ in time_array if not pd.isnull(stamp_)]  # creating stamps from given ranges
-                transition_labeling = []
-                [transition_labeling.extend([1, -1]) for stamp_ in time_array
-                 if not pd.isnull(stamp_)]
+                dict_to_feed.update({'timestamps': h5_dataset(transition_time_stamps, 'behavioral_data'),
+                                     'data': h5_dataset(transition_labeling, 'behavioral_data')})
+
+            elif is_labelled:
+                transition_time_stamps, transition_labeling = series_pair(df_main, dum_)  # without the padding, if any
+                transition_labeling = np.asarray(transition_labeling).astype(np.int8)
                 #
-                dict_to_feed.update({'timestamps': transition_time_stamps,
-                                     'data': transition_labeling})
+                dict_to_feed.update({'timestamps': h5_dataset(transition_time_stamps, 'behavioral_data'),
+                                     'data': h5_dataset(transition_labeling, 'behavioral_data')})
+
+            else:
+                # the '[start, stop]' strings of the former tables, parsed at once into the start(1)/stop(-1) stamps
+                transition_time_stamps, transition_labeling = interval_series(range_intervals(time_array))
+                #
+                dict_to_feed.update({'timestamps': h5_dataset(transition_time_stamps, 'behavioral_data'),
+                                     'data': h5_dataset(transition_labeling, 'behavioral_data')})
 
             interval_series_obj = IntervalSeries(
                 **dict_to_feed
@@ -344,31 +340,22 @@ def stimulation_data(nwb_file, file_pointer):
     file_to_read_meta = file_pointer['metaData']  # name of file to read
     # if not file_to_read_meta.split('.')[-1] == 'csv':
     #     file_to_read_meta += '.csv'
-    df_meta = pd.read_csv(file_to_read_meta, index_col=0)  # set data_name as index
-    content_name_list = list(df_meta.index)  # listing the names of data content
+    rows_ = meta_rows(read_meta(file_to_read_meta, index_col=0))  # set data_name as index
 
     file_to_read_main = file_pointer['mainData']  # name of file to read
     # if not file_to_read_main.split('.')[-1] == 'csv':
     #     file_to_read_main += '.csv'
-    df_main = pd.read_csv(file_to_read_main)
+    df_main = read_main(file_to_read_main, columns=main_columns(rows_))  # only the used columns
 
-    for dum_ in content_name_list:
-        # exclude nans from metadata
-        keys_to_exclude = ['stim_type']
-        [keys_to_exclude.append(key_) for key_ in list(df_meta.keys()) if pd.isnull(df_meta.loc[dum_][key_])]
-        # print(keys_to_exclude)
-        # build a new dict to feed
-        dict_to_feed = {}
-        [dict_to_feed.update({key_: df_meta.loc[dum_][key_]}) for key_ in list(df_meta.keys())
-         if key_ not in keys_to_exclude]
+    for dum_, row_ in rows_.items():
+        # build a new dict to feed (without the nans of the metadata)
+        dict_to_feed = feed_dict(row_, exclude=['stim_type'])
 
-        if df_meta.loc[dum_]['stim_type'] == 'context':
+        if row_['stim_type'] == 'context':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'timestamps': h5_dataset(time_array, 'stimulation_data'),
+                                 'data': h5_dataset(data_array, 'stimulation_data')})
 
             time_series_obj = TimeSeries(
                 **dict_to_feed
@@ -376,13 +363,11 @@ def stimulation_data(nwb_file, file_pointer):
 
             nwb_file.add_stimulus(time_series_obj)
 
-        elif df_meta.loc[dum_]['stim_type'] == 'ogen':
+        elif row_['stim_type'] == 'ogen':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'timestamps': h5_dataset(time_array, 'stimulation_data'),
+                                 'data': h5_dataset(data_array, 'stimulation_data')})
             device_obj = nwb_file.get_device(
                 name=dict_to_feed['device']
             )
@@ -410,19 +395,13 @@ def ecg_electrodes(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    df_ = pd.read_csv(file_to_read)
+    df_ = read_meta(file_to_read)
+    # add electrodes, all rows at once
     ecg_electrodes_table = ECGElectrodes(
-        description='ECG recording electrodes table'
+        description='ECG recording electrodes table',
+        **table_columns(ECGElectrodes, df_)
     )
 
-    # add electrodes
-    for ind_ in list(df_.index):
-        ecg_electrodes_table.add_row(
-            electrode_name=df_.at[ind_, 'electrode_name'],
-            electrode_location=df_.at[ind_, 'electrode_location'],
-            electrode_info=df_.at[ind_, 'electrode_info']
-        )
-
     # adding the object of DynamicTable
     nwb_file.add_acquisition(ecg_electrodes_table)  # storage point for DT
 
@@ -434,20 +413,13 @@ def ecg_channels(nwb_file, file_pointer):
     file_to_read = file_pointer['metaData']  # name of file to read
     # if not file_to_read.split('.')[-1] == 'csv':
     #     file_to_read += '.csv'
-    df_ = pd.read_csv(file_to_read)
+    df_ = read_meta(file_to_read)
+    # add channels, all rows at once
     ecg_channels_table = ECGChannels(
-        description='ECG recording electrodes table'
+        description='ECG recording electrodes table',
+        **table_columns(ECGChannels, df_)
     )
 
-    # add electrodes
-    for ind_ in list(df_.index):
-        ecg_channels_table.add_row(
-            channel_name=df_.at[ind_, 'channel_name'],
-            channel_type=df_.at[ind_, 'channel_type'],
-            involved_electrodes=df_.at[ind_, 'involved_electrodes'],
-            channel_info=df_.at[ind_, 'channel_info']
-        )
-
     # adding the object of DynamicTable
     nwb_file.add_acquisition(ecg_channels_table)  # storage point for DT
 
@@ -459,13 +431,12 @@ def cardiac_data(nwb_file, file_pointer):
     file_to_read_meta = file_pointer['metaData']  # name of file to read
     # if not file_to_read_meta.split('.')[-1] == 'csv':
     #     file_to_read_meta += '.csv'
-    df_meta = pd.read_csv(file_to_read_meta, index_col=0)  # set data_name as index
-    content_name_list = list(df_meta.index)  # listing the names of data content
+    rows_ = meta_rows(read_meta(file_to_read_meta, index_col=0))  # set data_name as index
 
     file_to_read_main = file_pointer['mainData']  # name of file to read
     # if not file_to_read_main.split('.')[-1] == 'csv':
     #     file_to_read_main += '.csv'
-    df_main = pd.read_csv(file_to_read_main)
+    df_main = read_main(file_to_read_main, columns=main_columns(rows_))  # only the used columns
 
     # create module/object to start integration
     cardio_module = nwb_file.create_processing_module(
@@ -483,105 +454,96 @@ def cardiac_data(nwb_file, file_pointer):
     )
     nwb_file.add_lab_meta_data(ecg_recording_group)  # storage point for custom LMD
 
-    for dum_ in content_name_list:
-        # exclude nans from metadata
-        keys_to_exclude = ['processing_description', 'interface_subtype', 'interface_name', 'type']
-        # extend the exclusions
-        [keys_to_exclude.append(key_) for key_ in list(df_meta.keys()) if pd.isnull(df_meta.loc[dum_][key_])]
-        # print(keys_to_exclude)
-        # build a new dict to feed
-        dict_to_feed = {}
-        [dict_to_feed.update({key_: df_meta.loc[dum_][key_]}) for key_ in list(df_meta.keys())
-         if key_ not in keys_to_exclude]
+    for dum_, row_ in rows_.items():
+        # build a new dict to feed (without the nans of the metadata)
+        dict_to_feed = feed_dict(row_, exclude=['processing_description', 'interface_subtype', 'interface_name',
+                                                'type'])
 
-        if df_meta.loc[dum_]['interface_subtype'] == 'ECG':
+        if row_['interface_subtype'] == 'ECG':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'data': h5_dataset(data_array, 'cardiac_data')})
+            dict_to_feed.update(time_base(time_array, 'cardiac_data', dum_))  # starting_time/rate if uniform
             # extra update
             dict_to_feed.update({'recording_group': ecg_recording_group})
             #
             cardiac_series_obj = CardiacSeries(
                 **dict_to_feed
             )
+            share_timestamps(cardiac_series_obj, time_array)  # to be linked to by identical timestamps
             # go with default name
-            if pd.isnull(df_meta.loc[dum_]['interface_name']):
+            if pd.isnull(row_['interface_name']):
                 ecg_object = ECG(
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # also give it a name: should be used for more than one instance of each interface
             else:
                 ecg_object = ECG(
-                    name=df_meta.loc[dum_]['interface_name'],
+                    name=row_['interface_name'],
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # now writing:
-            if df_meta.loc[dum_]['type'] == 'R':
+            if row_['type'] == 'R':
                 # adding the raw acquisition of ECG to the nwb_file inside an 'ECG' container
                 nwb_file.add_acquisition(ecg_object)
-            elif df_meta.loc[dum_]['type'] == 'P':
+            elif row_['type'] == 'P':
                 # adding the processed ECG to the nwb_file inside an 'ECG' container, to cardio_module
                 cardio_module.add(ecg_object)
 
-        elif df_meta.loc[dum_]['interface_subtype'] == 'HR':
+        elif row_['interface_subtype'] == 'HR':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'data': h5_dataset(data_array, 'cardiac_data')})
+            dict_to_feed.update(time_base(time_array, 'cardiac_data', dum_))  # starting_time/rate if uniform
             # extra update
             dict_to_feed.update({'recording_group': ecg_recording_group})
             #
             cardiac_series_obj = CardiacSeries(
                 **dict_to_feed
             )
+            share_timestamps(cardiac_series_obj, time_array)  # to be linked to by identical timestamps
             # go with default name
-            if pd.isnull(df_meta.loc[dum_]['interface_name']):
+            if pd.isnull(row_['interface_name']):
                 hr_object = HeartRate(
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # also give it a name: should be used for more than one instance of each interface
             else:
                 hr_object = HeartRate(
-                    name=df_meta.loc[dum_]['interface_name'],
+                    name=row_['interface_name'],
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # adding the processed ECG to the nwb_file inside an 'ECG' container, to cardio_module
             cardio_module.add(hr_object)
 
-        elif df_meta.loc[dum_]['interface_subtype'] == 'AUX':
+        elif row_['interface_subtype'] == 'AUX':
 
-            time_array = df_main[f'{dum_}_time'].to_numpy()
-            data_array = df_main[f'{dum_}_data'].to_numpy()
-            # logical exclusion of nan for array size difference
-            dict_to_feed.update({'timestamps': time_array[~np.isnan(data_array)],
-                                 'data': data_array[~np.isnan(data_array)]})
+            time_array, data_array = series_pair(df_main, dum_)  # without the padding of wide tables, if any
+            dict_to_feed.update({'data': h5_dataset(data_array, 'cardiac_data')})
+            dict_to_feed.update(time_base(time_array, 'cardiac_data', dum_))  # starting_time/rate if uniform
             # extra update
             dict_to_feed.update({'recording_group': ecg_recording_group})
             #
             cardiac_series_obj = CardiacSeries(
                 **dict_to_feed
             )
+            share_timestamps(cardiac_series_obj, time_array)  # to be linked to by identical timestamps
             # go with default name
-            if pd.isnull(df_meta.loc[dum_]['interface_name']):
+            if pd.isnull(row_['interface_name']):
                 aux_object = AuxiliaryAnalysis(
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # also give it a name: should be used for more than one instance of each interface
             else:
                 aux_object = AuxiliaryAnalysis(
-                    name=df_meta.loc[dum_]['interface_name'],
+                    name=row_['interface_name'],
                     cardiac_series=[cardiac_series_obj],
-                    processing_description=df_meta.loc[dum_]['processing_description']
+                    processing_description=row_['processing_description']
                 )
             # adding the processed ECG to the nwb_file inside an 'ECG' container, to cardio_module
             cardio_module.add(aux_object)
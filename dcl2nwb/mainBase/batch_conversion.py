@@ -0,0 +1,567 @@
+from dcl2nwb.mainBase import base_func_sheet
+from dcl2nwb.mainBase.integration_from_csv import drive_scan
+from dcl2nwb.utilBase.session2csv import session2csv, session2tables
+from dcl2nwb.utilBase.session_tables import main_info
+from dcl2nwb.utilBase.manifest import source_fingerprint, load_manifest, save_manifest, manifest_entry, \
+    is_up_to_date, recordings_name
+from dcl2nwb.utilBase.instrumentation import StageTimer, stage, count, path_size, batch_summary, write_summary, \
+    track_peak_rss
+from dcl2nwb.utilBase.storage_policy import storage_policy, use_policy
+from dcl2nwb.utilBase import session_resources
+from dcl2nwb.utilBase.session_resources import preload_metadata, seed_metadata_cache, use_sources
+from dcl2nwb.utilBase.prefetch import SessionPrefetcher
+from dcl2nwb.utilBase.scratch_staging import staged_session
+from dcl2nwb.utilBase.video_transfer import transfer_video, transfer_methods, part_name
+from dcl2nwb.utilBase.session_cost import schedule_tasks, within_budget, cost_check
+from pynwb import NWBHDF5IO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+import pandas as pd
+import pathlib
+import shutil
+import time
+import os
+
+
+# color coding of the outprinted status
+class TextColor:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+def session_tasks(report_unq):
+    """
+    A function to turn the unique sessions of the scan report into self-contained (picklable) conversion tasks.
+    :param report_unq: the data frame of the sessions with unique existence, as returned by drive_scan
+    :return: a list of dicts, one per session, in the order of the report
+    """
+
+    tasks = []
+    for cntr, index_ in enumerate(list(report_unq.index)):
+        tasks.append({
+            'cntr': cntr,
+            'n_sessions': len(report_unq),
+            'session_path': report_unq.at[index_, 'parUnique'][0],
+            'session_name': (f"{report_unq.at[index_, 'root']}_"
+                             f"{report_unq.at[index_, 'Date']}_"
+                             f"{report_unq.at[index_, 'Paradigm']}"),
+            'experimenter': report_unq.at[index_, 'Experimenter'],
+            'convert_behavior': bool(report_unq.at[index_, 'Behaviour']),
+            'convert_cardiac': bool(report_unq.at[index_, 'HeartRate']),
+            'convert_thermal': bool(report_unq.at[index_, 'Thermal']),
+        })
+    return tasks
+
+
+def convert_session(task, out_dir_path, intermediate='memory', storage=None, transfer='auto', defer_transfer=False,
+                    prefetched=None, scratch=None):
+    """
+    A function to convert one session: session2csv and then csv2nwb via the functions of the base_func_sheet.
+    Never raises for the foreseeable errors; these are captured into the returned statuses instead.
+    The stages of the conversion (each loadmat, the write/read of the intermediate tables, each base_func_sheet
+    function, the video copy and the NWB write) are timed by a StageTimer of the session; its estimated cost (see
+    session_cost.schedule_tasks), if any, is counted as est_s and est_peak_mb next to the peak resident memory of the
+    process during the conversion (peak_rss_mb).
+    :param task: a dict describing the session, as generated by session_tasks
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :param intermediate: 'memory' to hand the tables of the session over to the base_func_sheet in memory (default),
+                         or the format of the files to write them into the session2csv folder of the session and read
+                         them back (debug/export mode): 'csv', 'parquet', 'feather' or 'npz'
+    :param storage: (optional) the chunking/compression of the datasets of the NWB file per modality; see
+                    storage_policy.storage_policy (default: None, contiguous and uncompressed)
+    :param transfer: the method of the transfer of the recording (video) next to the NWB file, one of
+                     video_transfer.transfer_methods (default: 'auto'); see video_transfer.transfer_video
+    :param defer_transfer: whether to leave the transfer of the recording to the caller (see finish_transfer) instead
+                           of blocking the session on it (default: False)
+    :param prefetched: (optional) the source files of the session read ahead into memory, as yielded by
+                       prefetch.SessionPrefetcher; their bytes, read_s and wait_s are counted as prefetch_bytes,
+                       prefetch_read_s and prefetch_wait_s
+    :param scratch: (optional) path of a local scratch folder to stage the source files of the session on and to
+                    write its temporaries into (e.g., the session2csv folder) instead of the session folder; see
+                    scratch_staging.staged_session (default: None, converted from the session folder)
+    :return: a dict of the conversion report entries of the session: cntr, session, session2csv and csv2nwb,
+             along with the session_path, the written nwb_file (None if not written), started and duration_s, the
+             transfer of the recording left to the caller (None if not deferred), the stages, counters and notes of
+             the timer and the timings (its extra columns of the conversion report)
+    """
+
+    timer = StageTimer()
+    prefetched_files = prefetched['files'] if prefetched is not None else {}
+    with timer.activate(), use_policy(storage_policy(storage)), \
+            staged_session(task, scratch, exclude=prefetched_files) as staged_:
+        if task.get('cost') is not None:
+            count('est_s', task['cost']['est_s'])
+            count('est_peak_mb', task['cost']['est_peak_mb'])
+        if prefetched is not None:
+            count('prefetch_bytes', prefetched['bytes'])
+            count('prefetch_read_s', prefetched['read_s'])
+            count('prefetch_wait_s', prefetched['wait_s'])  # idle, waiting for the reader
+        with use_sources({**staged_['files'], **prefetched_files} or None), track_peak_rss():
+            result = session_conversion(task, out_dir_path, intermediate=intermediate, transfer=transfer,
+                                        defer_transfer=defer_transfer, work_dir=staged_['dir'])
+    result['stages'] = timer.stages
+    result['counters'] = timer.counters
+    result['notes'] = timer.notes
+    result['timings'] = timer.report_columns()
+    if task.get('cost') is not None:
+        peak_ = timer.counters.get('peak_rss_mb')
+        print(f'{TextColor.OKCYAN}cost of {task["session_name"]}: {result["duration_s"]}s and '
+              f'{round(peak_) if peak_ is not None else "na"}MB at peak (estimated: {task["cost"]["est_s"]}s and '
+              f'{round(task["cost"]["est_peak_mb"])}MB){TextColor.ENDC}')
+    return result
+
+
+def session_conversion(task, out_dir_path, intermediate='memory', transfer='auto', defer_transfer=False,
+                       work_dir=None):
+    """
+    the conversion of one session behind convert_session (see there), with the stages timed by the active timer;
+    its temporaries are written into work_dir (the staging folder of the session), if given, or the session folder.
+    """
+
+    session_path = task['session_path']
+    nwb_session_path_name = task['session_name']
+    result = {'cntr': task['cntr'], 'session': nwb_session_path_name, 'session2csv': '', 'csv2nwb': '',
+              'session_path': session_path, 'nwb_file': None, 'transfer': None,
+              'started': datetime.now().isoformat(timespec='seconds'), 'duration_s': None}
+    start_ = time.perf_counter()
+    result['sources'] = source_fingerprint(session_path)  # taken before the conversion; see the manifest
+    print(f'######\n'
+          f'{TextColor.BOLD}({task["cntr"]+1}/{task["n_sessions"]}) evaluation of the following session path: \n'
+          f'{session_path}{TextColor.ENDC}')
+
+    path_to_csv = (work_dir or session_path) / 'session2csv'  # in the case of any csv generation this folder exists
+    # try blocking for the session2csv
+    try:
+        to_feed = {
+            'input_dir': session_path,
+            'experimenter': task['experimenter'],
+            'convert_behavior': task['convert_behavior'],
+            'convert_cardiac': task['convert_cardiac'],
+            'convert_thermal': task['convert_thermal'],
+            'description': 'na',  # temporary use for statesPaper | can be altered
+            'doi': 'https://doi.org/10.1038/s41593-022-01252-w',  # temporary use for statesPaper | can be altered
+            # temporary use for statesPaper | can be altered
+            'keywords': 'Integrated cardio-behavioral defensive states'
+        }
+
+        with stage('session2csv'):
+            if intermediate == 'memory':
+                status_, tables = session2tables(**to_feed)
+            else:
+                status_ = session2csv(**to_feed, intermediate_format=intermediate, out_dir=path_to_csv)
+    except Exception as error:
+        result['session2csv'] = f'{type(error).__name__}: {error}'
+        result['csv2nwb'] = 'na'
+        print(f'{TextColor.FAIL}ERROR CAPTURED (session2csv): The session2csv ran into an error '
+              f'-{type(error).__name__}: {error}- moving on to the next session...{TextColor.ENDC}')
+        result['duration_s'] = round(time.perf_counter() - start_, 3)
+        return result
+
+    result['session2csv'] = status_  # session2csv status update
+    print(f'{TextColor.OKBLUE}** status of the session2csv(): "{status_}" **{TextColor.ENDC}')
+
+    if status_ == 'conversionSuccessful':
+        # try blocking to move on in huge batch conversions and capture the error risen from base_func_sheet
+        try:
+            if intermediate != 'memory':
+                # read in the main-info-sheet
+                try:
+                    main_info_dict = pd.read_csv(path_to_csv / 'main-info-sheet.csv', index_col='data/meta').to_dict()
+                except FileNotFoundError:
+                    raise FileNotFoundError('could not find main-info-sheet.csv... check your directories!')
+                for pointer_ in main_info_dict.values():
+                    for dum_ in list(pointer_.keys()):
+                        # some time there is no mainData and only metaData, try blocking to account for this
+                        try:
+                            # to define absolute paths for each file (key)
+                            pointer_.update({dum_: path_to_csv / pointer_[dum_]})
+                        except:
+                            pass  # pass if the value is nan
+            else:
+                main_info_dict = main_info(tables)  # the pointers are the tables themselves
+            print(f'starting conversion of the session in the following directory to NWB... \n'
+                  f'{session_path}')
+            nwb_file = []  # to start with
+            for key_ in main_info_dict.keys():
+                with stage(f'bfs_{key_}'):
+                    nwb_file = getattr(base_func_sheet, key_)(nwb_file, main_info_dict[key_])
+            # print('successfully converted...')
+
+            # make relevant directory
+            nwb_session_path = out_dir_path / f'{nwb_session_path_name}_NWB'
+            pathlib.Path.mkdir(nwb_session_path, exist_ok=True)  # may exist from an earlier (failed) run
+
+            # make directory for external files
+            ext_file_path = nwb_session_path / recordings_name  # see the manifest
+            pathlib.Path.mkdir(ext_file_path, exist_ok=True)
+
+            # change the external path for the relevant path of the recordings
+            rec_path = pathlib.Path(
+                nwb_file.acquisition['behavior_recording'].external_file[0])  # as it is read as list
+            if defer_transfer:
+                # overlapping with the next sessions; the session is only reported once its recording is verified
+                result['transfer'] = {'source': rec_path, 'target': ext_file_path / rec_path.name, 'method': transfer}
+            else:
+                transfer_video(rec_path, ext_file_path / rec_path.name, method=transfer)
+            nwb_file.acquisition['behavior_recording'].fields['external_file'] = (
+                str(ext_file_path.relative_to(nwb_session_path) / rec_path.name))
+
+            # write it onto a temporary file first; only a completely written file gets the final name. The file is
+            # temporary per writer, since a session of a distributed batch may be converted once more by another
+            # worker while the worker whose lease expired is still writing it (see work_queue)
+            nwb_file_path = nwb_session_path / f'{nwb_session_path_name}_NWB-session.nwb'
+            tmp_file_path = nwb_session_path / part_name(nwb_file_path.name)
+            with stage('nwb_write') as counts_:
+                with NWBHDF5IO(tmp_file_path, 'w') as io:
+                    io.write(nwb_file)
+                counts_['bytes_written'] = path_size(tmp_file_path)
+            os.replace(tmp_file_path, nwb_file_path)
+
+            # delete the generated csv files; only now, since the large series may be streamed from (lazily read)
+            # files of the folder into the NWB file, which are released along with the nwb_file
+            if intermediate != 'memory':
+                nwb_file = None
+                shutil.rmtree(path_to_csv)
+            print(f'{TextColor.OKGREEN}** NWB session conversion was successful! **{TextColor.ENDC}')
+            result['csv2nwb'] = 'successful'
+            result['nwb_file'] = nwb_file_path
+        except Exception as error:
+            result['csv2nwb'] = f'{type(error).__name__}: {error}'
+            print(f'{TextColor.FAIL}ERROR CAPTURED (base_func_sheet): The csv2nwb ran into an error '
+                  f'-{type(error).__name__}: {error}- moving on to the next session...{TextColor.ENDC}')
+    else:
+        # delete the generated csv files, if any...
+        try:
+            shutil.rmtree(path_to_csv)
+        except:
+            pass
+        #
+        print(
+            f'{TextColor.FAIL}WARNING CAPTURED (session2csv): Incomplete CSV conversion... '
+            f'moving on to the next session...{TextColor.ENDC}')
+        result['csv2nwb'] = 'na'
+
+    result['duration_s'] = round(time.perf_counter() - start_, 3)
+    return result
+
+
+def finish_transfer(result):
+    """
+    A function to carry out the transfer of the recording left over by a session (see convert_session with
+    defer_transfer), e.g., by a thread of the batch while the next sessions are converted: it is timed into the stages
+    of the session and verified; a failed transfer fails the session. Never raises.
+    :param result: the result dict of the session, as returned by convert_session, with its pending transfer
+    :return: the same result dict, updated (statuses, stages, counters, notes and timings)
+    """
+
+    timer = StageTimer()
+    timer.stages, timer.counters, timer.notes = result['stages'], result['counters'], result['notes']
+    with timer.activate():
+        try:
+            transfer_video(**result['transfer'])
+        except Exception as error:
+            result['csv2nwb'] = f'{type(error).__name__}: {error}'
+            print(f'{TextColor.FAIL}ERROR CAPTURED (video transfer): The transfer of the recording of '
+                  f'{result["session"]} ran into an error -{type(error).__name__}: {error}-{TextColor.ENDC}')
+    result['timings'] = timer.report_columns()
+    return result
+
+
+def run_batch(report_unq, out_dir_path, now_, workers=1, resume=False, batch_stages=None, transfer_workers=1,
+              prefetch=0, prefetch_mb=2048, schedule=None, memory_budget_mb=None, **session_options):
+    """
+    A function to convert all the unique sessions, either one after the other or in parallel by a pool of processes.
+    The conversion report is rewritten after each session; since the results of the pool arrive out of order, its
+    rows are kept in the order of the sessions, so that the final report is the same as the one of the serial run.
+    The successfully written sessions are recorded, along with the fingerprints of their sources, in the manifest of
+    out_dir_path; in the resume mode, the sessions that are verified up to date against the manifest are skipped.
+    The timings of the stages of each session are added as extra columns of the conversion report, and the whole
+    instrumentation of the batch is written into conversion_summary_<now>.json (machine-readable).
+    :param report_unq: the data frame of the sessions with unique existence, as returned by drive_scan
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :param now_: unique starting time of the conversion process (for naming of the conversion log)
+    :param workers: number of sessions converted in parallel by separate processes (default: 1, serial); a worker
+                    process that dies (e.g., killed out of memory) fails the sessions in flight, the rest of the batch
+                    goes on in a new pool
+    :param resume: whether to skip the sessions already converted into out_dir_path and unchanged since
+    :param batch_stages: (optional) the stages dict of a StageTimer of the batch itself (e.g., the drive_scan) to be
+                         added to the summary
+    :param transfer_workers: number of threads transferring the recordings (videos) of the converted sessions in the
+                             background, while the next sessions are converted (default: 1); each session is reported
+                             once its recording is transferred and verified, all of them before the final report.
+                             0 to transfer each recording within the conversion of its session (blocking)
+    :param prefetch: number of upcoming sessions whose source files are read ahead into memory by a thread of the
+                     batch while the former ones are converted (pipelined mode; see prefetch.SessionPrefetcher), so
+                     that the reads from the drive overlap with the conversions (default: 0, no read ahead); with
+                     workers > 1, they are read into the page cache of the system instead, and read from there by the
+                     processes
+    :param prefetch_mb: the memory cap of the files read ahead in MB (default: 2048)
+    :param schedule: the order in which the sessions are converted, by their cost estimated from the sizes of their
+                     source files: 'largest' for the longest first, 'listed' for the order of the sessions list; see
+                     session_cost.schedule_tasks (default: None, 'largest' with workers > 1, otherwise 'listed', since
+                     the order only shortens the batch when several sessions are converted at the same time). The
+                     costs are only estimated for 'largest' or a memory_budget_mb of the pool; the estimated and the
+                     actual costs of each session are then counted into its report (est_s, est_peak_mb and
+                     peak_rss_mb) and compared in the summary
+    :param memory_budget_mb: (optional) the cap of the summed estimated peak memory of the sessions converted at the
+                             same time by the pool of processes in MB; the next session waits for the running ones
+                             until it fits (default: None, only capped by workers)
+    :param session_options: keyword arguments passed on to convert_session, e.g., intermediate
+    :return: a tuple of the data frame of the conversion report and the list of the result dicts of the sessions
+             (as returned by convert_session), in the order of the sessions
+    """
+
+    storage_policy(session_options.get('storage'))  # an invalid policy fails here, not in each session
+    if session_options.get('transfer', 'auto') not in transfer_methods:
+        raise ValueError(f'unknown video transfer method: {session_options["transfer"]} '
+                         f'(one of {", ".join(transfer_methods)})')
+    if schedule is None:
+        schedule = 'largest' if workers > 1 else 'listed'
+    tasks = schedule_tasks(session_tasks(report_unq), order=schedule,
+                           estimate=memory_budget_mb is not None and workers > 1)
+    report_path = out_dir_path / f'conversion_report_{now_}.csv'
+    summary_path = out_dir_path / f'conversion_summary_{now_}.json'
+    conversion_report = pd.DataFrame()  # to write the conversion report
+    conversion_report['session'] = ''
+    conversion_report['session2csv'] = ''
+    conversion_report['csv2nwb'] = ''
+
+    results = []
+    manifest = load_manifest(out_dir_path)
+
+    def update_report(result):
+        results.append(result)
+        for key_ in ['session', 'session2csv', 'csv2nwb']:
+            conversion_report.at[result['cntr'], key_] = result[key_]
+        for key_, value_ in result.get('timings', {}).items():
+            conversion_report.at[result['cntr'], key_] = value_  # extra columns; empty for the sessions without
+        conversion_report.sort_index().to_csv(report_path)
+        write_summary(summary_path, batch_summary(sorted(results, key=lambda result_: result_['cntr']),
+                                                  batch_stages=batch_stages, now=now_, workers=workers,
+                                                  transfer_workers=transfer_workers, prefetch=prefetch,
+                                                  prefetch_mb=prefetch_mb, schedule=schedule,
+                                                  memory_budget_mb=memory_budget_mb, session_options=session_options,
+                                                  cost_check=cost_check(results)))
+        if result['csv2nwb'] == 'successful' and result.get('sources') is not None:
+            manifest[result['session']] = manifest_entry(out_dir_path, result['nwb_file'], result['sources'])
+        else:
+            manifest.pop(result['session'], None)  # failed (or not converted); to be redone by the next resume
+        save_manifest(out_dir_path, manifest)
+
+    transfers = {}  # future of a background transfer -> the result dict of its session, reported once it is done
+    transfer_executor = ThreadPoolExecutor(max_workers=transfer_workers) if transfer_workers > 0 else None
+
+    def report_done_transfers(block=False):
+        # the finished transfers (all of them, if block) are reported
+        if transfers:
+            done_, _ = wait(list(transfers), timeout=None if block else 0)
+            for future_ in sorted(done_, key=lambda future_: transfers[future_]['cntr']):
+                update_report(future_.result())
+                transfers.pop(future_)
+
+    def report_or_transfer(result):
+        if result.get('transfer') is not None:
+            transfers[transfer_executor.submit(finish_transfer, result)] = result
+        else:
+            update_report(result)
+        report_done_transfers()
+
+    if resume:
+        to_convert = []
+        for task_ in tasks:
+            fingerprint = source_fingerprint(task_['session_path'])
+            entry_ = manifest.get(task_['session_name'])
+            if is_up_to_date(out_dir_path, entry_, fingerprint):
+                print(f'{TextColor.OKCYAN}({task_["cntr"]+1}/{task_["n_sessions"]}) {task_["session_name"]} is '
+                      f'already converted and unchanged... skipping...{TextColor.ENDC}')
+                update_report({'cntr': task_['cntr'], 'session': task_['session_name'],
+                               'session2csv': 'upToDate', 'csv2nwb': 'successful',
+                               'session_path': task_['session_path'], 'nwb_file': out_dir_path / entry_['nwb_file'],
+                               'started': '', 'duration_s': 0.0, 'sources': fingerprint})
+            else:
+                to_convert.append(task_)
+        tasks = to_convert
+
+    def report_future(future_, task_):
+        try:
+            result = future_.result()
+        except Exception as error:
+            # the worker itself failed (e.g., killed out of memory); the rest of the batch goes on
+            result = {'cntr': task_['cntr'], 'session': task_['session_name'],
+                      'session2csv': f'{type(error).__name__}: {error}', 'csv2nwb': 'na',
+                      'session_path': task_['session_path'], 'nwb_file': None,
+                      'started': '', 'duration_s': None, 'sources': None}
+            print(f'{TextColor.FAIL}ERROR CAPTURED (worker): The conversion of {task_["session_name"]} '
+                  f'ran into an error -{type(error).__name__}: {error}-{TextColor.ENDC}')
+        report_or_transfer(result)
+
+    # the sessions along with their source files read ahead, if so (pipelined mode), as soon as they are
+    prefetcher = SessionPrefetcher(tasks, depth=prefetch, memory_mb=prefetch_mb,
+                                   in_memory=workers <= 1) if prefetch > 0 else None
+    pipeline_ = iter(prefetcher) if prefetcher is not None else ((task_, None) for task_ in tasks)
+
+    if workers > 1:
+        # the metadata files shared by the sessions are loaded once here and handed over to every process
+        metadata_ = preload_metadata([task_['session_path'] for task_ in tasks])
+
+        def start_pool():
+            return ProcessPoolExecutor(max_workers=workers, initializer=seed_metadata_cache,
+                                       initargs=(metadata_, session_resources.lines_main_path))
+
+        pool_ = [start_pool()]
+        futures = {}  # future -> task of the sessions in flight (submitted), never more than workers
+
+        def report_futures(block=True):
+            # the finished sessions (at least one, if block) are reported; a worker that dies (e.g., killed out of
+            # memory) breaks the whole pool and all the sessions in flight fail along with it: they are reported as
+            # failed and a new pool is started for the sessions not submitted yet
+            done_, _ = wait(list(futures), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            if any(isinstance(future_.exception(), BrokenProcessPool) for future_ in done_):
+                done_, _ = wait(list(futures))
+                restart_pool(sum(isinstance(future_.exception(), BrokenProcessPool) for future_ in done_))
+            for future_ in sorted(done_, key=lambda future_: futures[future_]['cntr']):
+                report_future(future_, futures.pop(future_))
+
+        def restart_pool(n_failed=0):
+            print(f'{TextColor.FAIL}ERROR CAPTURED (worker): A worker process died; the "{n_failed}" sessions in '
+                  f'flight failed along, the pool of processes is restarted for the rest...{TextColor.ENDC}')
+            pool_[0].shutdown(wait=False)
+            pool_[0] = start_pool()
+
+        try:
+            for task_, prefetched in pipeline_:
+                # at most workers sessions in flight, which never sum up to more than the memory budget (a larger one
+                # runs alone), so that the sessions not submitted yet are untouched by a broken pool
+                while futures and (len(futures) >= workers or
+                                   not within_budget(futures.values(), task_, memory_budget_mb)):
+                    report_futures()
+                while True:
+                    try:
+                        future_ = pool_[0].submit(convert_session, task_, out_dir_path,
+                                                  defer_transfer=transfer_workers > 0, prefetched=prefetched,
+                                                  **session_options)
+                        break
+                    except BrokenProcessPool:
+                        if futures:
+                            report_futures()  # the broken pool is noticed by the sessions in flight
+                        else:
+                            restart_pool()
+                if prefetched is not None:
+                    future_.add_done_callback(lambda _, prefetched=prefetched: prefetcher.release(prefetched))
+                futures[future_] = task_
+                report_futures(block=False)  # while the next sessions are still read ahead
+            while futures:
+                report_futures()
+        finally:
+            pool_[0].shutdown()
+    else:
+        for task_, prefetched in pipeline_:
+            result = convert_session(task_, out_dir_path, defer_transfer=transfer_workers > 0, prefetched=prefetched,
+                                     **session_options)
+            if prefetcher is not None:
+                prefetcher.release(prefetched)
+            report_or_transfer(result)
+
+    # all the recordings are transferred and verified before the final report
+    report_done_transfers(block=True)
+    if transfer_executor is not None:
+        transfer_executor.shutdown()
+
+    return conversion_report.sort_index(), sorted(results, key=lambda result_: result_['cntr'])
+
+
+def scan_batch(input_root, sessions_list, output_dir, scan_workers=1, index_cache=None, resume=None):
+    """
+    A function to scan the drive for the sessions of a batch, without any interaction: creates a new
+    NWBConversions-<now> folder inside output_dir (or takes the one to resume) and writes the scan report into it.
+    :param input_root: path of the main root on the drive persumably containing all the sessions
+    :param sessions_list: path of the CSV table of all the sessions (sessionsList.csv)
+    :param output_dir: path of the folder in which the NWBConversions-<now> folder is created
+    :param scan_workers: number of threads listing the directories of the drive concurrently (default: 1, serial)
+    :param index_cache: (optional) path of the persistent index of the drive to revalidate and reuse across the runs
+    :param resume: (optional) path of an existing NWBConversions-<now> folder to write into instead of a new folder
+    :return: a tuple of the path object of the NWBConversions folder, the starting time of the run (<now>), the data
+             frame of the sessions with unique existence (None if there are none) and the stages dict of the scan
+    """
+
+    in_dir_path = pathlib.Path(input_root)
+    in_dir_file = pathlib.Path(sessions_list)
+    now_ = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if resume is not None:
+        out_dir_path = pathlib.Path(resume)  # the reports of this run are added next to the former ones
+    else:
+        out_dir_path = pathlib.Path(output_dir) / f'NWBConversions-{now_}'
+        # several runs may start within the same second (e.g., on several nodes); never reuse an existing folder
+        suffix_ = 0
+        while True:
+            try:
+                pathlib.Path.mkdir(out_dir_path, parents=True)
+                break
+            except FileExistsError:
+                suffix_ += 1
+                out_dir_path = pathlib.Path(output_dir) / f'NWBConversions-{now_}-{suffix_}'
+
+    batch_timer = StageTimer()
+    with batch_timer.stage('drive_scan'):
+        report_ = drive_scan(in_dir_path, in_dir_file, out_dir_path, now_,
+                             index_cache=index_cache, scan_workers=scan_workers)
+    report_unq = report_[report_['uniqueExistence'] == True]  # choose only the ones with the unique existence
+    if report_unq.empty:
+        print(f'{TextColor.FAIL}NO unique sessions were found! check your inputs...{TextColor.ENDC}')
+        return out_dir_path, now_, None, batch_timer.stages
+    print(f'{TextColor.OKBLUE}"{len(report_unq)}" out of "{len(report_)}" were found as '
+          f'unique sessions...{TextColor.ENDC}')
+    return out_dir_path, now_, report_unq, batch_timer.stages
+
+
+def convert_batch(input_root, sessions_list, output_dir, workers=1, scan_workers=1, index_cache=None, resume=None,
+                  transfer_workers=1, prefetch=0, prefetch_mb=2048, schedule=None, memory_budget_mb=None,
+                  **session_options):
+    """
+    A function to run a whole batch conversion without any interaction (no dialogs, no prompts), e.g., on headless
+    compute nodes or from a job scheduler: scans the drive, converts all the sessions with unique existence and
+    writes the scan and conversion reports into a new NWBConversions-<now> folder inside output_dir.
+    :param input_root: path of the main root on the drive persumably containing all the sessions
+    :param sessions_list: path of the CSV table of all the sessions (sessionsList.csv)
+    :param output_dir: path of the folder in which the NWBConversions-<now> folder is created
+    :param workers: number of sessions converted in parallel by a pool of processes (default: 1, serial)
+    :param scan_workers: number of threads listing the directories of the drive concurrently (default: 1, serial)
+    :param index_cache: (optional) path of the persistent index of the drive to revalidate and reuse across the runs
+    :param resume: (optional) path of an existing NWBConversions-<now> folder to resume: the conversions are written
+                   into it instead of a new folder, and only the sessions that failed, are missing or whose sources
+                   changed are (re-)converted
+    :param transfer_workers: number of threads transferring the recordings in the background (default: 1); 0 to
+                             transfer each recording within the conversion of its session; see run_batch
+    :param prefetch: number of upcoming sessions whose source files are read ahead into memory while the former ones
+                     are converted (default: 0, no read ahead); see run_batch
+    :param prefetch_mb: the memory cap of the files read ahead in MB (default: 2048)
+    :param schedule: 'largest' to convert the sessions of the longest estimated time first, 'listed' for the order
+                     of the sessions list (default: None, 'largest' with workers > 1, otherwise 'listed'); see
+                     run_batch
+    :param memory_budget_mb: (optional) the cap of the summed estimated peak memory of the sessions converted at the
+                             same time in MB; see run_batch
+    :param session_options: keyword arguments passed on to convert_session, e.g., intermediate='csv',
+                            storage={'cardiac_data': 'gzip', 'default': 'lzf'} or transfer='hardlink'
+    :return: the list of the result dicts of the sessions with unique existence (as returned by convert_session),
+             in the order of the sessions; an empty list if no unique sessions were found
+    """
+
+    out_dir_path, now_, report_unq, batch_stages = scan_batch(input_root, sessions_list, output_dir,
+                                                              scan_workers=scan_workers, index_cache=index_cache,
+                                                              resume=resume)
+    if report_unq is None:
+        return []
+
+    _, results = run_batch(report_unq, out_dir_path, now_, workers=workers, resume=resume is not None,
+                           batch_stages=batch_stages, transfer_workers=transfer_workers, prefetch=prefetch,
+                           prefetch_mb=prefetch_mb, schedule=schedule, memory_budget_mb=memory_budget_mb,
+                           **session_options)
+    return results
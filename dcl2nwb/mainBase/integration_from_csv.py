@@ -1,112 +1,100 @@
 import pandas as pd
 import warnings
+from dcl2nwb.utilBase.drive_index import DriveIndex
 
 
-def drive_scan(in_dir, in_dir_file, out_dir, now_):
+def drive_scan(in_dir, in_dir_file, out_dir, now_, index_cache=None, scan_workers=1):
     """
     A function to scan the drive to analyze the unique existence of the sessions.
     :param in_dir: a path object pointing to the main root on the drive persumably containing all the sessions
     :param in_dir_file: a path object pointing to the CSV table of all the sessions (sessionsList.csv)
     :param out_dir: a path to which the final conversions and the reporting logs will be written
     :param now_: unique starting time of the conversion process (for naming of the scan log)
-    :return: an extended data frame of the input sessionsList
+    :param index_cache: (optional) path of the persistent index of the drive to revalidate and reuse across the runs
+    :param scan_workers: number of threads listing the directories of the drive concurrently (default: 1, serial)
+    :return: an extended data frame of the input sessionsList; the found directories are lists of path objects
     """
 
     list_df = pd.read_csv(in_dir_file, dtype={'Line': 'object', 'MouseID': 'object'})  # control; since they're added
     list_df['root'] = list_df['Line'] + list_df['MouseID'].apply(lambda x: f'_{x}')
-    list_df = list_df.groupby(['root']).apply(lambda x: x)  # grouped by the root folder name
+    list_df = list_df.sort_values('root', kind='stable')  # grouped by the root folder name, in the order of the list
     list_df['rootUnique'] = ''  # to be valued in the following
     list_df['rootMulti'] = ''  # to be valued in the following
     list_df['parUnique'] = ''  # to be valued in the following
     list_df['parMulti'] = ''  # to be valued in the following
-    list_df['uniqueExistence'] = ''
+    list_df['uniqueExistence'] = pd.Series('', index=list_df.index, dtype=object)  # '' or True; not a str column
+
+    # one single walk of the drive; all the rows are answered from this index hereafter
+    print(f'indexing the directories of the drive under: \n'
+          f'{in_dir}')
+    drive_index = DriveIndex(in_dir, cache_path=index_cache, workers=scan_workers)
+    if index_cache is not None:
+        print(f'{drive_index.n_reused} directories reused from the index cache, '
+              f'{drive_index.n_listed} directories (re-)listed from the drive...')
+    if drive_index.n_skipped:
+        warnings.warn(f'{drive_index.n_skipped} unreadable directories (permissions, vanished) were skipped...')
+    root_cache = {}  # root-name -> list of matching directories | reused by all the rows of the same root
 
-    is_similar = False  # default value to start with...
     index_list = list(list_df.index)
+    # typed cells of the found directories | assigned to the data frame after the loop
+    path_cells = {col_: ['' for _ in index_list] for col_ in ['rootUnique', 'rootMulti', 'parUnique', 'parMulti']}
     for i in range(len(index_list)):
         root_ = list_df.at[index_list[i], 'root']
         date_ = list_df.at[index_list[i], 'Date']
         paradigm_ = list_df.at[index_list[i], 'Paradigm']
         print(f'({i+1}/{len(index_list)}): Searching for {root_}/{date_}_{paradigm_}...')
-        # taking care of the first element's error
-        try:
-            is_similar = list_df.at[index_list[i-1], 'root'] == root_  # check similarity to avoid duplicate glob scan!
-        except:
-            pass
-        # specific scan
-        if not is_similar:
-            # print('is NOT similar!!!')  # just a control check
-            rglob_list = list(in_dir.rglob(root_))  # list of the generator | generator would be dead hereafter
-            # primary check
-            if not rglob_list:
-                # nothing returned
-                print(in_dir)
-                print(in_dir_file)
-                print(root_)
-                warnings.warn(f'NO matching directory could be found for the following root-name (ignoring...): \n'
+        is_known = root_ in root_cache  # whether the root is already searched for (by any of the previous rows)
+        if not is_known:
+            root_cache[root_] = drive_index.find(root_)
+        rglob_list = root_cache[root_]
+        # primary check
+        if not rglob_list:
+            # nothing returned
+            if is_known:
+                warnings.warn(f'the warning above for the following root-name applies here, too: \n'
                               f'{root_}')
-                is_found = False
                 continue
-            elif len(rglob_list) > 1:
-                # not unique
-                warnings.warn(f'MULTIPLE matching directories found for the following root-name (ignoring...): \n'
+            print(in_dir)
+            print(in_dir_file)
+            print(root_)
+            warnings.warn(f'NO matching directory could be found for the following root-name (ignoring...): \n'
+                          f'{root_}')
+            continue
+        elif len(rglob_list) > 1:
+            # not unique
+            if is_known:
+                warnings.warn(f'the warning above for the following root-name applies here, too: \n'
                               f'{root_}')
-                is_found = False  # as good as NO found
-                list_df.at[index_list[i], 'rootMulti'] = str(rglob_list)
                 continue
-            # if passed
+            warnings.warn(f'MULTIPLE matching directories found for the following root-name (ignoring...): \n'
+                          f'{root_}')
+            path_cells['rootMulti'][i] = rglob_list
+            continue
+        # if passed
+        if not is_known:
             print(f'** found the root file for: {root_}')
-            is_found = True
-            list_df.at[index_list[i], 'rootUnique'] = str(rglob_list)
-            # paradigm
-            # date_ = list_df.at[index_list[i], 'Date']
-            # paradigm_ = list_df.at[index_list[i], 'Paradigm']
-            sub_rglob_list = list(rglob_list[0].glob(f'*{date_}_{paradigm_}'))
-            # final check
-            if not sub_rglob_list:
-                # nothing returned
-                warnings.warn(f'NO matching directory could be found for the following date_paradigm (ignoring...): \n'
-                              f'{date_}_{paradigm_}')
-                continue
-            elif len(sub_rglob_list) > 1:
-                # not unique
-                warnings.warn(f'MULTIPLE matching directories found for the following date_paradigm (ignoring...): \n'
-                              f'{date_}_{paradigm_}')
-                list_df.at[index_list[i], 'parMulti'] = str(sub_rglob_list)
-                continue
-            # if passed:
-            print(f'** and found the following date_paradigm: {date_}_{paradigm_}')
-            list_df.at[index_list[i], 'parUnique'] = str(sub_rglob_list)
-            list_df.at[index_list[i], 'uniqueExistence'] = True
-
-        elif is_similar and is_found:
-            # print('is similar and is found!!!')  # just a control check
-            list_df.at[index_list[i], 'rootUnique'] = str(rglob_list)  # just to fill the cell
-            # paradigm
-            # date_ = list_df.at[index_list[i], 'Date']
-            # paradigm_ = list_df.at[index_list[i], 'Paradigm']
-            sub_rglob_list = list(rglob_list[0].glob(f'*{date_}_{paradigm_}'))  # uses the last found rglob_list
-            # final check
-            if not sub_rglob_list:
-                # nothing returned
-                warnings.warn(f'NO matching directory could be found for the following date_paradigm (ignoring...): \n'
-                              f'{date_}_{paradigm_}')
-                continue
-            elif len(sub_rglob_list) > 1:
-                # not unique
-                warnings.warn(f'MULTIPLE matching directories found for the following date_paradigm (ignoring...): \n'
-                              f'{date_}_{paradigm_}')
-                list_df.at[index_list[i], 'parMulti'] = str(sub_rglob_list)
-                continue
-            # if passed:
-            print(f'** and found the following date_paradigm: {date_}_{paradigm_}')
-            list_df.at[index_list[i], 'parUnique'] = str(sub_rglob_list)
-            list_df.at[index_list[i], 'uniqueExistence'] = True
-
-        elif is_similar and not is_found:
-            # print('is similar and is NOT found!!!')  # just a control check
-            warnings.warn('the LATEST warning applies here, too!')
+        path_cells['rootUnique'][i] = rglob_list
+        # paradigm
+        sub_rglob_list = drive_index.find_children(rglob_list[0], f'*{date_}_{paradigm_}')
+        # final check
+        if not sub_rglob_list:
+            # nothing returned
+            warnings.warn(f'NO matching directory could be found for the following date_paradigm (ignoring...): \n'
+                          f'{date_}_{paradigm_}')
+            continue
+        elif len(sub_rglob_list) > 1:
+            # not unique
+            warnings.warn(f'MULTIPLE matching directories found for the following date_paradigm (ignoring...): \n'
+                          f'{date_}_{paradigm_}')
+            path_cells['parMulti'][i] = sub_rglob_list
+            continue
+        # if passed:
+        print(f'** and found the following date_paradigm: {date_}_{paradigm_}')
+        path_cells['parUnique'][i] = sub_rglob_list
+        list_df.at[index_list[i], 'uniqueExistence'] = True
 
+    for col_, cells_ in path_cells.items():
+        list_df[col_] = pd.Series(cells_, index=list_df.index, dtype=object)
     list_df = list_df.reset_index(drop=True)  # getting rid of the stupid index; back to beautiful integers
     output_path = out_dir / f'scan_report_{now_}.csv'
     list_df.to_csv(output_path)  # saving the results of the disk scanning
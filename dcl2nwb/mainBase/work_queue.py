@@ -0,0 +1,476 @@
+from dcl2nwb.mainBase.batch_conversion import TextColor, session_tasks, convert_session, scan_batch
+from dcl2nwb.utilBase.manifest import source_fingerprint, load_manifest, save_manifest, manifest_entry, is_up_to_date
+from dcl2nwb.utilBase.instrumentation import batch_summary, write_summary
+from dcl2nwb.utilBase.storage_policy import storage_policy
+from dcl2nwb.utilBase.video_transfer import transfer_methods, part_name
+from dcl2nwb.utilBase.session_cost import schedule_tasks, cost_check
+from datetime import datetime
+import pandas as pd
+import threading
+import pathlib
+import socket
+import json
+import time
+import os
+
+
+# the work queue of a distributed batch, kept inside the NWBConversions-<now> folder (on a drive shared by the nodes):
+# tasks/<id>.json are the sessions to convert, claimed/<id>@<worker>.json the ones being converted by a worker (the
+# modification time of the claim is the lease of the worker, renewed by its heartbeat), done/<id>.json the finished
+# ones, results/<id>.json their result dicts and heartbeats/<worker>.json the last sign of life of each worker; every
+# move between the folders is an atomic rename, so that a session is claimed by one worker only. A directory is used
+# rather than an SQLite file since the locks of SQLite are not reliable over the network filesystems (NFS, SMB).
+queue_name = 'work_queue'
+queue_folders = ['tasks', 'claimed', 'done', 'results', 'heartbeats']
+batch_name = 'batch.json'  # the starting time and the session options of the batch, written by the coordinator
+
+
+def write_json(json_path, content):
+    """
+    writes a JSON file via a temporary file and an atomic rename (same as the manifest), so that no reader ever sees
+    a partly written file.
+    :param json_path: a path object of the JSON file
+    :param content: a JSON serializable object; the path objects are written as strings
+    """
+
+    tmp_path = json_path.with_name(part_name(json_path.name))  # per writer
+    with open(tmp_path, 'w') as file_:
+        json.dump(content, file_, indent=1, default=str)
+    os.replace(tmp_path, json_path)
+
+
+def read_json(json_path):
+    """
+    :param json_path: a path object of the JSON file
+    :return: its content
+    """
+
+    with open(json_path, 'r') as file_:
+        return json.load(file_)
+
+
+def queue_sessions(report_unq, out_dir_path, now_, resume=False, batch_stages=None, schedule='largest',
+                   **session_options):
+    """
+    A function to write the unique sessions of a batch into the work queue of out_dir_path (the coordinator of a
+    distributed batch), to be converted by any number of workers (see run_worker), on this node or others, and
+    merged into one conversion report at the end (see merge_queue). A former queue of the folder is replaced.
+    :param report_unq: the data frame of the sessions with unique existence, as returned by drive_scan
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>), on a drive
+                         shared by all the nodes
+    :param now_: unique starting time of the conversion process (for naming of the conversion log)
+    :param resume: whether to skip the sessions already converted into out_dir_path and unchanged since (reported as
+                   upToDate right away)
+    :param batch_stages: (optional) the stages dict of a StageTimer of the batch itself (e.g., the drive_scan) to be
+                         added to the summary
+    :param schedule: the order in which the sessions are claimed: 'largest' (default) for the longest estimated time
+                     first, 'listed' for the order of the sessions list; see session_cost.schedule_tasks
+    :param session_options: keyword arguments passed on to convert_session by the workers, e.g., intermediate
+    :return: the number of sessions queued for conversion
+    """
+
+    storage_policy(session_options.get('storage'))  # an invalid policy fails here, not in each session
+    if session_options.get('transfer', 'auto') not in transfer_methods:
+        raise ValueError(f'unknown video transfer method: {session_options["transfer"]} '
+                         f'(one of {", ".join(transfer_methods)})')
+    queue_dir = out_dir_path / queue_name
+    for folder_ in queue_folders:
+        (queue_dir / folder_).mkdir(parents=True, exist_ok=True)
+        for name_ in os.listdir(queue_dir / folder_):
+            os.remove(queue_dir / folder_ / name_)  # of a former run of the folder (e.g., resumed)
+    manifest = load_manifest(out_dir_path) if resume else {}
+    n_queued = 0
+    queued_ = {}  # id -> task, kept in the batch file to recover a claim that cannot be read; see read_claim
+    for rank_, task_ in enumerate(schedule_tasks(session_tasks(report_unq), order=schedule)):
+        id_ = f'{rank_:06d}'  # the name of the task in the queue, so that the sessions are claimed in this order
+        if resume:
+            fingerprint = source_fingerprint(task_['session_path'])
+            entry_ = manifest.get(task_['session_name'])
+            if is_up_to_date(out_dir_path, entry_, fingerprint):
+                print(f'{TextColor.OKCYAN}({task_["cntr"]+1}/{task_["n_sessions"]}) {task_["session_name"]} is '
+                      f'already converted and unchanged... skipping...{TextColor.ENDC}')
+                write_json(queue_dir / 'results' / f'{id_}.json',
+                           {'cntr': task_['cntr'], 'session': task_['session_name'], 'session2csv': 'upToDate',
+                            'csv2nwb': 'successful', 'session_path': task_['session_path'],
+                            'nwb_file': entry_['nwb_file'], 'started': '', 'duration_s': 0.0,
+                            'sources': fingerprint, 'worker': None})
+                write_json(queue_dir / 'done' / f'{id_}.json', {'task': task_, 'attempts': 0})
+                continue
+        write_json(queue_dir / 'tasks' / f'{id_}.json', {'task': task_, 'attempts': 0})
+        queued_[id_] = task_
+        n_queued += 1
+    write_json(queue_dir / batch_name, {'now': now_, 'session_options': session_options,
+                                        'batch_stages': batch_stages or {}, 'schedule': schedule, 'tasks': queued_})
+    print(f'{TextColor.OKBLUE}"{n_queued}" sessions were queued into {queue_dir}...{TextColor.ENDC}')
+    return n_queued
+
+
+def queue_batch(input_root, sessions_list, output_dir, scan_workers=1, index_cache=None, resume=None,
+                schedule='largest', **session_options):
+    """
+    A function to start a distributed batch without any interaction: scans the drive (see batch_conversion.scan_batch)
+    and queues the sessions with unique existence into the work queue of a new NWBConversions-<now> folder inside
+    output_dir, to be converted by the workers (see run_worker) and merged (see merge_queue).
+    :param input_root: path of the main root on the drive persumably containing all the sessions
+    :param sessions_list: path of the CSV table of all the sessions (sessionsList.csv)
+    :param output_dir: path of the folder in which the NWBConversions-<now> folder is created (shared by the nodes)
+    :param scan_workers: number of threads listing the directories of the drive concurrently (default: 1, serial)
+    :param index_cache: (optional) path of the persistent index of the drive to revalidate and reuse across the runs
+    :param resume: (optional) path of an existing NWBConversions-<now> folder to resume; see convert_batch
+    :param schedule: 'largest' (default) or 'listed'; see queue_sessions
+    :param session_options: keyword arguments passed on to convert_session by the workers, e.g., intermediate='csv'
+    :return: the path object of the NWBConversions-<now> folder, to be given to the workers; None if no unique
+             sessions were found
+    """
+
+    out_dir_path, now_, report_unq, batch_stages = scan_batch(input_root, sessions_list, output_dir,
+                                                              scan_workers=scan_workers, index_cache=index_cache,
+                                                              resume=resume)
+    if report_unq is None:
+        return None
+    queue_sessions(report_unq, out_dir_path, now_, resume=resume is not None, batch_stages=batch_stages,
+                   schedule=schedule, **session_options)
+    return out_dir_path
+
+
+class Heartbeat:
+    """
+    the heartbeat of a worker: a thread renewing the lease of the task claimed by the worker (the modification time of
+    its claim) and rewriting heartbeats/<worker>.json (time, session being converted, number of sessions converted)
+    every heartbeat_s seconds, so that the leases of the live workers never expire however long their sessions take.
+    """
+
+    def __init__(self, queue_dir, worker_id, heartbeat_s=30):
+        """
+        :param queue_dir: a path object pointing to the work queue
+        :param worker_id: the name of the worker
+        :param heartbeat_s: seconds between two beats (default: 30); well below the lease of the queue
+        """
+
+        self.heartbeat_path = queue_dir / 'heartbeats' / f'{worker_id}.json'
+        self.worker_id = worker_id
+        self.heartbeat_s = heartbeat_s
+        self.claimed_path = None  # the claim of the session being converted, if any
+        self.session = None
+        self.n_converted = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.heartbeat_s):
+            self.beat()
+
+    def beat(self, state='alive'):
+        claimed_path = self.claimed_path
+        if claimed_path is not None:
+            try:
+                os.utime(claimed_path)
+            except OSError:
+                pass  # the lease was lost (expired and requeued); see finish_task
+        try:
+            write_json(self.heartbeat_path, {'worker': self.worker_id, 'state': state, 'session': self.session,
+                                             'converted': self.n_converted,
+                                             'time': datetime.now().isoformat(timespec='seconds')})
+        except OSError:
+            pass  # e.g., the shared drive is briefly unreachable; the next beat may do
+
+    def hold(self, claimed_path, session=None):
+        """
+        :param claimed_path: the path object of the claim of the session being converted; None once it is finished
+        :param session: the name of the session
+        """
+
+        self.claimed_path, self.session = claimed_path, session
+        self.beat()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.claimed_path, self.session = None, None
+        self.beat(state='stopped')
+
+
+def claim_task(queue_dir, worker_id):
+    """
+    A function to claim the next pending task of the queue for a worker: the task is moved into claimed/ by an
+    atomic rename, which only one of the workers trying at the same time succeeds in; its lease starts at once.
+    :param queue_dir: a path object pointing to the work queue
+    :param worker_id: the name of the worker
+    :return: a tuple of the path object of the claim and its entry (task and attempts), or None if no task is pending
+    """
+
+    for name_ in sorted(os.listdir(queue_dir / 'tasks')):
+        if not name_.endswith('.json'):
+            continue
+        task_path = queue_dir / 'tasks' / name_
+        claimed_path = queue_dir / 'claimed' / f'{name_[:-len(".json")]}@{worker_id}.json'
+        try:
+            os.utime(task_path)  # the rename keeps the modification time, i.e., the start of the lease
+            os.rename(task_path, claimed_path)
+        except FileNotFoundError:
+            continue  # claimed by another worker in the meantime
+        return claimed_path, read_json(claimed_path)
+    return None
+
+
+def read_claim(queue_dir, claim_path, id_):
+    """
+    :param queue_dir: a path object pointing to the work queue
+    :param claim_path: the path object of the claim of a task
+    :param id_: the name of the task in the queue
+    :return: the entry of the claim (task and attempts); if the claim cannot be parsed (e.g., truncated), the task as
+             queued by the coordinator (see queue_sessions), with no attempts counted
+    """
+
+    try:
+        return read_json(claim_path)
+    except ValueError:
+        return {'task': read_json(queue_dir / batch_name)['tasks'][id_], 'attempts': 0}
+
+
+def requeue_expired(queue_dir, lease_s=600, max_attempts=3):
+    """
+    A function to requeue the tasks whose lease expired, i.e., whose worker did not beat for lease_s seconds (e.g.,
+    its node crashed or the process was killed); a task whose lease expired max_attempts times is given up instead,
+    with a failure result. Any worker may call it; each expired claim is taken over by one of them (atomic rename).
+    A claim whose requeue fails (e.g., the shared drive is briefly unreachable) is put back with a fresh lease, or
+    claimed again once left over for a lease, so that no session is ever lost from the queue.
+    :param queue_dir: a path object pointing to the work queue
+    :param lease_s: seconds without a beat after which a lease expires (default: 600)
+    :param max_attempts: number of expired leases after which a task is given up (default: 3)
+    :return: the number of tasks requeued or given up
+    """
+
+    for name_ in os.listdir(queue_dir):
+        if name_.endswith('.expired'):  # left over by a requeue that failed midway (see below)
+            reclaim_expired(queue_dir, name_, lease_s)
+    n_expired = 0
+    for name_ in os.listdir(queue_dir / 'claimed'):
+        claimed_path = queue_dir / 'claimed' / name_
+        try:
+            if time.time() - os.stat(claimed_path).st_mtime < lease_s:
+                continue
+            expired_path = queue_dir / f'{name_}.expired'
+            os.rename(claimed_path, expired_path)
+        except FileNotFoundError:
+            continue  # finished or taken over by another worker in the meantime
+        id_, _, worker_id = name_[:-len('.json')].partition('@')
+        try:
+            os.utime(expired_path)  # the start of the take-over, see reclaim_expired
+            entry_ = read_claim(queue_dir, expired_path, id_)
+            entry_['attempts'] += 1
+            task_ = entry_['task']
+            if entry_['attempts'] >= max_attempts:
+                write_json(queue_dir / 'results' / f'{id_}.json',
+                           {'cntr': task_['cntr'], 'session': task_['session_name'],
+                            'session2csv': f'LeaseExpired: {entry_["attempts"]} attempts, last by {worker_id}',
+                            'csv2nwb': 'na', 'session_path': task_['session_path'], 'nwb_file': None,
+                            'started': '', 'duration_s': None, 'sources': None, 'worker': worker_id})
+                write_json(queue_dir / 'done' / f'{id_}.json', entry_)
+                print(f'{TextColor.FAIL}The lease of {task_["session_name"]} expired {entry_["attempts"]} times '
+                      f'(last by {worker_id})... given up...{TextColor.ENDC}')
+            else:
+                write_json(queue_dir / 'tasks' / f'{id_}.json', entry_)
+                print(f'{TextColor.WARNING}The lease of {task_["session_name"]} by {worker_id} expired... '
+                      f'requeued...{TextColor.ENDC}')
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(f'{TextColor.FAIL}ERROR CAPTURED (queue): The expired claim {name_} could not be requeued '
+                  f'-{type(error).__name__}: {error}- put back...{TextColor.ENDC}')
+            try:
+                os.rename(expired_path, claimed_path)  # with the fresh lease of the take-over
+            except OSError:
+                pass  # left over; see reclaim_expired
+            continue
+        try:
+            os.remove(expired_path)
+        except OSError:
+            pass  # left over, and dropped as such; see reclaim_expired
+        n_expired += 1
+    return n_expired
+
+
+def reclaim_expired(queue_dir, name_, lease_s=600):
+    """
+    A function to deal with a claim left over by a requeue that failed midway (<name>.expired in the queue folder):
+    once untouched for a lease, it is dropped if its task was requeued or finished meanwhile, otherwise put back into
+    claimed/ (as expired), to be requeued.
+    :param queue_dir: a path object pointing to the work queue
+    :param name_: the name of the left-over claim
+    :param lease_s: seconds without a beat after which a lease expires (default: 600)
+    """
+
+    expired_path = queue_dir / name_
+    claim_name = name_[:-len('.expired')]
+    id_ = claim_name.partition('@')[0]
+    try:
+        if time.time() - os.stat(expired_path).st_mtime < lease_s:
+            return  # being requeued by a worker
+        if (queue_dir / 'tasks' / f'{id_}.json').exists() or (queue_dir / 'done' / f'{id_}.json').exists() or \
+                any(dum_.partition('@')[0] == id_ for dum_ in os.listdir(queue_dir / 'claimed')):
+            os.remove(expired_path)
+        else:
+            os.rename(expired_path, queue_dir / 'claimed' / claim_name)
+    except OSError:
+        pass  # taken care of by another worker, or left for the next look
+
+
+def finish_task(queue_dir, claimed_path, result, worker_id, out_dir_path):
+    """
+    A function to record the result of a converted session and to move its claim into done/, provided that the
+    worker still holds the claim; otherwise (its lease expired and the session was requeued) the result is dropped,
+    the session being converted again by another worker.
+    :param queue_dir: a path object pointing to the work queue
+    :param claimed_path: the path object of the claim of the session
+    :param result: the result dict of the session, as returned by convert_session
+    :param worker_id: the name of the worker
+    :param out_dir_path: a path object pointing to the folder of the conversions, as mounted on this node
+    :return: whether the result was recorded
+    """
+
+    if not claimed_path.exists():
+        print(f'{TextColor.WARNING}The lease of {result["session"]} was lost by {worker_id}... its result is '
+              f'dropped...{TextColor.ENDC}')
+        return False
+    record_ = {key_: value_ for key_, value_ in result.items() if key_ != 'transfer'}
+    if result['nwb_file'] is not None:
+        # relative, since the shared drive may be mounted at another path on the node merging the results
+        record_['nwb_file'] = result['nwb_file'].relative_to(out_dir_path).as_posix()
+    record_['worker'] = worker_id
+    id_ = claimed_path.name.partition('@')[0]
+    write_json(queue_dir / 'results' / f'{id_}.json', record_)
+    try:
+        os.rename(claimed_path, queue_dir / 'done' / f'{id_}.json')
+    except FileNotFoundError:
+        pass  # requeued just now; converted once more, and its result replaced then
+    return True
+
+
+def run_worker(out_dir_path, worker_id=None, lease_s=600, heartbeat_s=30, poll_s=10, max_attempts=3,
+               **session_options):
+    """
+    A function to run a worker of a distributed batch: claims the sessions of the work queue of out_dir_path one after
+    the other, converts them (see batch_conversion.convert_session, with the session options of the coordinator)
+    and records their results, while its heartbeat renews its lease. The expired leases of the other workers are
+    requeued while no task is pending; the worker returns once no task is pending nor claimed any longer.
+    Any number of workers may run at the same time, on any node mounting the shared drive.
+    :param out_dir_path: path of the folder of the conversions (NWBConversions-<now>) holding the work queue
+    :param worker_id: (optional) the name of the worker, unique over the nodes (default: <hostname>-<pid>)
+    :param lease_s: seconds without a beat after which the lease of a worker expires (default: 600)
+    :param heartbeat_s: seconds between two beats of the worker (default: 30)
+    :param poll_s: seconds between two looks into the queue while the sessions left are claimed by other workers
+    :param max_attempts: number of expired leases after which a session is given up (default: 3)
+    :param session_options: keyword arguments of convert_session overriding the ones of the coordinator for this node,
+                            e.g., scratch (a local drive of the node)
+    :return: the number of sessions converted by the worker
+    """
+
+    out_dir_path = pathlib.Path(out_dir_path)
+    queue_dir = out_dir_path / queue_name
+    options_ = read_json(queue_dir / batch_name)['session_options']
+    options_.update(session_options)
+    worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    heartbeat_ = Heartbeat(queue_dir, worker_id, heartbeat_s=heartbeat_s)
+    print(f'{TextColor.OKBLUE}Worker {worker_id} started on {queue_dir}...{TextColor.ENDC}')
+    try:
+        while True:
+            claim_ = claim_task(queue_dir, worker_id)
+            if claim_ is None:
+                if requeue_expired(queue_dir, lease_s=lease_s, max_attempts=max_attempts):
+                    continue
+                if not os.listdir(queue_dir / 'tasks') and not os.listdir(queue_dir / 'claimed') and \
+                        not any(name_.endswith('.expired') for name_ in os.listdir(queue_dir)):
+                    break  # all the sessions are done
+                time.sleep(poll_s)
+                continue
+            claimed_path, entry_ = claim_
+            task_ = entry_['task']
+            task_['session_path'] = pathlib.Path(task_['session_path'])
+            heartbeat_.hold(claimed_path, task_['session_name'])
+            try:
+                result = convert_session(task_, out_dir_path, **options_)
+            except Exception as error:
+                # same as a failed worker of the pool; the rest of the batch goes on
+                result = {'cntr': task_['cntr'], 'session': task_['session_name'],
+                          'session2csv': f'{type(error).__name__}: {error}', 'csv2nwb': 'na',
+                          'session_path': task_['session_path'], 'nwb_file': None,
+                          'started': '', 'duration_s': None, 'sources': None}
+                print(f'{TextColor.FAIL}ERROR CAPTURED (worker): The conversion of {task_["session_name"]} '
+                      f'ran into an error -{type(error).__name__}: {error}-{TextColor.ENDC}')
+            heartbeat_.hold(None)
+            if finish_task(queue_dir, claimed_path, result, worker_id, out_dir_path):
+                heartbeat_.n_converted += 1
+    finally:
+        heartbeat_.stop()
+    print(f'{TextColor.OKGREEN}Worker {worker_id} is done: "{heartbeat_.n_converted}" sessions '
+          f'converted...{TextColor.ENDC}')
+    return heartbeat_.n_converted
+
+
+def merge_queue(out_dir_path):
+    """
+    A function to merge the results of the workers of a distributed batch into one conversion_report_<now>.csv and
+    one conversion_summary_<now>.json (same as the ones of batch_conversion.run_batch), and to record the successfully
+    written sessions in the manifest of out_dir_path, so that the batch can be resumed. The sessions not finished
+    (yet) are reported as queued or claimed by their worker; it may be run at any time, e.g., to follow the batch.
+    :param out_dir_path: path of the folder of the conversions (NWBConversions-<now>) holding the work queue
+    :return: a tuple of the data frame of the conversion report and the list of the result dicts of the finished
+             sessions, in the order of the sessions
+    """
+
+    out_dir_path = pathlib.Path(out_dir_path)
+    queue_dir = out_dir_path / queue_name
+    batch_ = read_json(queue_dir / batch_name)
+    now_ = batch_['now']
+    results = []
+    for name_ in sorted(os.listdir(queue_dir / 'results')):
+        if name_.endswith('.json'):
+            result = read_json(queue_dir / 'results' / name_)
+            result['session_path'] = pathlib.Path(result['session_path'])
+            if result['nwb_file'] is not None:
+                result['nwb_file'] = out_dir_path / result['nwb_file']
+            results.append(result)
+    results.sort(key=lambda result_: result_['cntr'])  # the queue is in the order of the schedule
+    finished_ = {result['cntr'] for result in results}
+
+    conversion_report = pd.DataFrame()  # to write the conversion report
+    conversion_report['session'] = ''
+    conversion_report['session2csv'] = ''
+    conversion_report['csv2nwb'] = ''
+    for result in results:
+        for key_ in ['session', 'session2csv', 'csv2nwb']:
+            conversion_report.at[result['cntr'], key_] = result[key_]
+        for key_, value_ in (result.get('timings') or {}).items():
+            conversion_report.at[result['cntr'], key_] = value_  # extra columns; empty for the sessions without
+    for folder_, state_ in [('tasks', 'queued'), ('claimed', 'claimed')]:
+        for name_ in os.listdir(queue_dir / folder_):
+            if not name_.endswith('.json'):
+                continue
+            try:
+                task_ = read_json(queue_dir / folder_ / name_)['task']
+            except (OSError, ValueError):
+                continue  # moved in the meantime
+            if task_['cntr'] not in finished_:
+                worker_id = name_[:-len('.json')].partition('@')[2]
+                conversion_report.at[task_['cntr'], 'session'] = task_['session_name']
+                conversion_report.at[task_['cntr'], 'session2csv'] = f'{state_} {worker_id}'.strip()
+                conversion_report.at[task_['cntr'], 'csv2nwb'] = 'na'
+    conversion_report = conversion_report.sort_index()
+    conversion_report.to_csv(out_dir_path / f'conversion_report_{now_}.csv')
+
+    workers_ = sorted({result['worker'] for result in results if result.get('worker')})
+    write_summary(out_dir_path / f'conversion_summary_{now_}.json',
+                  batch_summary(results, batch_stages=batch_['batch_stages'], now=now_, workers=len(workers_),
+                                worker_ids=workers_, schedule=batch_.get('schedule'),
+                                session_options=batch_['session_options'], cost_check=cost_check(results)))
+    manifest = load_manifest(out_dir_path)
+    for result in results:
+        if result['csv2nwb'] == 'successful' and result.get('sources') is not None:
+            manifest[result['session']] = manifest_entry(out_dir_path, result['nwb_file'], result['sources'])
+        else:
+            manifest.pop(result['session'], None)  # failed (or not converted); to be redone by the next resume
+    save_manifest(out_dir_path, manifest)
+    n_open = len(conversion_report) - len(results)
+    print(f'{TextColor.OKBLUE}"{len(results)}" finished sessions merged into conversion_report_{now_}.csv'
+          f'{f", {n_open} not finished yet" if n_open else ""}...{TextColor.ENDC}')
+    return conversion_report, results
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import pathlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from fnmatch import fnmatch
+
+
+class DriveIndex:
+    """
+    An in-memory index of all the directories under the root of the experiment, built by a single walk of the drive.
+    It replaces the repeated rglob/glob scans of the drive by dictionary lookups for the names of the root folders
+    (Line_MouseID) and by a match on the already listed sub-directories for the date_paradigm of the sessions.
+    Similar to pathlib's rglob, symbolic links to directories are indexed but not followed.
+
+    If a cache_path is given, the listing of every directory is persisted along with its mtime in an SQLite file. On
+    the next walk, a directory is only stat-ed and its cached listing is reused as long as its mtime is unchanged;
+    only the directories that changed (or are new) are listed again.
+
+    With workers > 1, the directories are listed by a pool of threads, which hides the round-trip latency of network
+    (SMB/NFS) mounts; the resulting index is identical to the one of the serial walk.
+    """
+
+    racy_ns = 2 * 10 ** 9  # listings taken within this margin of the directory mtime are never trusted (coarse mtimes)
+
+    def __init__(self, in_dir, cache_path=None, workers=1):
+        """
+        :param in_dir: a path object pointing to the main root on the drive persumably containing all the sessions
+        :param cache_path: (optional) a path to the SQLite file persisting the index across the runs
+        :param workers: number of threads listing the directories concurrently (default: 1, i.e., serial)
+        """
+        self.in_dir = pathlib.Path(in_dir)
+        self.cache_path = cache_path
+        self.workers = max(1, int(workers))
+        self.names = {}  # (normcased) directory name -> list of the paths with that name, in the order of walking
+        self.children = {}  # directory path (str) -> list of the names of its sub-directories
+        self.n_listed = 0  # number of directories listed from the drive (scandir)
+        self.n_reused = 0  # number of directories answered from the cache (stat only)
+        self.n_skipped = 0  # number of directories that could not be read (permissions, vanished)
+        self._cached = {}  # directory path (str) -> (mtime_ns, listed_ns, [(name, is_symlink), ...])
+        self._updated = {}  # same structure as _cached; the entries to be written back into the cache
+        if self.cache_path is not None:
+            self._load_cache()
+        self._walk()
+        if self.cache_path is not None:
+            self._save_cache()
+
+    def _walk(self):
+        # breadth-first listing, level by level; the directories of one level are listed concurrently if workers > 1
+        listing = {}  # directory path (str) -> list of (name, is_symlink) tuples of its sub-directories
+        level = [str(self.in_dir)]
+        with ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else nullcontext() as executor:
+            map_ = executor.map if executor is not None else map
+            while level:
+                next_level = []
+                for dir_, (sub_dirs, fresh_) in zip(level, map_(self._sub_dirs, level)):
+                    listing[dir_] = sub_dirs
+                    if fresh_ is False:
+                        self.n_skipped += 1
+                    elif fresh_ is None:
+                        self.n_reused += 1
+                    else:
+                        self.n_listed += 1
+                        self._updated[dir_] = fresh_
+                    next_level.extend(os.path.join(dir_, name_) for name_, is_link in sub_dirs if not is_link)
+                level = next_level
+        # in-memory depth-first pass; keeps the pre-order of rglob for the listed matches, whatever the listing order
+        stack = [str(self.in_dir)]
+        while stack:
+            dir_ = stack.pop()
+            sub_dirs = listing.get(dir_, [])
+            self.children[dir_] = [name_ for name_, _ in sub_dirs]
+            for name_, _ in sub_dirs:
+                path_ = os.path.join(dir_, name_)
+                self.names.setdefault(os.path.normcase(name_), []).append(path_)
+            # reversed to pop the sub-directories in their listing order
+            stack.extend(os.path.join(dir_, name_) for name_, is_link in reversed(sub_dirs) if not is_link)
+
+    def _sub_dirs(self, dir_):
+        """
+        returns the sub-directories of one directory, either from the cache (if its mtime is unchanged) or the drive.
+        only reads the shared state, so that it can be called from several threads at once.
+        :param dir_: the path (str) of the directory
+        :return: a tuple of: a list of (name, is_symlink) tuples of the sub-directories,
+                 and the fresh cache entry if the directory was listed from the drive (None if reused from the cache,
+                 False if it could not be read)
+        """
+        try:
+            mtime_ns = os.stat(dir_).st_mtime_ns
+        except OSError:
+            return [], False  # unreadable directories (permissions, vanished) are ignored, as rglob does
+        cached_ = self._cached.get(dir_)
+        if cached_ is not None and cached_[0] == mtime_ns and cached_[1] - mtime_ns > self.racy_ns:
+            return cached_[2], None
+        listed_ns = time.time_ns()
+        sub_dirs = self._list_dir(dir_)
+        if sub_dirs is None:
+            return [], False  # never cached; listed again on the next walk
+        return sub_dirs, (mtime_ns, listed_ns, sub_dirs)
+
+    @staticmethod
+    def _list_dir(dir_):
+        """
+        lists the sub-directories of one directory in a single os.scandir call.
+        :param dir_: the path (str) of the directory to list
+        :return: a list of (name, is_symlink) tuples of the sub-directories; None if the directory could not be read
+        """
+        sub_dirs = []
+        try:
+            with os.scandir(dir_) as it_:
+                for entry_ in it_:
+                    try:
+                        if entry_.is_dir():
+                            sub_dirs.append((entry_.name, entry_.is_symlink()))
+                    except OSError:
+                        pass  # broken entries are ignored, as rglob does
+        except OSError:
+            return None  # unreadable directories (permissions, vanished) are ignored, as rglob does
+        return sub_dirs
+
+    def _connect(self):
+        connection = sqlite3.connect(str(self.cache_path))
+        connection.execute('CREATE TABLE IF NOT EXISTS dirs ('
+                           'root TEXT NOT NULL, path TEXT PRIMARY KEY, '
+                           'mtime_ns INTEGER NOT NULL, listed_ns INTEGER NOT NULL, sub_dirs TEXT NOT NULL)')
+        return connection
+
+    def _load_cache(self):
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute('SELECT path, mtime_ns, listed_ns, sub_dirs FROM dirs WHERE root = ?',
+                                          (str(self.in_dir),)).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            rows = []  # a broken cache is as good as no cache; it is rewritten after the walk
+        for path_, mtime_ns, listed_ns, sub_dirs in rows:
+            self._cached[path_] = (mtime_ns, listed_ns, [tuple(dum_) for dum_ in json.loads(sub_dirs)])
+
+    def _save_cache(self):
+        vanished = [(path_,) for path_ in self._cached if path_ not in self.children]  # not reached by this walk
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany('DELETE FROM dirs WHERE path = ?', vanished)
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO dirs (root, path, mtime_ns, listed_ns, sub_dirs) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [(str(self.in_dir), path_, mtime_ns, listed_ns, json.dumps(sub_dirs))
+                         for path_, (mtime_ns, listed_ns, sub_dirs) in self._updated.items()])
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            pass  # the cache is only an accelerator; the index of this run is complete anyway
+
+    def find(self, name):
+        """
+        equivalent of in_dir.rglob(name) for a directory name without any wildcards.
+        :param name: name of the directory to look for, e.g., the root folder Line_MouseID
+        :return: a list of path objects of all the directories with that name
+        """
+        return [pathlib.Path(path_) for path_ in self.names.get(os.path.normcase(name), [])]
+
+    def find_children(self, dir_path, pattern):
+        """
+        equivalent of dir_path.glob(pattern) for the sub-directories of an already indexed directory.
+        :param dir_path: a path object of an indexed directory (as returned by find())
+        :param pattern: a glob-style pattern to match the names of the sub-directories, e.g., *date_paradigm
+        :return: a list of path objects of the matching sub-directories
+        """
+        return [dir_path / name_ for name_ in self.children.get(str(dir_path), []) if fnmatch(name_, pattern)]
@@ -0,0 +1,227 @@
+import contextlib
+import contextvars
+import threading
+import json
+import os
+import time
+
+
+stage_fields = ['count', 'wall_s', 'cpu_s', 'bytes_read', 'bytes_written']
+
+# the timer of the session being converted in this process (thread); see StageTimer.activate
+active_timer = contextvars.ContextVar('active_timer', default=None)
+
+
+class StageTimer:
+    """
+    accumulates the wall time, the CPU time (of the process) and the bytes read/written per stage of a conversion,
+    e.g., per loadmat, per base_func_sheet function or for the NWB write. The same stage may run several times (e.g.,
+    the tables_read of every base_func_sheet function); its numbers add up and its count says how often it ran.
+    Stages may be nested (e.g., a tables_read inside a base_func_sheet function), in which case the time of the inner
+    one is included in the outer one; the bytes are only recorded by the innermost (I/O) stages.
+    """
+
+    def __init__(self):
+        self.stages = {}  # stage name -> dict of the stage_fields, in the order of the first run
+        self.notes = {}  # note name -> list of the noted values, e.g., the time base chosen per series; see note
+        self.counters = {}  # counter name -> running total, e.g., the hits of the .mat cache of the session; see count
+
+    @contextlib.contextmanager
+    def stage(self, name, bytes_read=0, bytes_written=0):
+        """
+        times the block of the with statement as (one more run of) the given stage.
+        :param name: name of the stage
+        :param bytes_read: number of bytes read by the stage, if known beforehand
+        :param bytes_written: number of bytes written by the stage, if known beforehand
+        :return: a dict of bytes_read/bytes_written that may still be updated inside the block (e.g., by the size of
+                 a file once it is written)
+        """
+
+        counts_ = {'bytes_read': bytes_read, 'bytes_written': bytes_written}
+        wall_, cpu_ = time.perf_counter(), time.process_time()
+        try:
+            yield counts_
+        finally:
+            entry_ = self.stages.setdefault(name, dict.fromkeys(stage_fields, 0))
+            entry_['count'] += 1
+            entry_['wall_s'] += time.perf_counter() - wall_
+            entry_['cpu_s'] += time.process_time() - cpu_
+            entry_['bytes_read'] += counts_['bytes_read']
+            entry_['bytes_written'] += counts_['bytes_written']
+
+    @contextlib.contextmanager
+    def activate(self):
+        """
+        makes this timer the one of the module level stage(), so that the stages of the called functions (e.g., the
+        loadmat of session2csv) are recorded without passing the timer through all of them.
+        """
+
+        token_ = active_timer.set(self)
+        try:
+            yield self
+        finally:
+            active_timer.reset(token_)
+
+    def report_columns(self):
+        """
+        :return: a flat dict of the extra columns of the conversion report: <stage>_wall_s and <stage>_cpu_s of every
+                 stage, along with the total bytes_read and bytes_written of the session, the counters and the notes
+                 (their values joined by '; ')
+        """
+
+        columns = {}
+        for name_, entry_ in self.stages.items():
+            columns[f'{name_}_wall_s'] = round(entry_['wall_s'], 3)
+            columns[f'{name_}_cpu_s'] = round(entry_['cpu_s'], 3)
+        columns['bytes_read'] = sum(entry_['bytes_read'] for entry_ in self.stages.values())
+        columns['bytes_written'] = sum(entry_['bytes_written'] for entry_ in self.stages.values())
+        for name_, value_ in self.counters.items():
+            columns[name_] = round(value_, 3)
+        for name_, values_ in self.notes.items():
+            columns[name_] = '; '.join(str(value_) for value_ in values_)
+        return columns
+
+
+@contextlib.contextmanager
+def stage(name, bytes_read=0, bytes_written=0):
+    """
+    times the block of the with statement as a stage of the active timer (see StageTimer.activate); does nothing but
+    the timing bookkeeping when there is no active timer, e.g., when session2csv is called on its own.
+    """
+
+    timer_ = active_timer.get()
+    if timer_ is None:
+        yield {'bytes_read': bytes_read, 'bytes_written': bytes_written}
+    else:
+        with timer_.stage(name, bytes_read=bytes_read, bytes_written=bytes_written) as counts_:
+            yield counts_
+
+
+def note(name, value):
+    """
+    adds a value to the named note of the active timer (see StageTimer.activate), e.g., the time base chosen for a
+    series; does nothing when there is no active timer.
+    """
+
+    timer_ = active_timer.get()
+    if timer_ is not None:
+        timer_.notes.setdefault(name, []).append(value)
+
+
+def count(name, value=1):
+    """
+    adds a value to the named counter of the active timer (see StageTimer.activate), e.g., one more hit of a cache or
+    the seconds of a load; does nothing when there is no active timer.
+    """
+
+    timer_ = active_timer.get()
+    if timer_ is not None:
+        timer_.counters[name] = timer_.counters.get(name, 0) + value
+
+
+def rss_mb():
+    """
+    :return: the resident memory of this process in MB, by psutil when it is installed (optional dependency),
+             otherwise from /proc on Linux; None if it cannot be measured (e.g., on Windows without psutil)
+    """
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as file_:
+            return int(file_.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextlib.contextmanager
+def track_peak_rss(interval_s=0.05):
+    """
+    samples the resident memory of the process by a thread every interval_s seconds during the block and counts its
+    peak as peak_rss_mb of the active timer (see StageTimer.activate), to be compared with the estimated peak of the
+    session (see session_cost); nothing is counted if the memory cannot be measured or there is no active timer.
+    Note that the memory freed by a former session of the same process is not always given back to the system.
+    """
+
+    peak_ = [rss_mb()]
+    if peak_[0] is None:
+        yield
+        return
+    stopped_ = threading.Event()
+
+    def sample():
+        while not stopped_.wait(interval_s):
+            peak_[0] = max(peak_[0], rss_mb())
+
+    thread_ = threading.Thread(target=sample, daemon=True)
+    thread_.start()
+    try:
+        yield
+    finally:
+        stopped_.set()
+        thread_.join()
+        count('peak_rss_mb', max(peak_[0], rss_mb()))
+
+
+def path_size(path_):
+    """
+    :param path_: path of a file or a folder (e.g., the folder of a Parquet table)
+    :return: the size of the file or the total size of the files in the folder in bytes; 0 if it does not exist
+    """
+
+    try:
+        if not os.path.isdir(path_):
+            return os.stat(path_).st_size
+        return sum(os.stat(os.path.join(dir_, name_)).st_size
+                   for dir_, _, files_ in os.walk(path_) for name_ in files_)
+    except OSError:
+        return 0
+
+
+def batch_summary(results, batch_stages=None, **batch_info):
+    """
+    A function to summarize the instrumentation of a whole batch (machine-readable; see write_summary).
+    :param results: the list of the result dicts of the sessions, as returned by convert_session
+    :param batch_stages: (optional) the stages dict of a StageTimer of the batch itself, e.g., of the drive scan
+    :param batch_info: any further entries of the summary, e.g., the number of workers
+    :return: a dict of the batch entries, the batch stages, the totals per stage over all the sessions and the
+             entries of each session (statuses, duration, stages, counters and notes)
+    """
+
+    totals = {}
+    sessions = []
+    for result_ in results:
+        session_stages = result_.get('stages') or {}
+        for name_, entry_ in session_stages.items():
+            total_ = totals.setdefault(name_, dict.fromkeys(stage_fields, 0))
+            for key_ in stage_fields:
+                total_[key_] += entry_[key_]
+        sessions.append({key_: result_.get(key_) for key_ in ['cntr', 'session', 'session2csv', 'csv2nwb',
+                                                              'started', 'duration_s']})
+        sessions[-1]['stages'] = session_stages
+        sessions[-1]['counters'] = result_.get('counters') or {}
+        sessions[-1]['notes'] = result_.get('notes') or {}
+    summary = dict(batch_info)
+    summary.update({
+        'n_sessions': len(results),
+        'batch_stages': batch_stages or {},
+        'totals': totals,
+        'sessions': sessions,
+    })
+    return summary
+
+
+def write_summary(summary_path, summary):
+    """
+    writes the batch summary as JSON via a temporary file and an atomic rename (same as the manifest).
+    :param summary_path: a path object of the JSON file
+    :param summary: the summary dict, as returned by batch_summary
+    """
+
+    tmp_path = summary_path.with_name(f'{summary_path.name}.part')
+    with open(tmp_path, 'w') as file_:
+        json.dump(summary, file_, indent=1, default=str)
+    os.replace(tmp_path, summary_path)
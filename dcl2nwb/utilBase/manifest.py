@@ -0,0 +1,128 @@
+import os
+import json
+import h5py
+
+
+manifest_name = 'conversion_manifest.json'  # kept inside the NWBConversions-<now> folder
+recordings_name = 'recordings'  # the folder of the transferred recordings, next to the .nwb file of each session
+
+
+def source_fingerprint(session_path):
+    """
+    A function to fingerprint the source files of a session by their sizes and modification times (stat only).
+    :param session_path: a path object pointing to a single session
+    :return: a dict of relative path (posix) -> [size, mtime_ns] of all the files of the session, along with the
+             subject meta file (<Line>_<MouseID>_Meta.mat) from the root folder; the temporary session2csv folder is
+             excluded. A file that cannot be stat'ed (e.g., a dangling link, no permission or removed meanwhile) is
+             kept as None, so that a fingerprint never raises; the conversion itself fails on such a file, if needed
+    """
+
+    fingerprint = {}
+    for dir_, sub_dirs, files_ in os.walk(session_path):
+        sub_dirs[:] = sorted(dum_ for dum_ in sub_dirs if dum_ != 'session2csv')  # the temporary output folder
+        for name_ in sorted(files_):
+            path_ = os.path.join(dir_, name_)
+            fingerprint[os.path.relpath(path_, session_path).replace(os.sep, '/')] = file_stamp(path_)
+    line_mouse = '_'.join(session_path.parent.name.split('_')[:2])
+    meta_path = session_path.parent / f'{line_mouse}_Meta.mat'
+    meta_stamp = file_stamp(meta_path)
+    if meta_stamp is not None:  # the sessions without a meta file have none
+        fingerprint[f'../{meta_path.name}'] = meta_stamp
+    return fingerprint
+
+
+def file_stamp(path_):
+    """
+    :param path_: path of a file
+    :return: its [size, mtime_ns], None if it cannot be stat'ed
+    """
+
+    try:
+        stat_ = os.stat(path_)
+    except OSError:
+        return None
+    return [stat_.st_size, stat_.st_mtime_ns]
+
+
+def recording_stamps(nwb_file_path):
+    """
+    :param nwb_file_path: a path object pointing to the .nwb file of a session
+    :return: a dict of file name -> [size, mtime_ns] of the recordings transferred next to it (see recordings_name),
+             without the temporaries of unfinished transfers (.part); empty if there is no such folder
+    """
+
+    recordings_path = nwb_file_path.parent / recordings_name
+    try:
+        names_ = sorted(os.listdir(recordings_path))
+    except OSError:
+        return {}
+    return {name_: file_stamp(recordings_path / name_) for name_ in names_ if not name_.endswith('.part')}
+
+
+def load_manifest(out_dir_path):
+    """
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :return: the manifest dict of session name -> entry; empty if the folder has no (readable) manifest
+    """
+
+    try:
+        with open(out_dir_path / manifest_name, 'r') as file_:
+            return json.load(file_)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir_path, manifest):
+    """
+    writes the manifest via a temporary file and an atomic rename, so that a crash never leaves a truncated manifest.
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :param manifest: the manifest dict of session name -> entry
+    """
+
+    tmp_path = out_dir_path / f'{manifest_name}.part'
+    with open(tmp_path, 'w') as file_:
+        json.dump(manifest, file_, indent=1)
+    os.replace(tmp_path, out_dir_path / manifest_name)
+
+
+def manifest_entry(out_dir_path, nwb_file_path, fingerprint):
+    """
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :param nwb_file_path: a path object pointing to the completely written .nwb file of the session
+    :param fingerprint: the source fingerprint of the session taken before its conversion
+    :return: the manifest entry of a successfully converted session, along with the stamps of its transferred
+             recordings (see recording_stamps)
+    """
+
+    return {
+        'nwb_file': nwb_file_path.relative_to(out_dir_path).as_posix(),
+        'nwb_size': os.stat(nwb_file_path).st_size,
+        'recordings': recording_stamps(nwb_file_path),
+        'sources': fingerprint,
+    }
+
+
+def is_up_to_date(out_dir_path, entry, fingerprint):
+    """
+    A function to verify that a session was fully converted, that its transferred recordings are still the ones
+    recorded (size and modification time; e.g., not removed, truncated or replaced) and that its sources did not
+    change since. The entries of former manifests, without the stamps of the recordings, are never up to date.
+    :param out_dir_path: a path object pointing to the folder of the conversions (NWBConversions-<now>)
+    :param entry: the manifest entry of the session (None if the session is not in the manifest)
+    :param fingerprint: the current source fingerprint of the session
+    :return: True if the session can be skipped, False if it has to be (re-)converted; always False if any of its
+             source files cannot be stat'ed (see source_fingerprint)
+    """
+
+    if not entry or entry.get('sources') != fingerprint or None in fingerprint.values():
+        return False
+    nwb_file_path = out_dir_path / entry['nwb_file']
+    try:
+        if os.stat(nwb_file_path).st_size != entry['nwb_size']:
+            return False
+    except OSError:
+        return False
+    recordings_ = entry.get('recordings')
+    if not recordings_ or recordings_ != recording_stamps(nwb_file_path) or None in recordings_.values():
+        return False
+    return h5py.is_hdf5(nwb_file_path)
@@ -0,0 +1,175 @@
+import h5py
+import numpy as np
+from scipy.io import loadmat
+
+
+hdf5_signature = b'\x89HDF\r\n\x1a\n'  # at 0, 512, 1024, 2048, ... (after a user block, e.g., the 512 B of MATLAB)
+
+
+def read_mat(file_path, variable_names=None):
+    """
+    A function to read the variables of a .mat file in the layout of scipy.io.loadmat (structs as 1x1 record arrays,
+    strings as arrays of str, cells as object arrays), whatever its version: the v5/v7 files are loaded by loadmat,
+    only the given variables; the v7.3 files (HDF5) are opened by h5py and their numeric arrays are only read when
+    sliced or converted (see MatArray), so that the large series are not decoded unless needed.
+    :param file_path: path of the .mat file, or a (seekable) file object of its content, e.g., read ahead into memory
+    :param variable_names: (optional) the names of the variables to read; all of them if None
+    :return: a dict of variable name -> value
+    """
+
+    if not is_hdf5(file_path):
+        return loadmat(file_path, variable_names=variable_names)
+    file_ = h5py.File(file_path, 'r')  # kept open by the datasets of the returned values as long as they are used
+    names_ = [name_ for name_ in file_ if not name_.startswith('#')]  # without #refs# and #subsystem#
+    if variable_names is not None:
+        names_ = [name_ for name_ in names_ if name_ in variable_names]
+    return {name_: mat_value(file_[name_]) for name_ in names_}
+
+
+def is_hdf5(file_path):
+    """
+    :param file_path: path of a file or a (seekable) file object
+    :return: whether the file is an HDF5 file (e.g., a v7.3 .mat file)
+    """
+
+    if not hasattr(file_path, 'read'):
+        return h5py.is_hdf5(file_path)
+    position_ = file_path.tell()
+    try:
+        offset_ = 0
+        while True:
+            file_path.seek(offset_)
+            signature_ = file_path.read(len(hdf5_signature))
+            if signature_ == hdf5_signature:
+                return True
+            if len(signature_) < len(hdf5_signature):
+                return False
+            offset_ = max(512, 2 * offset_)
+    finally:
+        file_path.seek(position_)
+
+
+def mat_value(h5_object):
+    """
+    :param h5_object: a group or dataset of a v7.3 .mat file
+    :return: its value in the layout of scipy.io.loadmat: a MatStruct for a struct, an array of str for a char array,
+             an object array for a cell and a MatArray for a numeric (or logical) array
+    """
+
+    if isinstance(h5_object, h5py.Group):
+        return MatStruct(h5_object)
+    class_ = h5_object.attrs.get('MATLAB_class', b'')
+    class_ = class_.decode() if isinstance(class_, bytes) else str(class_)
+    if h5_object.attrs.get('MATLAB_empty', 0):
+        return np.zeros(tuple(int(dim_) for dim_ in np.ravel(h5_object[()])),
+                        dtype=str if class_ == 'char' else np.float64)  # the data of an empty array is its shape
+    if class_ == 'char':
+        codes_ = np.atleast_2d(h5_object[()]).T  # rows x characters
+        return np.array([''.join(chr(code_) for code_ in row_) for row_ in codes_])
+    if class_ == 'cell' or h5_object.dtype == h5py.ref_dtype:
+        references_ = np.atleast_2d(h5_object[()]).T
+        cells_ = np.empty(references_.shape, dtype=object)
+        for index_, reference_ in np.ndenumerate(references_):
+            cells_[index_] = mat_value(h5_object.file[reference_])
+        return cells_
+    return MatArray(h5_object)
+
+
+class MatStruct:
+    """
+    a struct of a v7.3 .mat file, indexed like the 1x1 record array of scipy.io.loadmat: struct_[field] is a 1x1
+    object array of the value of the field, struct_[0] the row and struct_[0][0] the record, whose [field] is the value
+    itself (e.g., file_['RGB']['Center'][0][0] and file_['HeartRateWv']['High'][0][0][0][0]['Signal']).
+    """
+
+    def __init__(self, group, depth=0):
+        self.group = group
+        self.depth = depth  # 0: the 1x1 array, 1: its row, 2: its record
+
+    def keys(self):
+        return [name_ for name_ in self.group if not name_.startswith('#')]
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            if key not in (0, -1) or self.depth == 2:
+                raise IndexError(f'index {key} is out of bounds of a 1x1 struct')
+            return MatStruct(self.group, depth=self.depth + 1)
+        value_ = mat_value(self.group[key])  # KeyError for a missing field, same as loadmat
+        if self.depth == 2:
+            return value_
+        holder_ = np.empty((1, 1)[self.depth:], dtype=object)
+        holder_[(0, 0)[self.depth:]] = value_
+        return holder_
+
+
+class MatArray:
+    """
+    a numeric array of a v7.3 .mat file, read from its h5py dataset only when sliced or converted (np.asarray), in
+    the orientation of MATLAB (HDF5 stores it transposed). Vectors stay lazy when reshaped or transposed, e.g., the
+    (n, 1) ecg_time reshaped to (n, ), so that they can be streamed into the NWB file (see storage_policy.is_lazy).
+    """
+
+    def __init__(self, dataset, shape=None):
+        self.dataset = dataset
+        self.shape = tuple(dataset.shape[::-1]) if shape is None else tuple(shape)
+        self.dtype = dataset.dtype
+        self.is_vector = sum(dim_ > 1 for dim_ in dataset.shape) <= 1
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        values_ = self.dataset[()]
+        values_ = values_.reshape(self.shape) if self.is_vector else values_.T
+        return values_ if dtype is None else values_.astype(dtype)
+
+    def reshape(self, *shape):
+        shape_ = tuple(shape[0]) if len(shape) == 1 and isinstance(shape[0], (tuple, list)) else shape
+        if not self.is_vector:
+            return np.asarray(self).reshape(shape_)
+        shape_ = [int(dim_) for dim_ in shape_]
+        if -1 in shape_:
+            shape_[shape_.index(-1)] = self.size // max(int(np.prod([dim_ for dim_ in shape_ if dim_ != -1])), 1)
+        if int(np.prod(shape_)) != self.size:
+            raise ValueError(f'cannot reshape array of size {self.size} into shape {tuple(shape_)}')
+        return MatArray(self.dataset, shape=shape_)
+
+    def transpose(self):
+        if not self.is_vector:
+            return np.asarray(self).T
+        return MatArray(self.dataset, shape=self.shape[::-1])
+
+    def __getitem__(self, selection):
+        selection_ = selection if isinstance(selection, tuple) else (selection,)
+        if len(selection_) <= self.ndim and all(basic_index(dum_) for dum_ in selection_):  # read from the dataset
+            if self.is_vector and self.ndim == 1:
+                index_ = [0] * self.dataset.ndim  # the vector along its only long axis (the first one if 1x1)
+                index_[int(np.argmax(self.dataset.shape))] = selection_[0]
+                return self.dataset[tuple(index_)]
+            if self.shape == tuple(self.dataset.shape[::-1]):
+                selection_ += (slice(None),) * (self.ndim - len(selection_))
+                return np.asarray(self.dataset[selection_[::-1]]).T
+        return np.asarray(self)[selection]
+
+
+def basic_index(index_):
+    """
+    :return: whether the index (of one axis) is an integer or a slice with a positive step, i.e., can be passed on
+             to an h5py dataset as it is
+    """
+
+    if isinstance(index_, slice):
+        return index_.step is None or index_.step > 0
+    return isinstance(index_, (int, np.integer))
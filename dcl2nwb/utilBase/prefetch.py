@@ -0,0 +1,143 @@
+import os
+import time
+import queue
+import threading
+from dcl2nwb.utilBase.session_resources import source_files
+
+
+class SessionPrefetcher:
+    """
+    the reader stage of the pipelined batch conversion: a thread reading the source files of the upcoming sessions
+    (see session_resources.source_files) into memory, in the order of the sessions, while the former ones are being
+    converted and written; iterating over it yields each task along with its files read ahead, as soon as they are.
+    At most depth sessions wait read ahead (bounded queue), and the files of the sessions read ahead and not released
+    yet (see release) never sum up to more than memory_mb; a session larger than that on its own is not read ahead,
+    its files are read by its conversion as usual. For the conversions in other processes (pool), the files are only
+    read into the page cache of the system (in_memory=False) and handed over by their paths: their bytes would
+    otherwise be pickled to the process while still held here, i.e., twice the memory cap at worst.
+    """
+
+    def __init__(self, tasks, depth=2, memory_mb=2048, in_memory=True):
+        """
+        :param tasks: the conversion tasks of the sessions, as generated by batch_conversion.session_tasks
+        :param depth: number of sessions read ahead at most (default: 2)
+        :param memory_mb: the memory cap of the files read ahead in MB (default: 2048); the cap of the page cache
+                          taken by them if not in_memory
+        :param in_memory: whether to keep the files read ahead in memory (default), or only read them into the page
+                          cache of the system, to be read from there by the conversion (e.g., in another process)
+        """
+
+        self.ready = queue.Queue(maxsize=max(depth, 1))  # (task, prefetched) read ahead, None once all of them are
+        self.memory_cap = memory_mb * 2**20
+        self.in_memory = in_memory
+        self.held = 0  # bytes read ahead and not released yet
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.read_ahead, args=(list(tasks),), daemon=True)
+        self.thread.start()
+
+    def read_ahead(self, tasks):
+        """
+        the loop of the reader thread; see SessionPrefetcher.
+        """
+
+        for task_ in tasks:
+            try:
+                prefetched = self.prefetch(task_)
+            except Exception:
+                prefetched = None  # read by the conversion instead (e.g., the session folder is gone)
+            while not self.stopped:
+                try:
+                    self.ready.put((task_, prefetched), timeout=1)  # blocks while depth sessions are waiting
+                    break
+                except queue.Full:
+                    pass
+            if self.stopped:
+                return
+        self.ready.put(None)
+
+    def prefetch(self, task):
+        """
+        :param task: the conversion task of a session
+        :return: the prefetched dict of the session (see __iter__), or None if it is larger than the memory cap or
+                 the reader is stopped; waits for the memory of the former sessions to be released, if needed
+        """
+
+        sizes_ = {path_: os.stat(path_).st_size for path_ in source_files(task)}
+        size_ = sum(sizes_.values())
+        if size_ > self.memory_cap:
+            return None
+        with self.condition:
+            self.condition.wait_for(lambda: self.stopped or self.held + size_ <= self.memory_cap)
+            if self.stopped:
+                return None
+            self.held += size_
+        prefetched = {'files': {}, 'bytes': size_, 'read_s': 0.0, 'wait_s': 0.0}
+        start_ = time.perf_counter()
+        for path_ in sizes_:
+            try:
+                if self.in_memory:
+                    with open(path_, 'rb') as file_:
+                        prefetched['files'][str(path_)] = file_.read()
+                else:
+                    warm_cache(path_)
+                    prefetched['files'][str(path_)] = str(path_)  # read from the page cache by the conversion
+            except OSError:
+                pass  # read by the conversion instead
+        prefetched['read_s'] = time.perf_counter() - start_
+        return prefetched
+
+    def __iter__(self):
+        """
+        :return: an iterator of (task, prefetched) in the order of the tasks, where prefetched is a dict of the files
+                 read ahead (files: path (str) -> bytes, or the path itself if not in_memory), their bytes, read_s
+                 (time of the reader) and wait_s (time waited for them by the consumer), or None if the session was
+                 not read ahead
+        """
+
+        try:
+            while True:
+                start_ = time.perf_counter()
+                item_ = self.ready.get()
+                if item_ is None:
+                    return
+                task_, prefetched = item_
+                if prefetched is not None:
+                    prefetched['wait_s'] = time.perf_counter() - start_
+                yield task_, prefetched
+        finally:
+            self.close()  # also when the consumer gives up early, e.g., on an error
+
+    def release(self, prefetched):
+        """
+        gives the memory of the files read ahead for a session back to the reader, once the session is converted.
+        :param prefetched: the prefetched dict of the session, as yielded by the iterator (None does nothing)
+        """
+
+        if prefetched is None:
+            return
+        with self.condition:
+            self.held -= prefetched['bytes']
+            prefetched['files'] = {}
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        stops the reader thread, e.g., when the batch is interrupted.
+        """
+
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+def warm_cache(path_, buffer_mb=16):
+    """
+    reads a file through one buffer of buffer_mb, only for its content to be in the page cache of the system.
+    :param path_: path of the file
+    """
+
+    buffer_ = bytearray(buffer_mb * 2**20)
+    with open(path_, 'rb', buffering=0) as file_:
+        while file_.readinto(buffer_):
+            pass
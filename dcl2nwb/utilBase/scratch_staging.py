@@ -0,0 +1,67 @@
+import os
+import shutil
+import pathlib
+import tempfile
+import warnings
+import contextlib
+from dcl2nwb.utilBase.session_resources import source_files
+from dcl2nwb.utilBase.instrumentation import stage
+
+
+@contextlib.contextmanager
+def staged_session(task, scratch_dir, exclude=()):
+    """
+    A function to stage the source files of a session on a local (scratch) drive for the time of its conversion: the
+    files read by the conversion (see session_resources.source_files; not the whole session folder, nor the video) are
+    copied one after the other into a folder of its own inside scratch_dir, timed as the scratch_stage stage of the
+    active timer (if any) of the instrumentation, and removed along with the folder at the end of the block, whatever
+    its outcome. The folder also takes the temporaries of the conversion (e.g., the session2csv folder), so that
+    nothing is written into the session folder. If the staging fails (e.g., the scratch drive is full), the session
+    is converted from its source files, with a warning.
+    :param task: a dict describing the session, as generated by batch_conversion.session_tasks
+    :param scratch_dir: path of the local scratch folder (created if needed); None for no staging
+    :param exclude: the paths (str) of the files not to stage, e.g., the ones already read ahead into memory
+    :return: a dict of the staging folder (dir; None if not staged) and the staged files (files: path (str) -> path
+             object of its local copy), to be served by the SessionResources (see session_resources.use_sources)
+    """
+
+    if scratch_dir is None:
+        yield {'dir': None, 'files': {}}
+        return
+    stage_dir = None
+    try:
+        pathlib.Path(scratch_dir).mkdir(parents=True, exist_ok=True)
+        stage_dir = pathlib.Path(tempfile.mkdtemp(prefix=f'{task["session_name"]}-', dir=scratch_dir))
+        files_ = stage_files(task, stage_dir, exclude=exclude)
+    except OSError as error:
+        warnings.warn(f'could not stage the following session on {scratch_dir}; converted from its source files:\n'
+                      f'{task["session_path"]}\n{type(error).__name__}: {error}')
+        if stage_dir is not None:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+        stage_dir, files_ = None, {}
+    try:
+        yield {'dir': stage_dir, 'files': files_}
+    finally:
+        if stage_dir is not None:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+
+
+def stage_files(task, stage_dir, exclude=()):
+    """
+    :param task: a dict describing the session
+    :param stage_dir: path object of the (empty) staging folder of the session
+    :param exclude: the paths (str) of the files not to stage
+    :return: a dict of path (str) -> path object of the local copy of the staged files, at the same relative paths
+    """
+
+    session_path = task['session_path']
+    paths_ = [path_ for path_ in source_files(task) if str(path_) not in exclude]
+    size_ = sum(os.stat(path_).st_size for path_ in paths_)
+    files_ = {}
+    with stage('scratch_stage', bytes_read=size_, bytes_written=size_):
+        for path_ in paths_:
+            target_ = stage_dir / path_.relative_to(session_path)
+            target_.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path_, target_)
+            files_[str(path_)] = target_
+    return files_
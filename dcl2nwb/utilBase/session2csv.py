@@ -1,16 +1,30 @@
 import numpy as np
 import pandas as pd
-from scipy.io import loadmat
 import pathlib
 import warnings
 import shutil
+from dcl2nwb.utilBase.session_tables import write_tables, interval_series
+from dcl2nwb.utilBase import session_resources  # lines_main_path read at call time; it may be set after import
+from dcl2nwb.utilBase.session_resources import SessionResources, cached_metadata, lines_index, metadata_variables
+from dcl2nwb.utilBase.instrumentation import stage, path_size
+from dcl2nwb.utilBase.storage_policy import is_lazy
+
+
+def lazy_or_array(value_):
+    """
+    :param value_: a series of a main table (list, array or lazy array of a v7.3 .mat file)
+    :return: the series as an array; the lazy arrays (see storage_policy.is_lazy) are kept as they are, to be streamed
+    """
+
+    return value_ if is_lazy(value_) else np.asarray(value_)
 
 
 def session2csv(input_dir, experimenter,
                 convert_behavior, convert_cardiac, convert_thermal,
-                description, doi, keywords):
+                description, doi, keywords, intermediate_format='csv', out_dir=None):
     """
     A function to convert sessions into pre-structured csv files to be fed into dcl2nwb pipeline.
+    The tables are generated in memory by session2tables and exported into the session2csv folder of the session.
     :param input_dir: the path object pointing to a single session
     :param experimenter: the name of the experimenter of the session
     :param convert_behavior: a boolean indicator of whether to convert the behavior data in the session
@@ -19,27 +33,62 @@ def session2csv(input_dir, experimenter,
     :param description: a global description of the project (default: 'na')
     :param doi: doi of the relevant research work (default: 'na')
     :param keywords: keywords of the research data (default: 'na')
+    :param intermediate_format: format of the main (data) tables; 'csv' (default), 'parquet', 'feather' or 'npz'; the
+                                meta tables and the main-info-sheet are always written as csv files
+    :param out_dir: (optional) the path object of the folder to write the tables into, e.g., on a local scratch drive
+                    (default: the session2csv folder of the session)
     :return: if successful: 'conversionSuccessful', i.e., a folder containing all the converted csv files is generated,
              otherwise: on each level can return different reports of failure as strings
     """
 
-    mainInfoSheet = {'data/meta': ['mainData', 'metaData']}  # to be updated
-
-    out_dir = input_dir / 'session2csv'  # temporary output folder
+    out_dir = input_dir / 'session2csv' if out_dir is None else out_dir  # temporary output folder
     if out_dir.exists():
         shutil.rmtree(out_dir)  # if already exists removes it; I want it afresh!
         pathlib.Path.mkdir(out_dir)
     else:
         pathlib.Path.mkdir(out_dir)
 
-    # lines_main_path = r'F:\Jeremy\MATLAB_Scripts\Toolbox\+DataBase\+Lists\MouseLines_List.mat'  # to be fixed at the DCL
-    lines_main_path = r'C:\Users\DCL\Desktop\DCL-files\MouseLines_List.mat'  # test on my PC
+    status_, tables = session2tables(input_dir, experimenter,
+                                     convert_behavior, convert_cardiac, convert_thermal,
+                                     description, doi, keywords)
+    write_tables(tables, out_dir, intermediate_format=intermediate_format)
+
+    return status_
+
+
+def session2tables(input_dir, experimenter,
+                   convert_behavior, convert_cardiac, convert_thermal,
+                   description, doi, keywords):
+    """
+    A function to convert sessions into the pre-structured tables (in memory) to be fed into dcl2nwb pipeline; the
+    same tables as written by session2csv, without any disk writes or text formatting of the data.
+    :param input_dir: the path object pointing to a single session
+    :param experimenter: the name of the experimenter of the session
+    :param convert_behavior: a boolean indicator of whether to convert the behavior data in the session
+    :param convert_cardiac: a boolean indicator of whether to convert the cardiac data in the session
+    :param convert_thermal: a boolean indicator of whether to convert the thermal data in the session
+    :param description: a global description of the project (default: 'na')
+    :param doi: doi of the relevant research work (default: 'na')
+    :param keywords: keywords of the research data (default: 'na')
+    :return: a tuple of the status and the dict of the tables (file name -> table, including the main-info-sheet.csv;
+             the main tables are ragged, i.e., dicts of <name>_time/<name>_data -> 1-D array at its own length, the
+             others are data frames); the status is 'conversionSuccessful' if successful, otherwise on each level can be
+             different reports of failure as strings (with the tables generated so far)
+    """
+
+    mainInfoSheet = {'data/meta': ['mainData', 'metaData']}  # to be updated
+    tables = {}  # file name -> data frame
+    resources = SessionResources(input_dir)  # the session folder listed once and each .mat file loaded once
+
     try:
-        lines_main = loadmat(lines_main_path)  # to be fixed at the DCL
+        # the lines and their index, loaded once per process
+        lines_main, lines_rows = cached_metadata(session_resources.lines_main_path, 'MouseLines_List',
+                                                 variable_names=metadata_variables['MouseLines_List'],
+                                                 parse=lines_index)
     except:
         warnings.warn('The following path is not found... IGNORING...\n'
-                      f'{lines_main_path}')
-        return 'noLinesManual'
+                      f'{session_resources.lines_main_path}')
+        return 'noLinesManual', tables
 
     behavior_list = [
         'Rearing', 'rearing', 'Immobility', 'immobility', 'Remaining', 'remaining',
@@ -48,7 +97,7 @@ def session2csv(input_dir, experimenter,
         'Grooming', 'grooming', 'TailRattling', 'tail_rattling', 'Tail rattling']
 
     # get a *.pl2 file from the path and split the name '_' to get Line, MouseID, date, paradigm
-    pl2_list = list(input_dir.glob('*.pl2'))  # checking if the pl2 files exist
+    pl2_list = resources.files('pl2')  # checking if the pl2 files exist
     if any(pl2_list) and not len(pl2_list) > 1:
         base_split = pl2_list[0].stem.split('_')  # split the parts of the base name
         line = base_split[0]
@@ -58,7 +107,7 @@ def session2csv(input_dir, experimenter,
     else:
         warnings.warn('Either NO or MULTIPLE <.pl2> files found in the following path... IGNORING...\n'
                       f'{input_dir}')
-        return 'noProperSession'
+        return 'noProperSession', tables
 
     # make the structured table of meta-data here using the things uploaded before
     dict_session = {
@@ -77,7 +126,7 @@ def session2csv(input_dir, experimenter,
     }
     # export the session-meta
     df_ = pd.DataFrame(dict_session, index=[0])  # to save all scalars | pandas
-    df_.to_csv(out_dir / 'session-meta.csv')
+    tables['session-meta.csv'] = df_
     # adding to the main-info-sheet
     mainInfoSheet.update({
         'session_information': ['', 'session-meta.csv']
@@ -87,9 +136,8 @@ def session2csv(input_dir, experimenter,
     # mouse meta from file (if existing)
     #
 
-    lines_list = [lines_main['Lines'][i][0][0] for i in range(len(lines_main['Lines']))]  # list of all main lines
     try:
-        full_line = lines_main['Lines'][lines_list.index(line)][1][0]  # subject species fullname from the main file
+        full_line = lines_main[lines_rows[line]][1][0]  # subject species fullname from the main file
         if full_line == 'Bl6':
             full_line = 'Bl6/C57'
         else:
@@ -99,11 +147,12 @@ def session2csv(input_dir, experimenter,
             'The following line (from the following path) does not exist in the main list of the lines... IGNORING...\n'
             f'{line} from\n'
             f'{input_dir}')
-        return 'noMatchingLine'
+        return 'noMatchingLine', tables
 
-    meta_file = list(input_dir.parent.glob(f'{line}_{mouse_id}_Meta.mat'))  # must be located in the root folder
-    if any(meta_file):
-        meta_file = loadmat(meta_file[0])
+    meta_path = input_dir.parent / f'{line}_{mouse_id}_Meta.mat'  # must be located in the root folder
+    if meta_path.is_file():
+        # loaded once per process for all the sessions of the mouse
+        meta_file = cached_metadata(meta_path, 'Meta', variable_names=metadata_variables['Meta'])
         subject_genotype = meta_file['General'][1][6][0]
         subject_sex = meta_file['General'][1][4][0]
         # subject_dob = meta_file['General'][1][5][0]  # could be added as a date-time format later
@@ -121,7 +170,7 @@ def session2csv(input_dir, experimenter,
     }
     # export the subject-meta
     df_ = pd.DataFrame(dict_subject, index=[0])  # to save all scalars | pandas
-    df_.to_csv(out_dir / 'subject-meta.csv')
+    tables['subject-meta.csv'] = df_
     # adding to the main-info-sheet
     mainInfoSheet.update({
         'subject_information': ['', 'subject-meta.csv']
@@ -129,7 +178,8 @@ def session2csv(input_dir, experimenter,
 
     # devices meta
     dict_devices = {
-        'name': ['endpoint_recording_device', 'Pike camera', 'A655sc', 'RZ6', 'Ce:YAG Laser diode', 'Stimulus isolator'],
+        'name': ['endpoint_recording_device', 'Pike camera', 'A655sc', 'RZ6', 'Ce:YAG Laser diode',
+                 'Stimulus isolator'],
         'manufacturer': ['Plexon(Omniplex)', 'Allied vision', 'FLIR', 'Tucker-Davis systems', 'Doric', 'npi'],
         'description': ['Main digital-analog recording system',
                         'Top view RGB camera',
@@ -139,7 +189,7 @@ def session2csv(input_dir, experimenter,
                         'DC current generator to deliver foot shocks']
     }
     df_ = pd.DataFrame(dict_devices)
-    df_.to_csv(out_dir / 'devices-meta.csv')
+    tables['devices-meta.csv'] = df_
     # adding to the main-info-sheet
     mainInfoSheet.update({
         'devices_information': ['', 'devices-meta.csv']
@@ -160,9 +210,10 @@ def session2csv(input_dir, experimenter,
             'comments': [],
             'interface_subtype': []
         }
-        dvt_file = list(input_dir.glob('*.DVT'))
+        dvt_file = resources.files('DVT')
         if any(dvt_file):
-            file_ = pd.read_csv(dvt_file[0], header=None)
+            with stage('read_DVT', bytes_read=0 if resources.read_ahead(dvt_file[0]) else path_size(dvt_file[0])):
+                file_ = pd.read_csv(resources.source(dvt_file[0]), header=None)  # from memory if read ahead
             avi_times = file_.iloc[:, 1].to_numpy()  # video times array
         else:
             warnings.warn(
@@ -170,10 +221,10 @@ def session2csv(input_dir, experimenter,
                 'IGNORING...\n'
                 f'{line} from\n'
                 f'{input_dir}')
-            return 'noDVT'
-        tracking_file = list(input_dir.glob('*_Tracking.mat'))
+            return 'noDVT', tables
+        tracking_file = resources.files('Tracking')
         if any(tracking_file):
-            file_ = loadmat(tracking_file[0])
+            file_ = resources.loadmat('Tracking', variable_names=['RGB'])
             x_pos = file_['RGB']['Center'][0][0][:, 0]
             dict_behavior.update({'x_coordinates_time': avi_times,
                                   'x_coordinates_data': x_pos})
@@ -210,12 +261,12 @@ def session2csv(input_dir, experimenter,
             warnings.warn(
                 'Could NOT find the <_Tracking.mat> from the following path... IGNORING...\n'
                 f'{input_dir}')
-            return 'noTrackingFile'
+            return 'noTrackingFile', tables
 
         # speed data and epochs:
-        tempBehavior_file = list(input_dir.glob('*_TempBehaviour.mat'))
+        tempBehavior_file = resources.files('TempBehaviour')
         if any(tempBehavior_file):
-            file_ = loadmat(tempBehavior_file[0])
+            file_ = resources.loadmat('TempBehaviour', variable_names=['StepSpeed', 'Data'])
             speed_data = file_['StepSpeed']
             speed_data = speed_data.reshape(len(speed_data), )  # to make an acceptable shape
             dict_behavior.update({'speed_time': avi_times,
@@ -231,14 +282,13 @@ def session2csv(input_dir, experimenter,
             for beh_ in behavior_list:
                 # see if exists
                 try:
-                    epoch_range = file_['Data'][beh_][0][0]
+                    epoch_range = np.asarray(file_['Data'][beh_][0][0])  # small; read at once (v7.3)
                 except:
                     continue
                 #
-                range_list = [f'[{epoch_range[i, 0]}, {epoch_range[i, 1]}]' for i in range(len(epoch_range))]
-                dict_behavior.update(
-                    {f'{beh_}_time': range_list,  # range_list may need to be converted into an np.array
-                     f'{beh_}_data': [np.nan for i in range(len(range_list))]})
+                epoch_time, epoch_data = interval_series(epoch_range)  # start/stop times labelled 1/-1
+                dict_behavior.update({f'{beh_}_time': epoch_time,
+                                      f'{beh_}_data': epoch_data})
                 dict_behavior_meta['data_index'].append(f'{beh_}')
                 dict_behavior_meta['name'].append(f'{beh_}')
                 dict_behavior_meta['description'].append(f'epoch range for the behavior {beh_}')
@@ -250,18 +300,16 @@ def session2csv(input_dir, experimenter,
             warnings.warn(
                 'Could NOT find the <_TempBehaviour.mat> from the following path... IGNORING...\n'
                 f'{input_dir}')
-            return 'noTempBehaviourFile'
+            return 'noTempBehaviourFile', tables
 
         # export the dict_behaviour
-        df_ = pd.DataFrame.from_dict(dict_behavior, orient='index').transpose()
-        df_.set_index(list(dict_behavior.keys())[0],
-                      inplace=True)  # just to get rid of indexing columns in the out.csv file
-        df_.to_csv(out_dir / 'behavioralData.csv')
+        # ragged: each series at its own length (no padding); padded into the wide table only for the csv export
+        tables['behavioralData.csv'] = {key_: lazy_or_array(value_) for key_, value_ in dict_behavior.items()}
 
         # export the dict_behaviour_meta
         df_ = pd.DataFrame(dict_behavior_meta)
         df_.set_index('data_index', inplace=True)
-        df_.to_csv(out_dir / 'behavioralData-meta.csv')
+        tables['behavioralData-meta.csv'] = df_
 
         # adding to the main-info-sheet
         mainInfoSheet.update({
@@ -285,7 +333,7 @@ def session2csv(input_dir, experimenter,
             'endpoint_recording_device': ['endpoint_recording_device']
         }
         df_ = pd.DataFrame(dict_ecg_dev)
-        df_.to_csv(out_dir / 'ecg-device-meta.csv')
+        tables['ecg-device-meta.csv'] = df_
         # adding to the main-info-sheet
         mainInfoSheet.update({
             'ecg_device': ['', 'ecg-device-meta.csv']
@@ -298,7 +346,7 @@ def session2csv(input_dir, experimenter,
             'electrode_info': ['none', 'none', 'none']
         }
         df_ = pd.DataFrame(dict_)
-        df_.to_csv(out_dir / 'ecg-electrodes-meta.csv')
+        tables['ecg-electrodes-meta.csv'] = df_
         # adding to the main-info-sheet
         mainInfoSheet.update({
             'ecg_electrodes': ['', 'ecg-electrodes-meta.csv']
@@ -312,7 +360,7 @@ def session2csv(input_dir, experimenter,
             'channel_info': ['none', 'none']
         }
         df_ = pd.DataFrame(dict_)
-        df_.to_csv(out_dir / 'ecg-channels-meta.csv')
+        tables['ecg-channels-meta.csv'] = df_
         # adding to the main-info-sheet
         mainInfoSheet.update({
             'ecg_channels': ['', 'ecg-channels-meta.csv']
@@ -329,9 +377,9 @@ def session2csv(input_dir, experimenter,
             'type': []
         }
 
-        cardiac_file = list(input_dir.glob('complementary_exports/*_CardiacData.mat'))
+        cardiac_file = resources.files('CardiacData')
         if any(cardiac_file):
-            file_ = loadmat(cardiac_file[0])
+            file_ = resources.loadmat('CardiacData', variable_names=['cardiacData'])
 
             ecg_time = file_['cardiacData']['ecg_time'][0][0]
             ecg_time = ecg_time.reshape(len(ecg_time), )  # to make an acceptable shape
@@ -366,12 +414,12 @@ def session2csv(input_dir, experimenter,
             warnings.warn(
                 'Could NOT find the -CardiacData export from ECGLog- from the following path... IGNORING...\n'
                 f'{input_dir / "complementary_exports"}')
-            return 'noCardiacDataExport'
+            return 'noCardiacDataExport', tables
 
         # secondary readouts
-        procHR_file = list(input_dir.glob('*_ProcHR.mat'))
+        procHR_file = resources.files('ProcHR')
         if any(procHR_file):
-            file_ = loadmat(procHR_file[0])
+            file_ = resources.loadmat('ProcHR', variable_names=['Times', 'Loess', 'HRtoCeil', 'HeartRateWv'])
 
             time_stamp = file_['Times']
             time_stamp = time_stamp.reshape(len(time_stamp), )  # to make an acceptable shape
@@ -434,18 +482,16 @@ def session2csv(input_dir, experimenter,
         #     warnings.warn(
         #         'Could NOT find the <_ProcHR.mat> from the following path... IGNORING...\n'
         #         f'{input_dir}')
-        #     return 'noProcHRFile'
+        #     return 'noProcHRFile', tables
 
         # export the dict_cardiac
-        df_ = pd.DataFrame.from_dict(dict_cardiac, orient='index').transpose()
-        df_.set_index(list(dict_cardiac.keys())[0],
-                      inplace=True)  # just to get rid of indexing columns in the out.csv file
-        df_.to_csv(out_dir / 'cardiacData.csv')
+        # ragged: each series at its own length (no padding); padded into the wide table only for the csv export
+        tables['cardiacData.csv'] = {key_: lazy_or_array(value_) for key_, value_ in dict_cardiac.items()}
 
         # export the dict_cardiac_meta
         df_ = pd.DataFrame(dict_cardiac_meta)
         df_.set_index('data_index', inplace=True)
-        df_.to_csv(out_dir / 'cardiacData-meta.csv')
+        tables['cardiacData-meta.csv'] = df_
 
         # adding to the main-info-sheet
         mainInfoSheet.update({
@@ -469,16 +515,17 @@ def session2csv(input_dir, experimenter,
             'module_description': []
         }
 
-        thermal_file = list(input_dir.glob('*_Temperature.mat'))
+        thermal_file = resources.files('Temperature')
         if any(thermal_file):
-            file_ = loadmat(thermal_file[0])
+            file_ = resources.loadmat('Temperature', variable_names=['Tail'])
             try:
-                tracking_file = loadmat(list(input_dir.glob('*_Tracking.mat'))[0])  # required for the thermal times
+                # required for the thermal times
+                tracking_file = resources.loadmat('Tracking', variable_names=['Thermal'])
             except:
                 warnings.warn(
                     'Could NOT find the <_Tracking.mat> from the following path... IGNORING...\n'
                     f'{input_dir}')
-                return 'noTrackingFile'
+                return 'noTrackingFile', tables
 
             thermal_time = np.unique(tracking_file['Thermal']['Times'][0][0])  # convention taken from Jeremy's script
             thermal_data = file_['Tail']['Max'][0][0][:, 1]
@@ -495,18 +542,16 @@ def session2csv(input_dir, experimenter,
             warnings.warn(
                 'Could NOT find the <_Temperature.mat> from the following path... IGNORING...\n'
                 f'{input_dir}')
-            return 'noTemperatureFile'
+            return 'noTemperatureFile', tables
 
         # export the dict_thermal
-        df_ = pd.DataFrame.from_dict(dict_thermal, orient='index').transpose()
-        df_.set_index(list(dict_thermal.keys())[0],
-                      inplace=True)  # just to get rid of indexing columns in the out.csv file
-        df_.to_csv(out_dir / 'processedData.csv')
+        # ragged: each series at its own length (no padding); padded into the wide table only for the csv export
+        tables['processedData.csv'] = {key_: lazy_or_array(value_) for key_, value_ in dict_thermal.items()}
 
         # export the dict_thermal_meta
         df_ = pd.DataFrame(dict_thermal_meta)
         df_.set_index('data_index', inplace=True)
-        df_.to_csv(out_dir / 'processedData-meta.csv')
+        tables['processedData-meta.csv'] = df_
 
         # adding to the main-info-sheet
         mainInfoSheet.update({
@@ -531,23 +576,20 @@ def session2csv(input_dir, experimenter,
         'stim_type': [],
     }
 
-    events_file = list(input_dir.glob('complementary_exports/*_Events.mat'))
+    events_file = resources.files('Events')
     if any(events_file):
-        file_ = loadmat(events_file[0])
+        file_ = resources.loadmat('Events', variable_names=['Stimulus_Data'])
         # pure tone:
-        event_range = file_['Stimulus_Data']['Tone'][0][0]['pureTone_times'][0][0]
+        event_range = np.asarray(file_['Stimulus_Data']['Tone'][0][0]['pureTone_times'][0][0])
         if np.any(event_range):
             # # to save in the conventional way to be fed into the interval_series
             # range_list = [f'[{event_range[i, 0]}, {event_range[i, 1]}]' for i in range(len(event_range))]
             # dict_events.update({'pureTone_time': range_list,  # range_list may need to be converted into an np.array
             #                     'pureTone_data': [np.nan for i in range(len(range_list))]})
             # # to be fed to timeSeries
-            event_time = []
-            event_data = []
-            for i in range(len(event_range)):
-                event_time.extend([event_range[i, 0], event_range[i, 1]])
-                event_data.extend([1, -1])  # 1 indicates the start and -1 indicates end of the period
-            dict_events.update({'pureTone_time': event_time,  # range_list may need to be converted into an np.array
+            # 1 indicates the start and -1 indicates end of the period
+            event_time, event_data = interval_series(event_range)
+            dict_events.update({'pureTone_time': event_time,
                                 'pureTone_data': event_data})
             dict_events_meta['data_index'].append('pureTone')
             dict_events_meta['name'].append('pure tone')
@@ -562,19 +604,16 @@ def session2csv(input_dir, experimenter,
             dict_events_meta['device'].append('nan')
             dict_events_meta['stim_type'].append('context')
         # white noise:
-        event_range = file_['Stimulus_Data']['Noise'][0][0]['whiteNoise_times'][0][0]
+        event_range = np.asarray(file_['Stimulus_Data']['Noise'][0][0]['whiteNoise_times'][0][0])
         if np.any(event_range):
             # # to save in the conventional way to be fed into the interval_series
             # range_list = [f'[{event_range[i, 0]}, {event_range[i, 1]}]' for i in range(len(event_range))]
             # dict_events.update({'whiteNoise_time': range_list,  # range_list may need to be converted into an np.array
             #                     'whiteNoise_data': [np.nan for i in range(len(range_list))]})
             # # to be fed to timeSeries
-            event_time = []
-            event_data = []
-            for i in range(len(event_range)):
-                event_time.extend([event_range[i, 0], event_range[i, 1]])
-                event_data.extend([1, -1])  # 1 indicates the start and -1 indicates end of the period
-            dict_events.update({'whiteNoise_time': event_time,  # range_list may need to be converted into an np.array
+            # 1 indicates the start and -1 indicates end of the period
+            event_time, event_data = interval_series(event_range)
+            dict_events.update({'whiteNoise_time': event_time,
                                 'whiteNoise_data': event_data})
             dict_events_meta['data_index'].append('whiteNoise')
             dict_events_meta['name'].append('white noise')
@@ -589,26 +628,23 @@ def session2csv(input_dir, experimenter,
             dict_events_meta['device'].append('nan')
             dict_events_meta['stim_type'].append('context')
         # shock:
-        event_range = file_['Stimulus_Data']['Shock'][0][0]['shock_times'][0][0]
+        event_range = np.asarray(file_['Stimulus_Data']['Shock'][0][0]['shock_times'][0][0])
         if np.any(event_range):
             # # to save in the conventional way to be fed into the interval_series
             # range_list = [f'[{event_range[i, 0]}, {event_range[i, 1]}]' for i in range(len(event_range))]
             # dict_events.update({'shock_time': range_list,  # range_list may need to be converted into an np.array
             #                     'shock_data': [10 for i in range(len(range_list))]})  #TEST 10
             # # to be fed to timeSeries
-            event_time = []
-            event_data = []
-            for i in range(len(event_range)):
-                event_time.extend([event_range[i, 0], event_range[i, 1]])
-                event_data.extend([1, -1])  # 1 indicates the start and -1 indicates end of the period
-            dict_events.update({'shock_time': event_time,  # range_list may need to be converted into an np.array
+            # 1 indicates the start and -1 indicates end of the period
+            event_time, event_data = interval_series(event_range)
+            dict_events.update({'shock_time': event_time,
                                 'shock_data': event_data})
             dict_events_meta['data_index'].append('shock')
             dict_events_meta['name'].append('shock')
             dict_events_meta['unit'].append('na')
             dict_events_meta['description'].append(
-                'electrical shock stimulation exerted in specific intervals of the session. in the column data: 1 and -1'
-                ' indicate the start and end of a period of event respectively.')
+                'electrical shock stimulation exerted in specific intervals of the session. in the column data: 1 and'
+                ' -1 indicate the start and end of a period of event respectively.')
             dict_events_meta['comments'].append('none')
             dict_events_meta['excitation_lambda'].append('nan')
             dict_events_meta['location'].append('nan')
@@ -617,19 +653,17 @@ def session2csv(input_dir, experimenter,
             dict_events_meta['device'].append('nan')
             dict_events_meta['stim_type'].append('context')
         # opto:
-        event_range = file_['Stimulus_Data']['Opto'][0][0]['opto_times'][0][0]
+        event_range = np.asarray(file_['Stimulus_Data']['Opto'][0][0]['opto_times'][0][0])
         if np.any(event_range):
             # # to save in the conventional way to be fed into the interval_series
             # range_list = [f'[{event_range[i, 0]}]' for i in range(len(event_range))]
             # dict_events.update({'opto_time': range_list,  # range_list may need to be converted into an np.array
             #                     'opto_data': [np.nan for i in range(len(range_list))]})
             # # to be fed to timeSeries
-            event_time = []
-            event_data = []
-            for i in range(len(event_range)):
-                event_time.append(event_range[i, 0])
-                event_data.append(1)  # 1 indicates the start and -1 indicates end of the period | no such data at DCL
-            dict_events.update({'opto_time': event_time,  # range_list may need to be converted into an np.array
+            event_time = event_range[:, 0]
+            # 1 indicates the start and -1 indicates end of the period | no such data at DCL
+            event_data = np.ones(len(event_range), dtype=int)
+            dict_events.update({'opto_time': event_time,
                                 'opto_data': event_data})
             dict_events_meta['data_index'].append('opto')
             dict_events_meta['name'].append('opto')
@@ -648,15 +682,13 @@ def session2csv(input_dir, experimenter,
             dict_events_meta['stim_type'].append('ogen')
 
         # export the dict_events
-        df_ = pd.DataFrame.from_dict(dict_events, orient='index').transpose()
-        df_.set_index(list(dict_events.keys())[0],
-                      inplace=True)  # just to get rid of indexing columns in the out.csv file
-        df_.to_csv(out_dir / 'stimulusData.csv')
+        # ragged: each series at its own length (no padding); padded into the wide table only for the csv export
+        tables['stimulusData.csv'] = {key_: lazy_or_array(value_) for key_, value_ in dict_events.items()}
 
         # export the dict_thermal_meta
         df_ = pd.DataFrame(dict_events_meta)
         df_.set_index('data_index', inplace=True)
-        df_.to_csv(out_dir / 'stimulusData-meta.csv')
+        tables['stimulusData-meta.csv'] = df_
 
         # adding to the main-info-sheet
         mainInfoSheet.update({
@@ -667,13 +699,13 @@ def session2csv(input_dir, experimenter,
         # warnings.warn(
         #     'Could NOT find the <_Events.mat> from the following path... IGNORING...\n'
         #     f'{input_dir}')
-        # return 'noEventsFile'  # commented this; since it is not important if we're gonna have events or not
+        # return 'noEventsFile', tables  # commented this; since it is not important if we're gonna have events or not
 
     #
     # image series data | to be addressed externally
     #
 
-    images_file = list(input_dir.glob(f'*_{paradigm}.AVI'))
+    images_file = resources.find(f'*_{paradigm}.AVI')
     # print(f'*_{paradigm}.AVI: {images_file}')
     if any(images_file):
         dict_image = {
@@ -681,13 +713,14 @@ def session2csv(input_dir, experimenter,
             'description': 'video of the behaving mouse in this session',
             'unit': 'na',
             # 'external_file': '/recordings',  # for the relative path of the video relative to the .nwb file
-            'external_file': images_file[0],  # for the absolute path | to be saved and changed later in the main func
+            # for the absolute path | to be saved and changed later in the main func
+            'external_file': str(images_file[0]),
             'starting_time': 0.0,
             'rate': 30.0,
             'device': 'Pike camera'
         }
         df_ = pd.DataFrame(dict_image, index=[0])  # to pass all as scalars | only one video file per session
-        df_.to_csv(out_dir / 'images-meta.csv')
+        tables['images-meta.csv'] = df_
         # adding to the main-info-sheet
         mainInfoSheet.update({
             'images_information': ['', 'images-meta.csv']
@@ -695,6 +728,6 @@ def session2csv(input_dir, experimenter,
 
     df_ = pd.DataFrame(mainInfoSheet)
     df_.set_index('data/meta', inplace=True)
-    df_.to_csv(out_dir / 'main-info-sheet.csv')
+    tables['main-info-sheet.csv'] = df_
 
-    return 'conversionSuccessful'
+    return 'conversionSuccessful', tables
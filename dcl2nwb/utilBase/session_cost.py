@@ -0,0 +1,117 @@
+import os
+import statistics
+from dcl2nwb.utilBase.session_resources import SessionResources, source_files
+
+
+# the orders in which the sessions of a batch are converted; see schedule_tasks
+schedule_orders = ['largest', 'listed']
+
+# the coefficients of the cost model of a session (see estimate_cost); to be checked against the actual duration_s and
+# peak_rss_mb of the sessions (see cost_check, in the conversion summary) and refitted when they drift apart
+cost_model = {
+    'base_s': 1.5,  # fixed time of a session: metadata, set up and write of the NWB file
+    'source_mb_per_s': 25.0,  # conversion throughput of the source files read (.mat and DVT)
+    'video_mb_per_s': 200.0,  # transfer throughput of the recording (copy)
+    'base_mb': 250.0,  # resident memory of a process converting a session, apart from its data
+    'peak_per_source_mb': 6.0,  # peak memory per MB of source files: decoded arrays, tables and their NWB copies
+}
+
+
+def recording_file(task):
+    """
+    :param task: a dict describing the session, as generated by batch_conversion.session_tasks
+    :return: the path object of the recording (video) of the session, None if there is none
+    """
+
+    paradigm = '_'.join(task['session_name'].split('_')[3:])  # <Line>_<MouseID>_<Date>_<Paradigm>
+    files_ = SessionResources(task['session_path']).find(f'*_{paradigm}.AVI')
+    return files_[0] if files_ else None
+
+
+def estimate_cost(task):
+    """
+    A function to estimate the cost of the conversion of a session up front, from the sizes of its source files
+    (stat only): the files read for its converted modalities (see session_resources.source_files; e.g., the
+    CardiacData.mat only if its cardiac data is converted, the Tracking.mat for the behavior or the thermal data)
+    drive both its time and its memory, its recording (video) only its time, since it is copied as it is.
+    :param task: a dict describing the session, as generated by batch_conversion.session_tasks
+    :return: a dict of the source_mb, video_mb, estimated time (est_s) and estimated peak memory of the process
+             converting it (est_peak_mb); see cost_model
+    """
+
+    source_mb = sum(os.stat(path_).st_size for path_ in source_files(task)) / 2**20
+    video_ = recording_file(task)
+    video_mb = os.stat(video_).st_size / 2**20 if video_ is not None else 0.0
+    return {
+        'source_mb': round(source_mb, 3),
+        'video_mb': round(video_mb, 3),
+        'est_s': round(cost_model['base_s'] + source_mb / cost_model['source_mb_per_s'] +
+                       video_mb / cost_model['video_mb_per_s'], 3),
+        'est_peak_mb': round(cost_model['base_mb'] + cost_model['peak_per_source_mb'] * source_mb, 1),
+    }
+
+
+def schedule_tasks(tasks, order='largest', estimate=True):
+    """
+    A function to estimate the cost of each session of a batch (see estimate_cost) and to order the sessions by it.
+    :param tasks: the conversion tasks of the sessions, as generated by batch_conversion.session_tasks
+    :param order: one of schedule_orders: 'largest' (default) for the longest estimated time first, so that the long
+                  sessions do not end up alone on one worker at the end of a parallel batch (shortest makespan of the
+                  longest-processing-time-first rule), or 'listed' for the order of the sessions list
+    :param estimate: whether to estimate the costs with the order 'listed' (e.g., for a memory budget); the estimate
+                     stats every source file of the batch up front, which takes a while on network drives
+    :return: a new list of the tasks, in the order of the schedule, each with its estimated cost added (cost); the
+             sessions that cannot be estimated (e.g., their folder is gone) get no cost and are put last
+    """
+
+    if order not in schedule_orders:
+        raise ValueError(f'unknown schedule: {order} (one of {", ".join(schedule_orders)})')
+    for task_ in tasks:
+        try:
+            task_['cost'] = estimate_cost(task_) if estimate or order != 'listed' else None
+        except OSError:
+            task_['cost'] = None  # left to the conversion (and its report)
+    if order == 'listed':
+        return list(tasks)
+    return sorted(tasks, key=lambda task_: -task_['cost']['est_s'] if task_['cost'] is not None else 0.0)
+
+
+def within_budget(running, task, memory_budget_mb=None):
+    """
+    :param running: the tasks of the sessions submitted and not finished yet
+    :param task: the task of the session to submit next
+    :param memory_budget_mb: (optional) the cap of the summed estimated peak memory of the sessions converted at the
+                             same time in MB; None for no cap
+    :return: whether the session fits into the memory budget along with the running ones; a session estimated above
+             the budget on its own fits once nothing else runs
+    """
+
+    if memory_budget_mb is None or not running:
+        return True
+    peaks_ = [task_['cost']['est_peak_mb'] for task_ in list(running) + [task] if task_.get('cost') is not None]
+    return sum(peaks_) <= memory_budget_mb
+
+
+def cost_check(results):
+    """
+    A function to compare the estimated and the actual costs of the converted sessions, to check the cost model.
+    :param results: the list of the result dicts of the sessions, as returned by batch_conversion.convert_session
+    :return: a dict of the number of sessions compared and the median ratios of the actual to the estimated time
+             (time_ratio) and peak memory (peak_ratio); None for a ratio without any session to compare
+    """
+
+    time_ratios, peak_ratios = [], []
+    for result_ in results:
+        counters_ = result_.get('counters') or {}
+        if not counters_.get('est_s') or result_.get('session2csv') == 'upToDate':
+            continue
+        if result_.get('duration_s'):
+            time_ratios.append(result_['duration_s'] / counters_['est_s'])
+        if counters_.get('peak_rss_mb'):
+            peak_ratios.append(counters_['peak_rss_mb'] / counters_['est_peak_mb'])
+    return {
+        'n_sessions': len(time_ratios),
+        'time_ratio': round(statistics.median(time_ratios), 3) if time_ratios else None,
+        'peak_ratio': round(statistics.median(peak_ratios), 3) if peak_ratios else None,
+        'cost_model': dict(cost_model),
+    }
@@ -0,0 +1,286 @@
+import io
+import os
+import time
+import fnmatch
+import contextlib
+import contextvars
+from dcl2nwb.utilBase.mat_reader import read_mat, is_hdf5
+from dcl2nwb.utilBase.instrumentation import stage, count, path_size
+
+
+# role of a file in a session -> its pattern, relative to the session folder (one sub folder level at most)
+session_roles = {
+    'pl2': '*.pl2',
+    'DVT': '*.DVT',
+    'Tracking': '*_Tracking.mat',
+    'TempBehaviour': '*_TempBehaviour.mat',
+    'Temperature': '*_Temperature.mat',
+    'ProcHR': '*_ProcHR.mat',
+    'CardiacData': 'complementary_exports/*_CardiacData.mat',
+    'Events': 'complementary_exports/*_Events.mat',
+}
+
+# the roles read by session2tables per converted modality (the flags of the tasks of the batch); 'Events' always
+modality_roles = {
+    'convert_behavior': ['DVT', 'Tracking', 'TempBehaviour'],
+    'convert_cardiac': ['CardiacData', 'ProcHR'],
+    'convert_thermal': ['Temperature', 'Tracking'],
+}
+
+# the source files of the session being converted in this process that are read ahead into memory (path -> bytes;
+# see prefetch.SessionPrefetcher) or into the page cache of the system (path -> path itself), or staged on a local
+# drive (path -> path of the local copy; see scratch_staging.staged_session); SessionResources serves these instead of
+# reading the files again
+active_sources = contextvars.ContextVar('active_sources', default=None)
+
+# lines_main_path = r'F:\Jeremy\MATLAB_Scripts\Toolbox\+DataBase\+Lists\MouseLines_List.mat'  # to be fixed at the DCL
+lines_main_path = r'C:\Users\DCL\Desktop\DCL-files\MouseLines_List.mat'  # test on my PC
+
+# role of a metadata file -> the variables of it that are used
+metadata_variables = {'MouseLines_List': ['Lines'], 'Meta': ['General']}
+
+# the metadata files shared by the sessions of a batch (the MouseLines_List.mat and the <Line>_<MouseID>_Meta.mat of
+# each mouse): path -> ((mtime_ns, size), parsed content); kept for the whole process, see cached_metadata
+metadata_cache = {}
+
+
+def timed_loadmat(file_path, role, variable_names=None, source=None, read_ahead=False):
+    """
+    read_mat of a .mat file, timed as the loadmat_<role> stage of the active timer (if any) of the instrumentation;
+    the bytes read are the size of the file, although a v7.3 file is only read as far as its values are used.
+    :param file_path: path of the .mat file
+    :param role: role of the file in the session, e.g., 'Tracking' or 'ProcHR'
+    :param variable_names: (optional) the names of the variables to read; all of them if None
+    :param source: (optional) the content of the file already read (a file object), to be read instead of the file
+    :param read_ahead: whether the file was read ahead (see prefetch), i.e., its bytes are counted as prefetch_bytes
+                       and not read again from the drive
+    :return: the dict of the read variables, in the layout of scipy.io.loadmat; see mat_reader.read_mat
+    """
+
+    with stage(f'loadmat_{role}', bytes_read=0 if read_ahead else path_size(file_path)):
+        return read_mat(file_path if source is None else source, variable_names=variable_names)
+
+
+@contextlib.contextmanager
+def use_sources(files):
+    """
+    makes the given source files the ones served by the SessionResources created in the block (e.g., by
+    session2tables), instead of reading the files; see active_sources.
+    :param files: a dict of path (str) -> bytes of the files read ahead into memory, their own path (str) if read
+                  ahead into the page cache of the system, or path of their local copy; None for none
+    """
+
+    token_ = active_sources.set(files)
+    try:
+        yield
+    finally:
+        active_sources.reset(token_)
+
+
+def source_files(task):
+    """
+    :param task: a dict describing the session, as generated by batch_conversion.session_tasks
+    :return: the list of the path objects of the source files read by the conversion of the session, as far as they
+             exist: the (first) file of each role needed by its converted modalities (see modality_roles), in the order
+             of session_roles; the recording (video) is not included, it is transferred as it is
+    """
+
+    roles_ = {'Events'}
+    for flag_, flag_roles in modality_roles.items():
+        if task.get(flag_):
+            roles_.update(flag_roles)
+    resources = SessionResources(task['session_path'])
+    return [resources.files(role_)[0] for role_ in session_roles if role_ in roles_ and resources.files(role_)]
+
+
+class SessionResources:
+    """
+    the files of one session for the lifetime of its conversion: the session folder (and each sub folder asked for)
+    is listed once and the files are found by role (see session_roles) or by pattern on the listing; each variable of
+    the .mat files is loaded once and then served from memory (e.g., the _Tracking.mat, needed by the behavior and
+    the thermal data). The hits, misses and load time of the .mat files are counted as mat_cache_hits,
+    mat_cache_misses and mat_load_s by the active timer (if any) of the instrumentation, and kept on the object as
+    well. The files read ahead of the conversion or staged on a local drive (see active_sources) are served from
+    there.
+    """
+
+    def __init__(self, input_dir):
+        """
+        :param input_dir: the path object pointing to a single session
+        """
+
+        self.input_dir = input_dir
+        self.listings = {}  # relative sub folder ('' for the session folder) -> sorted list of its entry names
+        self.mat_files = {}  # role -> dict of the loaded variables (so far)
+        self.mat_names = {}  # role -> set of the variable names asked for so far; None once all of them are loaded
+        self.hits = 0
+        self.misses = 0
+        self.load_s = 0.0
+        self.prefetched = active_sources.get() or {}  # path (str) -> bytes, local copy or own path, if any
+
+    def listing(self, sub_dir=''):
+        """
+        :param sub_dir: a sub folder of the session, relative (e.g., 'complementary_exports'); '' for the session folder
+        :return: the sorted names of the entries of the folder, listed once; empty if the folder does not exist
+        """
+
+        if sub_dir not in self.listings:
+            try:
+                self.listings[sub_dir] = sorted(entry_.name for entry_ in os.scandir(self.input_dir / sub_dir))
+            except OSError:
+                self.listings[sub_dir] = []
+        return self.listings[sub_dir]
+
+    def find(self, pattern):
+        """
+        :param pattern: a glob pattern relative to the session folder, e.g., '*_Retrieval.AVI' or
+                        'complementary_exports/*_Events.mat'
+        :return: the list of the path objects of the matching entries (same as input_dir.glob(pattern), in name order)
+        """
+
+        sub_dir, _, name_pattern = pattern.rpartition('/')
+        return [self.input_dir / sub_dir / name_ for name_ in self.listing(sub_dir)
+                if fnmatch.fnmatch(name_, name_pattern)]
+
+    def files(self, role):
+        """
+        :param role: role of the files in the session, one of session_roles
+        :return: the list of the path objects of the files of the role
+        """
+
+        return self.find(session_roles[role])
+
+    def source(self, file_path):
+        """
+        :param file_path: path object of a file of the session
+        :return: a file object of its content if it was read ahead, the path of its local copy if it was staged (see
+                 active_sources), otherwise the path itself
+        """
+
+        content_ = self.prefetched.get(str(file_path), file_path)
+        return io.BytesIO(content_) if isinstance(content_, bytes) else content_
+
+    def read_ahead(self, file_path):
+        """
+        :param file_path: path object of a file of the session
+        :return: whether the file was read ahead (see prefetch.SessionPrefetcher), into memory or into the page cache
+                 of the system (mapped onto its own path), rather than staged or not at all
+        """
+
+        content_ = self.prefetched.get(str(file_path))
+        return isinstance(content_, bytes) or content_ == str(file_path)
+
+    def loadmat(self, role, variable_names=None):
+        """
+        :param role: role of the .mat file in the session, one of session_roles
+        :param variable_names: (optional) the names of the variables needed; all of them if None
+        :return: the dict of the loaded variables of the (first) file of the role, in the layout of scipy.io.loadmat
+                 (see mat_reader.read_mat); each variable is loaded only on the first call asking for it
+        """
+
+        loaded_ = self.mat_files.get(role)
+        if loaded_ is not None and (self.mat_names[role] is None or
+                                    (variable_names is not None and self.mat_names[role].issuperset(variable_names))):
+            self.hits += 1
+            count('mat_cache_hits')
+            return loaded_
+        files_ = self.files(role)
+        if not files_:
+            raise FileNotFoundError(f'no {session_roles[role]} in {self.input_dir}')
+        if loaded_ is not None and variable_names is not None:
+            variable_names = [name_ for name_ in variable_names if name_ not in self.mat_names[role]]  # the missing
+        start_ = time.perf_counter()
+        variables_ = timed_loadmat(files_[0], role, variable_names=variable_names, source=self.source(files_[0]),
+                                   read_ahead=self.read_ahead(files_[0]))
+        load_s = time.perf_counter() - start_
+        self.mat_files.setdefault(role, {}).update(variables_)
+        self.mat_names[role] = None if variable_names is None else self.mat_names.get(role, set()) | set(variable_names)
+        self.misses += 1
+        self.load_s += load_s
+        count('mat_cache_misses')
+        count('mat_load_s', load_s)
+        return self.mat_files[role]
+
+
+def lines_index(lines_main):
+    """
+    :param lines_main: the dict of the loaded variables of the MouseLines_List.mat
+    :return: a tuple of the array of the lines and a dict of line -> its (first) row in the array
+    """
+
+    lines_ = lines_main['Lines']
+    index_ = {}
+    for row_ in range(len(lines_)):
+        index_.setdefault(lines_[row_][0][0], row_)
+    return lines_, index_
+
+
+def cached_metadata(file_path, role, variable_names=None, parse=None):
+    """
+    A function to load a metadata file shared by several sessions (e.g., the MouseLines_List.mat or the _Meta.mat of a
+    mouse) once per process: it is served from metadata_cache as long as its modification time and size are the same,
+    otherwise (re)loaded. The hits and misses are counted as meta_cache_hits and meta_cache_misses by the active timer
+    (if any) of the instrumentation.
+    :param file_path: path of the .mat file
+    :param role: role of the file, for the loadmat_<role> stage
+    :param variable_names: (optional) the names of the variables to load; all of them if None
+    :param parse: (optional) a function applied once to the loaded variables, e.g., lines_index; its result is cached
+    :return: the (parsed) dict of the loaded variables
+    """
+
+    key_ = str(file_path)
+    try:
+        stat_ = os.stat(file_path)
+    except OSError:
+        metadata_cache.pop(key_, None)
+        raise
+    stamp_ = (stat_.st_mtime_ns, stat_.st_size)
+    entry_ = metadata_cache.get(key_)
+    if entry_ is not None and entry_[0] == stamp_:
+        count('meta_cache_hits')
+        return entry_[1]
+    count('meta_cache_misses')
+    content_ = timed_loadmat(file_path, role, variable_names=variable_names)
+    metadata_cache[key_] = (stamp_, parse(content_) if parse is not None else content_)
+    return metadata_cache[key_][1]
+
+
+def preload_metadata(session_paths):
+    """
+    A function to load the metadata files of a batch once in the parent process, before the pool of processes is
+    started (see seed_metadata_cache); the files that cannot be loaded are left to the sessions (and their reports).
+    Only the v5/v7 files are loaded here, whose values are plain arrays: the values of a v7.3 file are read lazily
+    from its open h5py file (see mat_reader.read_mat), which can be neither pickled to the processes nor kept open by
+    the parent for the whole batch; these are loaded by each process itself, once (see cached_metadata).
+    :param session_paths: the path objects of the sessions of the batch
+    :return: the entries of the metadata_cache of the files loaded, to be passed to the processes
+    """
+
+    meta_paths = {session_path.parent / f'{"_".join(session_path.parent.name.split("_")[:2])}_Meta.mat'
+                  for session_path in session_paths}
+    preloaded = {}
+    for file_path, role, parse in ([(lines_main_path, 'MouseLines_List', lines_index)] +
+                                   [(meta_path, 'Meta', None) for meta_path in sorted(meta_paths)]):
+        try:
+            if is_hdf5(file_path):
+                continue
+            cached_metadata(file_path, role, variable_names=metadata_variables[role], parse=parse)
+            preloaded[str(file_path)] = metadata_cache[str(file_path)]
+        except Exception:
+            pass
+    return preloaded
+
+
+def seed_metadata_cache(cache, lines_path=None):
+    """
+    the initializer of the processes of a pool: takes over the metadata_cache of the parent (see preload_metadata), so
+    that the processes do not load the same files again; stale entries are still reloaded by their modification time.
+    :param cache: the metadata_cache of the parent, as returned by preload_metadata
+    :param lines_path: (optional) the lines_main_path of the parent, e.g., as set after import; taken over as well,
+                       since the spawned processes only see the one of the module
+    """
+
+    global lines_main_path
+    metadata_cache.update(cache)
+    if lines_path is not None:
+        lines_main_path = lines_path
@@ -0,0 +1,395 @@
+import numpy as np
+import pandas as pd
+import pathlib
+import struct
+import warnings
+import zipfile
+from dcl2nwb.utilBase.instrumentation import stage, path_size
+
+
+# the strings parsed as nan by pandas.read_csv (default na_values); kept identical for the in-memory tables
+na_strings = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+intermediate_suffixes = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+
+
+def write_tables(tables, out_dir, intermediate_format='csv'):
+    """
+    A function to export the tables of a session (as generated by session2tables), e.g., for debugging or for the
+    hand-off to the base_func_sheet through the disk.
+    The meta tables and the main-info-sheet are always written as CSV files; the main (data) tables are written in the
+    chosen intermediate format and the main-info-sheet points at these files. Only the CSV files hold the former wide
+    tables (every series padded with nan to the longest one); the binary formats keep each series at its own length.
+    :param tables: a dict of file name -> table (data frame, or a dict of series for the main tables), including the
+                   main-info-sheet.csv
+    :param out_dir: a path object pointing to the (existing) folder to write the files into
+    :param intermediate_format: format of the main tables; one of 'csv' (default), 'parquet', 'feather' or 'npz'
+    """
+
+    suffix_ = intermediate_suffixes[intermediate_format]
+    renamed = {}  # main table name (.csv) -> file name in the chosen format
+    if intermediate_format != 'csv' and 'main-info-sheet.csv' in tables:
+        info_ = tables['main-info-sheet.csv'].copy()
+        for key_ in info_.columns:
+            name_ = info_.at['mainData', key_]
+            if name_ in tables:
+                renamed[name_] = info_.at['mainData', key_] = f'{name_.rsplit(".", 1)[0]}{suffix_}'
+        tables = dict(tables, **{'main-info-sheet.csv': info_})
+
+    with stage('tables_write') as counts_:
+        for name_, table_ in tables.items():
+            if name_ in renamed:
+                write_main(table_, out_dir / renamed[name_], intermediate_format)
+            elif isinstance(table_, dict):
+                padded_table(table_).to_csv(out_dir / name_)
+            else:
+                table_.to_csv(out_dir / name_)
+        counts_['bytes_written'] = path_size(out_dir)
+
+
+def padded_table(columns):
+    """
+    :param columns: a ragged main table; dict of column name (<name>_time/<name>_data) -> 1-D array
+    :return: the former wide data frame of the table, every series padded with nan to the longest one and indexed by
+             the first column (as written into the CSV files)
+    """
+
+    df_ = pd.DataFrame.from_dict({key_: np.asarray(array_) for key_, array_ in columns.items()},
+                                 orient='index').transpose()
+    if columns:
+        df_.set_index(list(columns.keys())[0], inplace=True)  # just to get rid of indexing columns in the out.csv file
+    return df_
+
+
+def write_main(columns, path_, intermediate_format):
+    """
+    writes one ragged main (data) table in a binary format, each series at its own length: as the arrays of one NPZ
+    file, or as one file per <name>_time/<name>_data pair inside a folder (Parquet or Feather).
+    :param columns: the ragged main table; dict of column name -> 1-D array
+    :param path_: a path object of the file (NPZ) or the folder (Parquet, Feather) to write
+    :param intermediate_format: one of 'parquet', 'feather' or 'npz'
+    """
+
+    if intermediate_format == 'npz':
+        np.savez(path_, **{key_: np.asarray(array_) for key_, array_ in columns.items()})
+        return
+    pathlib.Path.mkdir(path_)
+    for key_ in columns:
+        if not key_.endswith('_time'):
+            continue
+        name_ = key_[:-len('_time')]
+        df_ = pd.DataFrame({key_: np.asarray(columns[key_]), f'{name_}_data': np.asarray(columns[f'{name_}_data'])})
+        if intermediate_format == 'parquet':
+            df_.to_parquet(path_ / f'{name_}.parquet', index=False)
+        elif intermediate_format == 'feather':
+            # uncompressed, to be memory-mapped when read
+            df_.to_feather(path_ / f'{name_}.feather', compression='uncompressed')
+        else:
+            raise ValueError(f'unknown intermediate format: {intermediate_format}')
+
+
+def main_info(tables):
+    """
+    A function to resolve the main-info-sheet of the in-memory tables into the pointers of the base_func_sheet.
+    :param tables: a dict of file name -> table, as generated by session2tables
+    :return: a dict of base_func_sheet function name -> {'mainData': table, 'metaData': table}, in the order of the
+             sheet; a missing table (e.g., no mainData) is None
+    """
+
+    main_info_dict = tables['main-info-sheet.csv'].to_dict()
+    for pointer_ in main_info_dict.values():
+        for dum_ in list(pointer_.keys()):
+            pointer_[dum_] = tables.get(pointer_[dum_])
+    return main_info_dict
+
+
+def text_columns(df_):
+    """
+    :param df_: a data frame
+    :return: the columns that may hold strings: object columns, and the columns of the string dtype (the default dtype
+             of text since pandas 3.0, or pandas 2.x with future.infer_string)
+    """
+
+    return [col_ for col_ in df_.columns if pd.api.types.is_string_dtype(df_[col_].dtype)]
+
+
+def read_meta(pointer, index_col=None):
+    """
+    A function to get a meta table, either directly from memory or from its CSV file.
+    The in-memory table is returned as if it was written and read back through CSV: its index is turned back into the
+    first column and the strings read as nan by pandas (e.g., 'nan') are set to nan, so that the base_func_sheet
+    functions behave the same on both paths.
+    :param pointer: a data frame (in-memory) or a path to the CSV file
+    :param index_col: same as for pandas.read_csv; only None or 0 are used by the base_func_sheet
+    :return: the data frame of the meta table
+    """
+
+    if not isinstance(pointer, pd.DataFrame):
+        with stage('tables_read', bytes_read=path_size(pointer)):
+            return pd.read_csv(pointer, index_col=index_col)
+    df_ = pointer.reset_index()
+    for col_ in text_columns(df_):
+        df_[col_] = df_[col_].map(lambda x: np.nan if isinstance(x, str) and x in na_strings else x)
+    if index_col is not None:
+        df_.set_index(df_.columns[index_col], inplace=True)
+    return df_
+
+
+def meta_rows(df_meta):
+    """
+    A function to decode a meta table at once into its rows, instead of looking up every cell by its row and column.
+    :param df_meta: the data frame of a meta table, indexed by its first column (read_meta with index_col=0)
+    :return: a dict of index -> dict of column -> value of the row, in the order of the table; the numpy scalars are
+             turned into python scalars (as taken by the pynwb constructors), the nan cells are kept as nan
+    """
+
+    return {index_: {key_: value_.item() if isinstance(value_, np.generic) else value_
+                     for key_, value_ in row_.items()}
+            for index_, row_ in df_meta.to_dict('index').items()}
+
+
+def feed_dict(row, exclude=(), drop_nan=True):
+    """
+    :param row: a row of a meta table, as returned by meta_rows
+    :param exclude: the columns that are not keyword arguments of the constructor, e.g., interface_subtype
+    :param drop_nan: whether to leave the nan cells out (to the defaults of the constructor; default), or to pass
+                     them on as they are, e.g., for the session, subject and devices tables, which always took them
+    :return: the keyword arguments of the constructor of the row (e.g., TimeSeries), without the excluded (and the
+             nan) cells
+    """
+
+    return {key_: value_ for key_, value_ in row.items()
+            if key_ not in exclude and not (drop_nan and pd.isnull(value_))}
+
+
+def main_columns(rows):
+    """
+    A function to get the columns of a main table that are used by the series of its meta table, with their dtypes:
+    float64 for the time stamps and the data, float32 for the 0/1 or start(1)/stop(-1) labels of the epochs (exact, and
+    still padded with nan in the wide tables; cast to int by the base_func_sheet).
+    :param rows: the rows of the meta table, as returned by meta_rows
+    :return: a dict of column name (<name>_time/<name>_data) -> dtype, in the order of the meta table
+    """
+
+    columns = {}
+    for name_, row_ in rows.items():
+        columns[f'{name_}_time'] = np.float64
+        columns[f'{name_}_data'] = np.float32 if row_.get('interface_subtype') == 'epochs' else np.float64
+    return columns
+
+
+def read_main(pointer, columns=None):
+    """
+    A function to get a main (data) table, either directly from memory or from its file(s) (CSV, Parquet, Feather or
+    NPZ, by the suffix).
+    :param pointer: a ragged table (in-memory dict of series), a data frame or a path to the file (folder)
+    :param columns: (optional) the columns to read from the file(s) and their dtypes (CSV only), as returned by
+                    main_columns; all of them, as inferred, if None
+    :return: the ragged table as a dict of column name -> 1-D array (in-memory, NPZ, Parquet and Feather), or the wide
+             data frame padded with nan (CSV and in-memory data frames)
+    """
+
+    if isinstance(pointer, dict):
+        return pointer
+    elif isinstance(pointer, pd.DataFrame):
+        # similar to the parsing of read_csv, the text columns (as padded by pandas) are turned into floats whenever
+        # all of their values are numeric; other columns (e.g., the epoch ranges) are kept as they are
+        df_ = pointer.reset_index()
+        for col_ in text_columns(df_):
+            numeric_ = pd.to_numeric(df_[col_], errors='coerce')
+            if numeric_.notna().sum() == df_[col_].notna().sum():
+                df_[col_] = numeric_
+        return df_
+
+    with stage('tables_read', bytes_read=path_size(pointer)):
+        return read_main_file(pointer, columns=columns)
+
+
+def read_main_file(path_, columns=None):
+    """
+    :param path_: path of the file (CSV, NPZ) or the folder (Parquet, Feather) of a main table, by the suffix
+    :param columns: (optional) see read_main
+    :return: see read_main
+    """
+
+    suffix_ = pathlib.Path(path_).suffix
+    if suffix_ == '.npz':
+        arrays = npz_arrays(path_)  # lazy; the other series are never read
+        return arrays if columns is None else {key_: arrays[key_] for key_ in arrays if key_ in columns}
+    elif suffix_ in ['.parquet', '.feather']:
+        series_ = None if columns is None else {key_[:-len('_time')] for key_ in columns if key_.endswith('_time')}
+        arrays = {}
+        for file_path in sorted(pathlib.Path(path_).glob(f'*{suffix_}')):
+            if series_ is not None and file_path.stem not in series_:
+                continue  # one file per series; only the used ones are read
+            if suffix_ == '.parquet':
+                df_ = pd.read_parquet(file_path)
+            else:
+                from pyarrow import feather  # optional dependency; only required for the feather format
+                # memory-mapped; numeric columns without nulls are handed over to pandas without a copy
+                df_ = feather.read_table(str(file_path), memory_map=True).to_pandas(split_blocks=True)
+            arrays.update({key_: df_[key_].to_numpy() for key_ in df_.columns})
+        return arrays
+    return read_main_csv(path_, columns=columns)
+
+
+def read_main_csv(path_, columns=None):
+    """
+    A function to read (the used columns of) a wide main table from its CSV file, typed upfront instead of inferred.
+    It is parsed by the multithreaded pyarrow engine when pyarrow is installed (optional dependency), by the C engine
+    otherwise; the tables that cannot be typed (e.g., the '[start, stop]' strings of the former epoch tables) are read
+    again with inferred dtypes.
+    :param path_: path of the CSV file
+    :param columns: (optional) see read_main
+    :return: the wide data frame, padded with nan
+    """
+
+    usecols_ = None
+    if columns is not None:
+        header_ = pd.read_csv(path_, nrows=0).columns
+        usecols_ = [col_ for col_ in header_ if col_ in columns]  # in the order of the file; missing ones are left out
+    try:
+        import pyarrow  # noqa: F401
+        engine_ = {'engine': 'pyarrow'}  # exact float parsing as well
+    except ImportError:
+        engine_ = {'float_precision': 'round_trip'}
+    if columns is not None:
+        try:
+            return pd.read_csv(path_, usecols=usecols_, dtype={col_: columns[col_] for col_ in usecols_}, **engine_)
+        except (ValueError, TypeError):
+            pass  # not numeric (or an old pandas without the pyarrow engine)
+    # round_trip: the floats exactly as written (e.g., the start/stop stamps of the epochs)
+    return pd.read_csv(path_, usecols=usecols_, float_precision='round_trip')
+
+
+class FileSeries:
+    """
+    a series stored raw (C order) in a file at a given offset, e.g., an array inside an uncompressed NPZ file; it is
+    only read when sliced, so that a long series is never fully loaded (nor kept mapped) by the streamed NWB write
+    (see storage_policy.SeriesChunkIterator). Anything but slices along the first axis loads the whole series.
+    """
+
+    def __init__(self, path_, offset, shape, dtype):
+        self.path = path_
+        self.offset = offset
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        self.row_bytes = self.dtype.itemsize * int(np.prod(self.shape[1:]))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        array_ = self.rows(0, len(self))
+        return array_ if dtype is None else array_.astype(dtype)
+
+    def __getitem__(self, selection):
+        selection = selection if isinstance(selection, tuple) else (selection,)
+        first_ = selection[0] if selection else slice(None)
+        if isinstance(first_, slice) and first_.step in [None, 1]:
+            start_, stop_, _ = first_.indices(len(self))
+            return self.rows(start_, max(start_, stop_))[(slice(None),) + selection[1:]]
+        return np.asarray(self)[selection]
+
+    def rows(self, start_, stop_):
+        """
+        :return: the rows [start_, stop_) of the series as an ndarray
+        """
+
+        with open(self.path, 'rb') as file_:
+            file_.seek(self.offset + start_ * self.row_bytes)
+            array_ = np.fromfile(file_, dtype=self.dtype, count=(stop_ - start_) * self.row_bytes //
+                                 max(1, self.dtype.itemsize))
+        return array_.reshape((stop_ - start_,) + self.shape[1:])
+
+
+def npz_arrays(path_):
+    """
+    A function to get the arrays of an (uncompressed, as written by write_main) NPZ file as FileSeries, so that the
+    series are only read when sliced, e.g., buffer by buffer by the NWB write.
+    :param path_: path of the NPZ file
+    :return: a dict of array name -> FileSeries (or ndarray for the members that cannot be sliced from the file, e.g.,
+             compressed, Fortran-ordered or empty ones), in the stored order
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path_) as zip_, open(path_, 'rb') as raw_:
+        for info_ in zip_.infolist():
+            name_ = info_.filename[:-len('.npy')]
+            with zip_.open(info_) as file_:
+                version_ = np.lib.format.read_magic(file_)
+                if version_ == (1, 0):
+                    shape_, fortran_, dtype_ = np.lib.format.read_array_header_1_0(file_)
+                else:
+                    shape_, fortran_, dtype_ = np.lib.format.read_array_header_2_0(file_)
+                header_len = file_.tell()
+                if (info_.compress_type != zipfile.ZIP_STORED or dtype_.hasobject or not np.prod(shape_) or
+                        (fortran_ and len(shape_) > 1)):
+                    file_.seek(0)
+                    arrays[name_] = np.lib.format.read_array(file_, allow_pickle=False)
+                    continue
+            # the data of the member follow its local header (of variable length) and the header of the array
+            raw_.seek(info_.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', raw_.read(4))
+            arrays[name_] = FileSeries(path_, info_.header_offset + 30 + name_len + extra_len + header_len,
+                                       shape_, dtype_)
+    return arrays
+
+
+def interval_series(intervals):
+    """
+    :param intervals: the intervals as an N x 2 array of start/stop times (one row per interval), e.g., the epochs of
+                      a behavior or the periods of a stimulus
+    :return: a tuple of the interleaved timestamps (start_1, stop_1, start_2, ...) and their labels (1: start,
+             -1: stop), the time and data of an IntervalSeries
+    """
+
+    intervals_ = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    return intervals_.reshape(-1), np.tile(np.array([1, -1], dtype=np.int8), len(intervals_))
+
+
+def range_intervals(ranges):
+    """
+    :param ranges: the intervals as strings of '[start, stop]' (the former tables of session2csv); nan for the padding
+    :return: the intervals as an N x 2 array of start/stop times
+    """
+
+    ranges_ = pd.Series(ranges, dtype=object).dropna().astype(str).str.strip('[] ')
+    if ranges_.empty:
+        return np.empty((0, 2))
+    return ranges_.str.split(',', expand=True).astype(np.float64).to_numpy()
+
+
+def series_pair(df_main, name):
+    """
+    A function to get the time and data arrays of one series of a main table.
+    For the wide (padded) tables, the nan padding is excluded through the nans of the data, as it always was; the
+    ragged tables are taken as they are, so that the legitimate nan samples are kept. The lazy series of the ragged
+    tables (FileSeries or h5py datasets; see storage_policy.is_lazy) are not loaded here, so that they can be streamed
+    into the NWB file.
+    :param df_main: the main table, as returned by read_main
+    :param name: name of the series (data index in the meta table)
+    :return: a tuple of the time and data arrays
+    """
+
+    if isinstance(df_main, pd.DataFrame):
+        time_array = np.asarray(df_main[f'{name}_time'])
+        data_array = np.asarray(df_main[f'{name}_data'])
+        # logical exclusion of nan for array size difference
+        return time_array[~np.isnan(data_array)], data_array[~np.isnan(data_array)]
+    time_array, data_array = df_main[f'{name}_time'], df_main[f'{name}_data']
+    if not hasattr(time_array, 'shape'):
+        time_array = np.asarray(time_array)
+    if not hasattr(data_array, 'shape'):
+        data_array = np.asarray(data_array)
+    if len(time_array) != len(data_array):
+        warnings.warn(f'the time and data of the following series differ in length; truncated to the shorter: \n'
+                      f'{name}: {len(time_array)} vs. {len(data_array)}')
+        n_ = min(len(time_array), len(data_array))
+        time_array, data_array = time_array[:n_], data_array[:n_]
+    return time_array, data_array
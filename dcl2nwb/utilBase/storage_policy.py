@@ -0,0 +1,276 @@
+import contextlib
+import contextvars
+import hashlib
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.data_utils import GenericDataChunkIterator
+from dcl2nwb.utilBase.instrumentation import note
+
+
+# the modalities (base_func_sheet functions) with a storage of their own
+storage_modalities = ['acquisition', 'processed_data', 'cardiac_data', 'behavioral_data', 'stimulation_data']
+
+# codec -> default level; None for the codecs without levels
+storage_codecs = {'none': None, 'gzip': 4, 'lzf': None, 'blosc': 5, 'zstd': 5}
+
+# the storage of the session being converted in this process (thread); see use_policy
+active_policy = contextvars.ContextVar('active_policy', default=None)
+# the timestamps of the session already stored, to be linked to by the series with identical ones; see use_policy
+active_links = contextvars.ContextVar('active_links', default=None)
+
+
+def codec_settings(codec='gzip', level=None, chunk_kb=1024, min_size=1024, shuffle=True, stream_mb=64, buffer_mb=64,
+                   rate_tolerance=1e-3):
+    """
+    :param codec: one of 'none' (uncompressed and, unless streamed, contiguous as before), 'gzip', 'lzf', 'blosc' or
+                  'zstd' (the last two via the filters of hdf5plugin, which have to be installed for writing and reading
+                  the files)
+    :param level: compression level of gzip (0-9), blosc or zstd; the default level of the codec if None
+    :param chunk_kb: target size of the chunks (KiB) along the time axis
+    :param min_size: series with fewer samples are kept contiguous and uncompressed (no gain worth the overhead)
+    :param shuffle: whether to apply the shuffle filter before compression (better ratios for floats)
+    :param stream_mb: series larger than this (MiB), as well as the ones not held in memory (e.g., FileSeries or
+                      h5py datasets), are written through a SeriesChunkIterator, i.e., buffer by buffer; None to
+                      stream only the ones not held in memory
+    :param buffer_mb: size of the buffers (MiB) of the streamed series; bounds the memory used by the write
+    :param rate_tolerance: the timestamps of a series are stored as starting_time and rate instead, if none of them
+                           deviates from the uniform sampling by more than this fraction of the sampling interval (see
+                           regular_rate); None to always store the timestamps
+    :return: the dict of the settings of one modality, as used by h5_dataset
+    """
+
+    if codec not in storage_codecs:
+        raise ValueError(f'unknown codec: {codec}; choose one of {list(storage_codecs)}')
+    return {'codec': codec, 'level': storage_codecs[codec] if level is None else level,
+            'chunk_kb': chunk_kb, 'min_size': min_size, 'shuffle': shuffle, 'stream_mb': stream_mb,
+            'buffer_mb': buffer_mb, 'rate_tolerance': rate_tolerance}
+
+
+def storage_policy(storage=None):
+    """
+    A function to normalize the storage policy of the NWB datasets (data and timestamps) per modality.
+    :param storage: None (default) or 'none' to keep the datasets contiguous and uncompressed; a codec name, e.g.,
+                    'gzip', or a dict of the settings (see codec_settings) for all the modalities; or a dict of
+                    modality -> codec name/settings dict, with an optional 'default' entry for the rest
+    :return: a dict of modality -> settings dict (see codec_settings)
+    """
+
+    if storage is None:
+        storage = 'none'
+    if isinstance(storage, str) or (isinstance(storage, dict) and 'codec' in storage):
+        storage = {'default': storage}
+    unknown_ = set(storage) - set(storage_modalities) - {'default'}
+    if unknown_:
+        raise ValueError(f'unknown modalities in the storage policy: {sorted(unknown_)}; '
+                         f'choose from {storage_modalities}')
+    policy = {}
+    for modality_ in storage_modalities:
+        settings_ = storage.get(modality_, storage.get('default', 'none'))
+        policy[modality_] = codec_settings(settings_) if isinstance(settings_, str) else codec_settings(**settings_)
+    return policy
+
+
+def parse_storage(specs, rate_tolerance=1e-3):
+    """
+    A function to turn the storage specifications of the command line into a storage policy.
+    :param specs: a list of strings [modality=]codec[:level], e.g., ['gzip:4', 'cardiac_data=zstd:7']; the ones
+                  without a modality apply to all the other modalities
+    :param rate_tolerance: the rate_tolerance of all the modalities (see codec_settings)
+    :return: the storage policy, as returned by storage_policy
+    """
+
+    storage = {'default': {'codec': 'none', 'rate_tolerance': rate_tolerance}}
+    for spec_ in specs or []:
+        modality_, _, codec_ = spec_.rpartition('=')
+        codec_, _, level_ = codec_.partition(':')
+        storage[modality_ or 'default'] = {'codec': codec_, 'level': int(level_) if level_ else None,
+                                           'rate_tolerance': rate_tolerance}
+    return storage_policy(storage)
+
+
+@contextlib.contextmanager
+def use_policy(policy):
+    """
+    makes the given storage policy the one of h5_dataset for the block of the with statement, so that the functions
+    of the base_func_sheet apply it without an extra argument. The block is also the scope of the timestamps linking
+    (see time_base and share_timestamps), i.e., it has to cover the building of one NWB file at most.
+    :param policy: the storage policy, as returned by storage_policy; None for the legacy (uncompressed) storage
+    """
+
+    token_ = active_policy.set(policy)
+    links_token = active_links.set({'series': {}, 'pending': {}})
+    try:
+        yield policy
+    finally:
+        active_links.reset(links_token)
+        active_policy.reset(token_)
+
+
+class SeriesChunkIterator(GenericDataChunkIterator):
+    """
+    iterates over the buffers of a series for the NWB write, so that only one buffer of it is read (and compressed) at
+    a time: a series held in memory is not copied as a whole (e.g., for a dtype or layout), and a series that is not
+    (a FileSeries of an NPZ file or an h5py dataset of a v7.3 .mat file) is never fully loaded.
+    """
+
+    def __init__(self, source, **kwargs):
+        """
+        :param source: any array-like with shape, dtype and numpy slicing (ndarray, FileSeries, h5py.Dataset)
+        :param kwargs: keyword arguments of GenericDataChunkIterator, e.g., buffer_shape and chunk_shape
+        """
+
+        self.source = source  # before the initialization of the parent, which asks for the shape and dtype
+        super().__init__(**kwargs)
+
+    def _get_data(self, selection):
+        return np.asarray(self.source[selection])
+
+    def _get_maxshape(self):
+        return tuple(self.source.shape)
+
+    def _get_dtype(self):
+        return np.dtype(self.source.dtype)
+
+
+def is_lazy(array_):
+    """
+    :return: whether the series is not held in memory, i.e., a memory-mapped array or any other array-like with shape
+             and dtype (e.g., FileSeries or h5py.Dataset) that is only read when sliced
+    """
+
+    return isinstance(array_, np.memmap) or (not isinstance(array_, np.ndarray) and
+                                             hasattr(array_, 'shape') and hasattr(array_, 'dtype'))
+
+
+def h5_dataset(array_, modality):
+    """
+    A function to wrap the data or timestamps of a series into an H5DataIO according to the active storage policy.
+    Large series (see stream_mb of codec_settings) are handed over as a SeriesChunkIterator, with bounded buffers.
+    :param array_: the array (or list) of the series; may also be a lazy array-like (see is_lazy)
+    :param modality: the modality of the series, i.e., the name of the base_func_sheet function building it
+    :return: an H5DataIO with chunking and compression; or the array itself if the modality is stored as 'none' or
+             the series is too short (and not to be streamed)
+    """
+
+    policy = active_policy.get()
+    settings_ = policy.get(modality) if policy else None
+    if not hasattr(array_, 'shape'):
+        array_ = np.asarray(array_)  # lists, e.g., of the epochs
+    if settings_ is None:
+        return array_
+    row_bytes = max(1, np.dtype(array_.dtype).itemsize * int(np.prod(array_.shape[1:])))
+    stream_ = is_lazy(array_) or (settings_['stream_mb'] is not None and
+                                  row_bytes * len(array_) > settings_['stream_mb'] * 2 ** 20)
+    if not stream_ and (settings_['codec'] == 'none' or len(array_) < settings_['min_size']):
+        return array_
+    chunk_len = max(1, min(len(array_), settings_['chunk_kb'] * 1024 // row_bytes))
+    options_ = {'chunks': (chunk_len,) + tuple(array_.shape[1:])}
+    if settings_['codec'] != 'none':
+        options_['shuffle'] = settings_['shuffle']
+    if stream_:
+        # whole chunks per buffer; the last buffer of the series may be shorter
+        n_chunks = max(1, settings_['buffer_mb'] * 2 ** 20 // (chunk_len * row_bytes))
+        buffer_len = min(len(array_), chunk_len * n_chunks)
+        array_ = SeriesChunkIterator(array_, chunk_shape=options_['chunks'],
+                                     buffer_shape=(buffer_len,) + tuple(array_.shape[1:]))
+    if settings_['codec'] == 'none':
+        pass  # chunked (streamed), yet uncompressed
+    elif settings_['codec'] == 'gzip':
+        options_.update({'compression': 'gzip', 'compression_opts': settings_['level']})
+    elif settings_['codec'] == 'lzf':
+        options_.update({'compression': 'lzf'})
+    else:
+        import hdf5plugin  # optional dependency; only required for the blosc and zstd codecs
+        if settings_['codec'] == 'blosc':
+            filter_ = hdf5plugin.Blosc(cname='zstd', clevel=settings_['level'],
+                                       shuffle=hdf5plugin.Blosc.SHUFFLE if settings_['shuffle'] else
+                                       hdf5plugin.Blosc.NOSHUFFLE)
+            options_['shuffle'] = False  # done inside blosc
+        else:
+            filter_ = hdf5plugin.Zstd(clevel=settings_['level'])
+        options_.update(dict(filter_), allow_plugin_filters=True)
+    return H5DataIO(data=array_, **options_)
+
+
+def regular_rate(time_array, tolerance, block_len=2 ** 20):
+    """
+    A function to detect a uniformly sampled series, block by block (vectorized within a block, so that also the long
+    and lazy series are checked within bounded memory).
+    :param time_array: the timestamps of the series (array-like; see is_lazy)
+    :param tolerance: the largest deviation of a timestamp from the uniform sampling, as a fraction of the sampling
+                      interval (e.g., 1e-3 for the 0.1% jitter)
+    :param block_len: number of timestamps checked at a time
+    :return: a tuple of the starting time and the rate (Hz) of the series if uniformly sampled, otherwise None
+    """
+
+    n_ = len(time_array)
+    if tolerance is None or n_ < 2:
+        return None
+    start_time = float(time_array[0])
+    interval_ = (float(time_array[n_ - 1]) - start_time) / (n_ - 1)
+    if not np.isfinite(interval_) or interval_ <= 0:
+        return None
+    for start_ in range(0, n_, block_len):
+        block_ = np.asarray(time_array[start_:start_ + block_len], dtype=np.float64)
+        uniform_ = start_time + interval_ * np.arange(start_, start_ + len(block_), dtype=np.float64)
+        if not np.all(np.abs(block_ - uniform_) <= tolerance * interval_):  # also False for any nan
+            return None
+    return start_time, 1 / interval_
+
+
+def series_digest(array_, block_len=2 ** 20):
+    """
+    :param array_: an array (or a lazy array-like; see is_lazy), read block by block
+    :return: a key identifying the array by its shape, its dtype and a hash (blake2b) of its values
+    """
+
+    hash_ = hashlib.blake2b(digest_size=16)
+    for start_ in range(0, len(array_), block_len):
+        hash_.update(np.ascontiguousarray(array_[start_:start_ + block_len]))
+    return tuple(array_.shape), np.dtype(array_.dtype).str, hash_.hexdigest()
+
+
+def time_base(time_array, modality, name):
+    """
+    A function to choose the time base of a series according to the active storage policy: starting_time and rate if
+    uniformly sampled (see regular_rate); otherwise a link to the timestamps of an earlier series of the NWB file with
+    identical ones (see share_timestamps), or else its own timestamps (see h5_dataset). The choice is noted in the
+    time_base column of the conversion report.
+    :param time_array: the timestamps of the series
+    :param modality: the modality of the series, i.e., the name of the base_func_sheet function building it
+    :param name: name of the series (data index in the meta table)
+    :return: the dict of the time keyword arguments of the series, i.e., either starting_time and rate or timestamps
+             (an array or the series to link to)
+    """
+
+    policy = active_policy.get()
+    settings_ = policy.get(modality) if policy else None
+    regular_ = regular_rate(time_array, settings_['rate_tolerance']) if settings_ else None
+    if regular_ is not None:
+        note('time_base', f'{name}=rate')
+        return {'starting_time': regular_[0], 'rate': regular_[1]}
+    links_ = active_links.get()
+    if links_ is not None:
+        key_ = series_digest(time_array)
+        if key_ in links_['series']:
+            note('time_base', f'{name}=linked:{links_["series"][key_].name}')
+            return {'timestamps': links_['series'][key_]}
+        links_['pending'][id(time_array)] = (time_array, key_)  # to be shared once its series is built
+    note('time_base', f'{name}=timestamps')
+    return {'timestamps': h5_dataset(time_array, modality)}
+
+
+def share_timestamps(series_obj, time_array):
+    """
+    registers the timestamps of a series just built with the time base of time_base, so that the next series of the
+    NWB file with identical timestamps link to them instead of storing them again.
+    :param series_obj: the built TimeSeries (or any subclass)
+    :param time_array: the same timestamps as passed to time_base for this series
+    :return: the series_obj
+    """
+
+    links_ = active_links.get()
+    pending_ = links_['pending'].pop(id(time_array), None) if links_ is not None else None
+    if pending_ is not None:
+        links_['series'].setdefault(pending_[1], series_obj)
+    return series_obj
@@ -0,0 +1,162 @@
+import os
+import sys
+import shutil
+import socket
+import zlib
+from dcl2nwb.utilBase.instrumentation import stage, note
+
+
+# the ways of transferring the recording (video) of a session next to its NWB file; see transfer_video
+transfer_methods = ['auto', 'hardlink', 'stream', 'copy']
+
+buffer_mb = 16  # size of the buffer of the streamed copy
+
+FICLONE = 0x40049409  # ioctl of Linux cloning a whole file (btrfs, XFS, OCFS2, ...); see reflink
+
+
+def transfer_video(source, target, method='auto'):
+    """
+    A function to transfer a recording into the recordings folder of a converted session, timed as the video_copy
+    stage of the active timer (if any) of the instrumentation, with the method actually used noted as video_copy.
+    The target is written under a temporary name of its own first (see part_name), so that only a complete (and
+    verified) transfer gets its final name; an existing target (e.g., of a former run) is replaced.
+    :param source: path object of the recording
+    :param target: path object of the transferred recording
+    :param method: one of transfer_methods:
+                   'auto' (default) clones the file (reflink) where the filesystem supports it (copy-on-write, so that
+                   it takes no time nor space), otherwise copies it by shutil.copy2 (in the kernel where the platform
+                   allows it), verified by its size;
+                   'hardlink' links the target to the source when both are on the same filesystem, otherwise falls
+                   back to 'auto'; note that a hard link is the same file as the source, not a copy of it;
+                   'stream' streams it through a large buffer, with a checksum verified by reading the target back
+                   (slower, e.g., for the copies over unreliable network mounts);
+                   'copy' always copies it by shutil.copy2 (the former transfer), verified by its size
+    :return: the method used: 'reflink', 'hardlink', 'stream' or 'copy'
+    """
+
+    if method not in transfer_methods:
+        raise ValueError(f'unknown video transfer method: {method} (one of {", ".join(transfer_methods)})')
+    stat_ = os.stat(source)
+    size_ = stat_.st_size
+    part_path = target.with_name(part_name(target.name))
+    with stage('video_copy', bytes_read=size_) as counts_:
+        if os.path.lexists(part_path):
+            os.remove(part_path)  # left over by an interrupted transfer
+        digest_ = None
+        same_device = stat_.st_dev == os.stat(target.parent).st_dev
+        if method == 'hardlink' and same_device and hard_link(source, part_path):
+            used_ = 'hardlink'
+        elif method in ['auto', 'hardlink'] and reflink(source, part_path):
+            used_ = 'reflink'
+        elif method == 'stream':
+            digest_ = stream_copy(source, part_path)
+            used_ = 'stream'
+        else:
+            shutil.copy2(source, part_path)
+            used_ = 'copy'
+        if used_ in ['stream', 'copy']:
+            counts_['bytes_written'] = size_
+        verify_transfer(source, part_path, size_, digest_)
+        os.replace(part_path, target)
+    note('video_copy', used_)
+    return used_
+
+
+def part_name(name_):
+    """
+    :param name_: the name of a file to be written
+    :return: the name of its temporary file, of this process (host and pid), so that two writers of the same file,
+             e.g., two workers of a distributed batch converting the same session, never write into the same one
+    """
+
+    return f'{name_}.{socket.gethostname()}-{os.getpid()}.part'
+
+
+def hard_link(source, target):
+    """
+    :return: whether the target could be created as a hard link of the source (not on every filesystem, e.g., FAT)
+    """
+
+    try:
+        os.link(source, target)
+    except OSError:
+        return False
+    return True
+
+
+def reflink(source, target):
+    """
+    A function to clone a file (copy-on-write) on the filesystems supporting it (Linux only); the cloned file shares
+    the blocks of the source until either of them is modified, so that the clone takes no time nor space.
+    :return: whether the target could be created as a clone of the source; if not, nothing is left behind
+    """
+
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    try:
+        with open(source, 'rb') as source_, open(target, 'wb') as target_:
+            fcntl.ioctl(target_.fileno(), FICLONE, source_.fileno())
+    except OSError:
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+        return False
+    shutil.copystat(source, target)  # same as shutil.copy2
+    return True
+
+
+def stream_copy(source, target):
+    """
+    A function to copy a file through one large buffer (buffer_mb), computing the checksum (CRC-32, the fastest one
+    of the standard library; enough to detect a corrupted transfer) of the copied bytes on the way; the times and
+    permissions of the source are kept, same as shutil.copy2.
+    :return: the checksum of the copied bytes
+    """
+
+    digest_ = 0
+    buffer_ = bytearray(buffer_mb * 2**20)
+    view_ = memoryview(buffer_)
+    with open(source, 'rb', buffering=0) as source_, open(target, 'wb') as target_:
+        while True:
+            n_ = source_.readinto(buffer_)
+            if not n_:
+                break
+            digest_ = zlib.crc32(view_[:n_], digest_)
+            target_.write(view_[:n_])
+    shutil.copystat(source, target)
+    return digest_
+
+
+def file_digest(path_):
+    """
+    :return: the checksum (CRC-32) of the file, read through one large buffer (buffer_mb)
+    """
+
+    digest_ = 0
+    buffer_ = bytearray(buffer_mb * 2**20)
+    view_ = memoryview(buffer_)
+    with open(path_, 'rb', buffering=0) as file_:
+        while True:
+            n_ = file_.readinto(buffer_)
+            if not n_:
+                break
+            digest_ = zlib.crc32(view_[:n_], digest_)
+    return digest_
+
+
+def verify_transfer(source, target, size, digest=None):
+    """
+    A function to verify a transferred file: by its size, and by reading it back against the checksum of the copied
+    bytes if given (streamed copy).
+    :param source: path of the source file
+    :param target: path of the transferred file
+    :param size: size of the source file in bytes
+    :param digest: (optional) the checksum of the copied bytes, as returned by stream_copy
+    """
+
+    if os.stat(target).st_size != size:
+        raise OSError(f'the transfer of {source} is incomplete: {os.stat(target).st_size} of {size} bytes')
+    if digest is not None and file_digest(target) != digest:
+        raise OSError(f'the transfer of {source} is corrupted: the checksum of {target} differs')
@@ -15,6 +15,11 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     packages=find_packages(),
+    entry_points={
+        'console_scripts': ['dcl2nwb-convert=dcl2nwb.main:cli',
+                            'dcl2nwb-worker=dcl2nwb.main:worker_cli',
+                            'dcl2nwb-merge=dcl2nwb.main:merge_cli'],
+    },
     keywords=['Python', 'NWB', 'ReTune', 'DCL'],
     classifiers=[
         "Programming Language :: Python :: 3",